@@ -0,0 +1,72 @@
+"""
+管理驾驶舱统计口径
+LLM 用量估算在任务完成写入结果时计算一次并存入 usage.estimated_llm，
+汇总数据由 migrations/008_admin_stats.sql 的触发器增量维护，此处的口径与其保持一致。
+"""
+
+
+def estimate_llm_usage(paragraphs, raw_subtitles=None):
+    """基于文本长度估算 Token 和费用，返回 (prompt_tokens, completion_tokens, cost)"""
+    char_count = 0
+    for p in paragraphs or []:
+        for s in (p or {}).get("sentences") or []:
+            char_count += len(s.get("text", ""))
+
+    if char_count == 0:
+        char_count = sum(len(s.get("text", "")) for s in raw_subtitles or [])
+
+    if char_count == 0:
+        return 0, 0, 0.0
+
+    # 估算逻辑：1汉字 ≈ 1.5 token (考虑提示词开销 * 2.5 倍率)
+    estimated_tokens = int(char_count * 2.5)
+    # 按照 gpt-4o-mini 平均值 $0.15/1M tokens 估算
+    estimated_cost = (estimated_tokens / 1000000.0) * 0.15
+
+    return int(estimated_tokens * 0.7), int(estimated_tokens * 0.3), estimated_cost
+
+
+def build_usage_estimate(paragraphs, raw_subtitles=None):
+    """生成写入 usage.estimated_llm 的字典"""
+    p_tokens, c_tokens, cost = estimate_llm_usage(paragraphs, raw_subtitles)
+    return {
+        "prompt_tokens": p_tokens,
+        "completion_tokens": c_tokens,
+        "cost": round(cost, 6),
+    }
+
+
+def video_llm_usage(status, usage):
+    """
+    单个视频的 LLM 用量口径（与 SQL 函数 video_llm_usage 一致）：
+    有真实 llm_cost 用真实值，否则 completed 视频取写入时的估算值。
+    返回 (prompt_tokens, completion_tokens, cost, is_estimated)
+    """
+    usage = usage or {}
+    real_cost = usage.get("llm_cost") or 0
+    if real_cost > 0:
+        tokens = usage.get("llm_tokens") or {}
+        return tokens.get("prompt_tokens") or 0, tokens.get("completion_tokens") or 0, real_cost, False
+    if status == "completed":
+        est = usage.get("estimated_llm") or {}
+        return est.get("prompt_tokens") or 0, est.get("completion_tokens") or 0, est.get("cost") or 0.0, True
+    return 0, 0, 0.0, False
+
+
+def aggregate_totals(videos):
+    """由视频行计算汇总（仅在预聚合表不可用时回退使用），字段与 admin_stats_totals 一致"""
+    totals = {
+        "video_count": 0,
+        "completed_count": 0,
+        "total_views": 0,
+        "total_interactions": 0,
+        "total_llm_cost": 0.0,
+    }
+    for v in videos:
+        totals["video_count"] += 1
+        if v.get("status") == "completed":
+            totals["completed_count"] += 1
+        totals["total_views"] += v.get("view_count") or 0
+        totals["total_interactions"] += v.get("interaction_count") or 0
+        totals["total_llm_cost"] += video_llm_usage(v.get("status"), v.get("usage"))[2]
+    return totals
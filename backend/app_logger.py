@@ -1,13 +1,13 @@
 """
-统一日志配置：同时输出到 stdout 和滚动文件 logs/app.log
+统一日志配置：同时输出到 stdout 和滚动文件 logs/app.log（目录可用 APP_LOG_DIR 覆盖）
 在 main.py 启动时调用 setup() 一次即可，其他模块直接 get_logger(__name__)。
 """
 import logging
 import logging.handlers
 import os
 
-LOG_DIR = os.path.join(os.path.dirname(__file__), "logs")
-LOG_FILE = os.path.join(LOG_DIR, "app.log")
+LOG_DIR = os.environ.get("APP_LOG_DIR", os.path.join(os.path.dirname(__file__), "logs"))
+LOG_FILE_NAME = "app.log"
 _initialized = False
 
 
@@ -24,7 +24,7 @@ def setup(level=logging.INFO):
 
     # 滚动文件：单文件最大 20MB，保留 5 个备份
     fh = logging.handlers.RotatingFileHandler(
-        LOG_FILE, maxBytes=20 * 1024 * 1024, backupCount=5, encoding="utf-8"
+        os.path.join(LOG_DIR, LOG_FILE_NAME), maxBytes=20 * 1024 * 1024, backupCount=5, encoding="utf-8"
     )
     fh.setFormatter(fmt)
 
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+端到端流水线基准测试
+依次运行 ASR（tests/sample.mp3）、LLM 分块校对、幻觉检测、摘要与结果持久化，
+LLM 请求全部发往本地桩服务（bench/stub_llm.py，可配置延迟 / 吞吐 / 失败率），结果可重复、可跨提交对比。
+输出 JSON（键排序、缩进固定，便于 diff）：各阶段墙钟时间、ASR 实时率、token、峰值 RSS。
+
+用法: PYTHONPATH=backend python backend/bench/run_bench.py [--servers 2] [--latency 0.05] [--tps 200]
+      [--failure-rate 0] [--hallucination-rate 0] [--repeat 3] [--skip-asr] [--subtitles PATH] [--output PATH]
+"""
+import os
+import sys
+import json
+import time
+import copy
+import socket
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import xml.etree.ElementTree as ET
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.append(BACKEND_DIR)
+sys.path.append(BENCH_DIR)
+
+from stub_llm import StubLLMServer
+
+SAMPLE_AUDIO = os.path.join(BACKEND_DIR, "tests", "sample.mp3")
+# LLM 阶段的默认输入：带人工字幕的真实视频（675 句，约 36 分钟），比几秒长的 sample.mp3 更能体现分块并行
+DEFAULT_SUBTITLES = os.path.join(BACKEND_DIR, "tests", "data", "QVBpiuph3rM.zh-CN.srv1")
+TITLE = "灵修与明白神的旨意"
+DESCRIPTION = "本视频分享关于灵修的意义和如何明白神的旨意。"
+
+
+def peak_rss_mb():
+    """进程至今的峰值常驻内存（MB）；Linux 的 ru_maxrss 单位为 KB，macOS 为字节"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_revision():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR,
+                             capture_output=True, text=True, timeout=5).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR,
+                               capture_output=True, text=True, timeout=10).stdout.strip()
+        return {"commit": sha or None, "dirty": bool(dirty)}
+    except Exception:
+        return {"commit": None, "dirty": None}
+
+
+def load_subtitles(path):
+    """读取字幕：worker 缓存的 *_raw.json，或 YouTube srv1 XML"""
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    subtitles = []
+    for node in ET.parse(path).getroot().iter("text"):
+        start = float(node.get("start", 0))
+        text = (node.text or "").strip()
+        if text:
+            subtitles.append({"start": start, "end": round(start + float(node.get("dur", 0)), 2),
+                              "text": text, "words": []})
+    return subtitles
+
+
+def configure_llm(servers, model="stub"):
+    """让 processor / ServerPool 只使用桩服务（覆盖内存中的 llm_config，不改文件）"""
+    import llm_provider
+    llm_provider._config = {"providers": [{
+        "name": "ollama",
+        "enabled": True,
+        "model": model,
+        "servers": [{"url": s.base_url, "schedule": "always"} for s in servers],
+    }]}
+    # 摘要失败时不要回退到真实 provider
+    os.environ["LLM_NO_FALLBACK"] = "1"
+
+
+class StageTimer:
+    def __init__(self):
+        self.runs = {}
+        self.extra = {}
+
+    def run(self, name, func, *args, **kwargs):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.runs.setdefault(name, []).append(time.perf_counter() - started)
+        self.extra.setdefault(name, {})["peak_rss_mb"] = peak_rss_mb()
+        return result
+
+    def report(self):
+        stages = {}
+        for name, runs in self.runs.items():
+            stages[name] = {
+                "wall_seconds": round(statistics.median(runs), 4),
+                "min_seconds": round(min(runs), 4),
+                "max_seconds": round(max(runs), 4),
+                "runs": len(runs),
+                **self.extra.get(name, {}),
+            }
+        return stages
+
+
+def full_text_of(paragraphs):
+    lines = []
+    for p in paragraphs:
+        for s in p.get("sentences", []):
+            start = int(s.get("start", 0))
+            h, r = divmod(start, 3600)
+            m, sec = divmod(r, 60)
+            ts = f"[{h:02d}:{m:02d}:{sec:02d}]" if h > 0 else f"[{m:02d}:{sec:02d}]"
+            lines.append(f"{ts} {s.get('text', '')}")
+    return "\n".join(lines)
+
+
+def run_once(args, timer, workdir, subtitles_input):
+    from processor import split_into_paragraphs, summarize_text
+    from hallucination_detector import detect_hallucinations, detect_hallucination_patterns
+    import transcript_index
+
+    report = {}
+
+    # 1. ASR
+    subtitles = subtitles_input
+    if not args.skip_asr:
+        from transcriber import transcribe_audio
+        from downloader import probe_duration
+        try:
+            asr_subtitles, language = timer.run("asr", transcribe_audio, args.audio, mode="local",
+                                                initial_prompt=TITLE, model_size=args.asr_model)
+            audio_seconds = probe_duration(args.audio) or (asr_subtitles[-1]["end"] if asr_subtitles else 0)
+            report["asr"] = {
+                "audio_seconds": round(audio_seconds, 2),
+                "segments": len(asr_subtitles),
+                "language": language,
+                "rtf": round(timer.runs["asr"][-1] / audio_seconds, 4) if audio_seconds else None,
+            }
+            if args.from_asr:
+                subtitles = asr_subtitles
+        except Exception as e:
+            report["asr"] = {"error": f"{type(e).__name__}: {e}"}
+
+    # 2. 分块校对
+    paragraphs, correction_usage = timer.run(
+        "llm_correction", split_into_paragraphs, copy.deepcopy(subtitles), title=TITLE, description=DESCRIPTION)
+
+    # 3. 幻觉检测（字幕区间 + 校对输出）
+    def detect():
+        ranges = detect_hallucinations(copy.deepcopy(subtitles))
+        flagged = sum(1 for p in paragraphs
+                      if detect_hallucination_patterns(" ".join(s.get("text", "") for s in p.get("sentences", []))))
+        return ranges, flagged
+    ranges, flagged = timer.run("hallucination_detection", detect)
+
+    # 4. 摘要
+    summary_data, summary_usage = timer.run(
+        "summarize", summarize_text, full_text_of(paragraphs), title=TITLE, description=DESCRIPTION, language="zh")
+
+    # 5. 结果持久化（结果 JSON + 全文索引）
+    result = {
+        "title": TITLE,
+        "summary": summary_data.get("summary", ""),
+        "keywords": summary_data.get("keywords", []),
+        "paragraphs": paragraphs,
+        "raw_subtitles": subtitles,
+        "usage": {"llm_tokens": correction_usage},
+    }
+
+    def persist():
+        with open(os.path.join(workdir, "bench_result.json"), "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        return transcript_index.index_result("bench", result, path=os.path.join(workdir, "index.db"))
+    indexed = timer.run("persist", persist)
+
+    report.update({
+        "input_segments": len(subtitles),
+        "paragraphs": len(paragraphs),
+        "hallucination_ranges": len(ranges),
+        "flagged_paragraphs": flagged,
+        "indexed_segments": indexed,
+        "tokens": {
+            "correction": correction_usage,
+            "summarize": summary_usage,
+        },
+    })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against a stub LLM server")
+    parser.add_argument("--servers", type=int, default=2, help="桩服务数量（>1 时走并行分块路径）")
+    parser.add_argument("--latency", type=float, default=0.05, help="桩服务每次请求的固定延迟（秒）")
+    parser.add_argument("--tps", type=float, default=200.0, help="桩服务生成速度（completion tokens / 秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="桩服务返回 500 的概率")
+    parser.add_argument("--hallucination-rate", type=float, default=0.0, help="桩服务返回幻觉句子的概率")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="重复次数，各阶段取中位数")
+    parser.add_argument("--audio", default=SAMPLE_AUDIO, help="ASR 输入音频")
+    parser.add_argument("--asr-model", default="large-v3-turbo")
+    parser.add_argument("--skip-asr", action="store_true", help="跳过 ASR（无转录模型的环境）")
+    parser.add_argument("--subtitles", default=DEFAULT_SUBTITLES, help="LLM 阶段的输入字幕（.json / .srv1）")
+    parser.add_argument("--from-asr", action="store_true", help="LLM 阶段改用 ASR 输出作为输入")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径（默认 bench/results/bench-<commit>.json）")
+    args = parser.parse_args()
+
+    revision = git_revision()
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"bench-{(revision['commit'] or 'unknown')[:10]}.json")
+    workdir = tempfile.mkdtemp(prefix="tldw_bench_")
+
+    # 指标写入临时库，不污染生产的 cache/metrics.db
+    import metrics
+    metrics.METRICS_PATH = os.path.join(workdir, "metrics.db")
+    metrics.reset_summary()
+
+    subtitles = load_subtitles(args.subtitles)
+    servers = [StubLLMServer(latency=args.latency, tokens_per_second=args.tps, failure_rate=args.failure_rate,
+                             hallucination_rate=args.hallucination_rate, seed=args.seed + i).start()
+               for i in range(max(1, args.servers))]
+    configure_llm(servers)
+
+    timer = StageTimer()
+    reports = []
+    try:
+        for i in range(max(1, args.repeat)):
+            print(f"--- [Bench] run {i + 1}/{args.repeat} ---")
+            reports.append(run_once(args, timer, workdir, subtitles))
+    finally:
+        for s in servers:
+            s.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    stub_stats = {}
+    for s in servers:
+        for key, value in s.stats.items():
+            stub_stats[key] = stub_stats.get(key, 0) + value
+
+    result = {
+        "revision": revision,
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": {"hostname": socket.gethostname(), "platform": platform.platform(),
+                 "python": platform.python_version(), "cpu_count": os.cpu_count()},
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "stages": timer.report(),
+        # processor 内部的细分耗时（llm_chunk / hallucination_check / hallucination_repair 等，见 metrics.timed）
+        "breakdown": metrics.timings_summary(),
+        "last_run": reports[-1],
+        "stub": stub_stats,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    for name, stage in result["stages"].items():
+        print(f"  {name:<24} {stage['wall_seconds']:>9.3f}s  peak_rss={stage['peak_rss_mb']}MB")
+    print(f"--- [Bench] 结果已写入 {output} ---")
+
+
+if __name__ == "__main__":
+    main()
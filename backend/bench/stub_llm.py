@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+OpenAI 兼容的 LLM 桩服务（仅标准库），供 bench/run_bench.py 在无 GPU / 无 API key 的环境下复现 LLM 阶段。
+- 校对请求（用户消息含 `[12.3] 文本` 行）：原样回显为 paragraphs JSON，每 5 句一段，句末补标点
+- 摘要请求（其余）：按文本里的 [mm:ss] 时间戳生成 7 条要点与关键词
+延迟 = latency + completion_tokens / tokens_per_second；failure_rate 概率返回 500，
+hallucination_rate 概率返回带重复字的句子（触发 processor 的质量检查与重试）。
+token 数按字符粗略估算（约 2 字符 / token），仅用于横向比较。
+
+单独运行: python backend/bench/stub_llm.py --port 18080 --latency 0.2 --tps 40
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CHUNK_LINE = re.compile(r"^\[(\d+(?:\.\d+)?)\]\s?(.*)$", re.MULTILINE)
+SUMMARY_TS = re.compile(r"\[(\d{2}:\d{2}(?::\d{2})?)\]")
+SENTENCES_PER_PARAGRAPH = 5
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 2)
+
+
+def correction_response(lines, hallucinate=False):
+    """把 [(start, text)] 回显为 processor 期望的 paragraphs 结构"""
+    paragraphs = []
+    for i in range(0, len(lines), SENTENCES_PER_PARAGRAPH):
+        sentences = [{"start": float(start), "text": text.strip() + "。"} for start, text in lines[i:i + SENTENCES_PER_PARAGRAPH]]
+        paragraphs.append({"sentences": sentences})
+    if hallucinate and paragraphs:
+        paragraphs[-1]["sentences"][-1]["text"] = "用用用用用用"
+    return {"paragraphs": paragraphs}
+
+
+def summary_response(prompt):
+    stamps = SUMMARY_TS.findall(prompt)
+    if stamps:
+        step = max(1, len(stamps) // 7)
+        picked = stamps[::step][:7]
+    else:
+        picked = ["00:00"]
+    summary = "\n".join(f"{i + 1}. 要点 {i + 1}[{ts}]" for i, ts in enumerate(picked))
+    return {"summary": summary, "keywords": ["基准测试 (Benchmark)", "桩服务 (Stub)"]}
+
+
+class StubLLMServer:
+    """在后台线程运行的桩服务；stats 记录请求 / 失败次数与 token 总量"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, tokens_per_second=200.0,
+                 failure_rate=0.0, hallucination_rate=0.0, seed=0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self.hallucination_rate = hallucination_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "failures": 0, "hallucinations": 0,
+                      "prompt_tokens": 0, "completion_tokens": 0}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _roll(self, rate):
+        with self._lock:
+            return self._random.random() < rate
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def complete(self, body):
+        """根据请求体生成 (http_status, 响应字典)"""
+        self._count(requests=1)
+        if self._roll(self.failure_rate):
+            self._count(failures=1)
+            return 500, {"error": {"message": "stub failure", "type": "server_error"}}
+
+        messages = body.get("messages") or []
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        lines = CHUNK_LINE.findall(messages[-1].get("content", "") if messages else "")
+        if lines:
+            hallucinate = self._roll(self.hallucination_rate)
+            if hallucinate:
+                self._count(hallucinations=1)
+            data = correction_response(lines, hallucinate)
+        else:
+            data = summary_response(prompt)
+
+        content = json.dumps(data, ensure_ascii=False)
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(content)
+        self._count(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        time.sleep(self.latency + completion_tokens / self.tokens_per_second)
+        return 200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    body = {}
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    status, payload = 404, {"error": {"message": "not found"}}
+                else:
+                    status, payload = server.complete(body)
+                raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency", type=float, default=0.05, help="每次请求的固定延迟（秒）")
+    parser.add_argument("--tps", type=float, default=200.0, help="生成速度（completion tokens / 秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="返回 500 的概率")
+    parser.add_argument("--hallucination-rate", type=float, default=0.0, help="返回重复字幻觉的概率")
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, args.latency, args.tps, args.failure_rate, args.hallucination_rate)
+    print(f"Stub LLM server listening on {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
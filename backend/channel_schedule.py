@@ -0,0 +1,76 @@
+"""
+频道追踪的增量检查策略
+每个频道记录最新视频列表的指纹与检查间隔：列表有变化时间隔减半（更频繁），
+无变化时间隔翻倍（退避），状态存于 channel_settings（见 migrations/010_channel_tracking_state.sql）。
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+# 下限与 main.py 的 CHANNEL_CHECK_INTERVAL_HOURS 一致（调度循环每小时运行一次）
+MIN_INTERVAL_MINUTES = 60
+DEFAULT_INTERVAL_MINUTES = 60
+MAX_INTERVAL_MINUTES = 24 * 60
+
+STATE_COLUMNS = "channel_id, last_seen_video_id, last_fingerprint, last_changed_at, check_interval_minutes, next_check_at"
+
+
+def fingerprint(video_ids):
+    """视频 ID 列表（按频道页顺序）的指纹"""
+    if not video_ids:
+        return None
+    return hashlib.sha1(",".join(video_ids).encode("utf-8")).hexdigest()[:16]
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def is_due(state, now=None):
+    """频道是否到了检查时间（从未检查过的频道立即检查）"""
+    now = now or datetime.now(timezone.utc)
+    next_check = _parse_time(state.get("next_check_at"))
+    return next_check is None or next_check <= now
+
+
+def is_changed(state, video_ids):
+    """本次列表与上次指纹不同即视为可能有新视频"""
+    fp = fingerprint(video_ids)
+    return fp is not None and fp != state.get("last_fingerprint")
+
+
+def next_state(state, video_ids, now=None, settled=True, failed=False):
+    """
+    计算检查后写回 channel_settings 的状态。
+    settled=False 表示本轮有新视频未能入队（如元数据抓取失败或超出配额）：指纹置空（不保留旧指纹，
+    列表变回旧内容时也不会漏掉），下一轮必定视为变化。
+    failed=True 表示列表获取失败或为空（yt-dlp 出错 / 超时与频道无公开视频无法区分）：
+    保持当前间隔与指纹不变，不把失败当作“无变化”而退避。
+    """
+    now = now or datetime.now(timezone.utc)
+    interval = state.get("check_interval_minutes") or DEFAULT_INTERVAL_MINUTES
+    changed = not failed and is_changed(state, video_ids)
+
+    if changed:
+        interval = max(MIN_INTERVAL_MINUTES, interval // 2)
+    elif not failed:
+        interval = min(MAX_INTERVAL_MINUTES, interval * 2)
+
+    # 各行键保持一致，便于一次 upsert 批量写回
+    update = {
+        "channel_id": state["channel_id"],
+        "check_interval_minutes": interval,
+        "last_checked_at": now.isoformat(),
+        "next_check_at": (now + timedelta(minutes=interval)).isoformat(),
+        "last_changed_at": state.get("last_changed_at"),
+        "last_seen_video_id": state.get("last_seen_video_id"),
+        "last_fingerprint": state.get("last_fingerprint"),
+    }
+    if changed:
+        update["last_changed_at"] = now.isoformat()
+        update["last_seen_video_id"] = video_ids[0]
+        update["last_fingerprint"] = fingerprint(video_ids) if settled else None
+    return update
@@ -1,53 +1,25 @@
-import os
-import time
+import argparse
+import media_cache
 
-# 配置
-DOWNLOADS_DIR = os.path.join(os.path.dirname(__file__), "downloads")
-MAX_AGE_DAYS = 3
-TARGET_EXTENSIONS = [".mp3", ".m4a", ".mp4", ".webm", ".mov", ".avi"]
-EXCLUDE_EXTENSIONS = [".jpg", ".png", ".json"] # 绝对保留缩略图和状态文件
+# 按 media_cache.POLICIES 的字节预算与 LRU 淘汰（API 进程每小时也会自动执行一次）
+# 排队 / 处理中任务的文件不会被删除；缩略图默认只统计不删除
 
-def cleanup():
-    if not os.path.exists(DOWNLOADS_DIR):
-        print(f"Directory {DOWNLOADS_DIR} does not exist.")
-        return
 
-    now = time.time()
-    count = 0
-    freed_space = 0
+def cleanup(dry_run=False):
+    print(f"--- Starting cache sweep in {media_cache.DOWNLOADS_DIR} and {media_cache.CACHE_DIR}"
+          f"{' (dry run)' if dry_run else ''} ---")
+    report = media_cache.sweep(dry_run=dry_run)
+    for f in report["files"]:
+        print(f"{'Would delete' if dry_run else 'Deleted'}: {f['name']} ({f['size'] / 1024 / 1024:.2f} MB, {f['reason']})")
 
-    print(f"--- Starting cleanup in {DOWNLOADS_DIR} (Files older than {MAX_AGE_DAYS} days) ---")
+    print(f"--- Cleanup completed. Removed {report['evicted']} files, freed {report['freed_bytes'] / 1024 / 1024:.2f} MB ---")
+    for category, stats in media_cache.usage()["categories"].items():
+        budget = stats["budget_bytes"]
+        budget_text = f"{budget / 1024 / 1024:.0f} MB" if budget is not None else "unlimited"
+        print(f"  {category:<10} {stats['files']:>6} files  {stats['bytes'] / 1024 / 1024:>10.2f} MB / {budget_text}")
 
-    for filename in os.listdir(DOWNLOADS_DIR):
-        file_path = os.path.join(DOWNLOADS_DIR, filename)
-        
-        # 检查是否是文件
-        if not os.path.isfile(file_path):
-            continue
-
-        # 获取文件扩展名
-        ext = os.path.splitext(filename)[1].lower()
-        
-        # 如果在排除列表中，跳过
-        if ext in EXCLUDE_EXTENSIONS:
-            continue
-            
-        # 如果在目标列表中，或者是其他大文件类型
-        if ext in TARGET_EXTENSIONS or os.path.getsize(file_path) > 10 * 1024 * 1024: # 超过 10MB 的也视为潜在清理对象
-            mtime = os.path.getmtime(file_path)
-            age_days = (now - mtime) / (24 * 3600)
-            
-            if age_days > MAX_AGE_DAYS:
-                size = os.path.getsize(file_path)
-                try:
-                    os.remove(file_path)
-                    print(f"Deleted: {filename} ({size / 1024 / 1024:.2f} MB, {age_days:.1f} days old)")
-                    count += 1
-                    freed_space += size
-                except Exception as e:
-                    print(f"Error deleting {filename}: {e}")
-
-    print(f"--- Cleanup completed. Removed {count} files, freed {freed_space / 1024 / 1024:.2f} MB ---")
 
 if __name__ == "__main__":
-    cleanup()
+    parser = argparse.ArgumentParser(description="按预算与 LRU 清理下载与转录缓存")
+    parser.add_argument("--dry-run", action="store_true", help="只列出将被删除的文件")
+    cleanup(dry_run=parser.parse_args().dry_run)
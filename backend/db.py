@@ -1,6 +1,8 @@
 import os
 from supabase import create_client, Client
 from dotenv import load_dotenv
+# 关键词同步不依赖 supabase 包，单独成模块；这里保留原导入路径
+from keyword_sync import sync_video_keywords  # noqa: F401
 
 load_dotenv()
 
@@ -1,4 +1,5 @@
 import os
+import copy
 import shutil
 
 def _find_ffmpeg():
@@ -12,7 +13,125 @@ def _find_ffmpeg():
             return candidate
     return None
 
-def download_audio(url: str, output_path: str = "downloads", progress_callback=None):
+def probe_duration(file_path):
+    """用 ffprobe 读取媒体时长（秒），失败返回 None"""
+    import subprocess
+    ffmpeg_dir = _find_ffmpeg()
+    ffprobe = os.path.join(ffmpeg_dir, 'ffprobe') if ffmpeg_dir else 'ffprobe'
+    try:
+        out = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", file_path],
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+        return float(out) if out else None
+    except Exception as e:
+        print(f"[Downloader] ffprobe failed for {file_path}: {e}")
+        return None
+
+# 视频容器中可直接封装（stream copy）的音频编码 → 输出扩展名；其余编码转为 Opus
+COPYABLE_AUDIO = {"aac": ".m4a", "alac": ".m4a", "mp3": ".mp3", "opus": ".opus", "vorbis": ".ogg", "flac": ".flac"}
+# 提取出的音频可能的扩展名（.mp3 兼容旧版重编码产物）
+EXTRACTED_AUDIO_EXTS = (".m4a", ".opus", ".mp3", ".ogg", ".flac")
+OPUS_BITRATE = "48k"
+THUMBNAIL_OFFSET_SECONDS = 1
+
+def _ffmpeg_binary(name):
+    ffmpeg_dir = _find_ffmpeg()
+    return os.path.join(ffmpeg_dir, name) if ffmpeg_dir else name
+
+def probe_streams(file_path):
+    """用 ffprobe 读取首个音频 / 视频流的编码名，如 {"audio": "aac", "video": "h264"}；失败返回 None"""
+    import json
+    import subprocess
+    try:
+        out = subprocess.run(
+            [_ffmpeg_binary('ffprobe'), "-v", "error", "-show_entries", "stream=codec_type,codec_name",
+             "-of", "json", file_path],
+            capture_output=True, text=True, timeout=10
+        ).stdout
+        streams = {}
+        for s in json.loads(out or "{}").get("streams", []):
+            streams.setdefault(s.get("codec_type"), s.get("codec_name"))
+        return streams
+    except Exception as e:
+        print(f"[Downloader] ffprobe streams failed for {file_path}: {e}")
+        return None
+
+def find_extracted_audio(base_path):
+    for ext in EXTRACTED_AUDIO_EXTS:
+        if os.path.exists(base_path + ext):
+            return base_path + ext
+    return None
+
+def extraction_command(video_path, base_path, streams, copy=True, audio=True, thumbnail=True):
+    """
+    构造一次 ffmpeg 调用：音频可封装时直接 stream copy，否则转 Opus；有视频流时同一遍截取缩略图。
+    输出先写临时名（扩展名保留在末尾以便 ffmpeg 推断格式）。返回 (cmd, [(临时路径, 最终路径)])。
+    streams 为 None（探测失败）时按有音频、有视频处理，音频直接转 Opus。
+    """
+    known = streams is not None
+    streams = streams or {}
+    cmd = [_ffmpeg_binary('ffmpeg'), "-y", "-v", "error", "-i", video_path]
+    outputs = []
+    if audio and (streams.get("audio") or not known):
+        ext = COPYABLE_AUDIO.get(streams.get("audio")) if copy else None
+        if ext:
+            codec = ["-c:a", "copy"] + (["-movflags", "+faststart"] if ext == ".m4a" else [])
+        else:
+            ext = ".opus"
+            codec = ["-c:a", "libopus", "-b:a", OPUS_BITRATE]
+        tmp = f"{base_path}.tmp{ext}"
+        cmd += ["-map", "0:a:0", "-vn", *codec, tmp]
+        outputs.append((tmp, base_path + ext))
+    if thumbnail and (streams.get("video") or not known):
+        tmp = f"{base_path}.tmp.jpg"
+        cmd += ["-map", "0:v:0", "-ss", str(THUMBNAIL_OFFSET_SECONDS), "-frames:v", "1", "-q:v", "2", tmp]
+        outputs.append((tmp, base_path + ".jpg"))
+    return cmd, outputs
+
+def extract_media(video_path):
+    """
+    从视频文件取出播放 / 转录用的音频与缩略图，只调用一次 ffmpeg、不重复编码：
+    AAC / Opus 等可直接封装的音频原样复制到 m4a / opus，其他编码转为低码率 Opus。
+    stream copy 失败（容器或编码异常）时改为转码重试。已提取过的产物直接复用。
+    返回 (音频路径, 缩略图路径)，未能得到的项为 None。
+    """
+    import subprocess
+    base_path = os.path.splitext(video_path)[0]
+    audio_path = find_extracted_audio(base_path)
+    thumb_path = base_path + ".jpg" if os.path.exists(base_path + ".jpg") else None
+    if audio_path and thumb_path:
+        return audio_path, thumb_path
+
+    streams = probe_streams(video_path)
+    # 依次尝试：stream copy + 缩略图 → 转码 + 缩略图 → 仅转码音频（缩略图截取失败不影响音频）
+    for copy, with_thumb in ((True, True), (False, True), (False, False)):
+        cmd, outputs = extraction_command(video_path, base_path, streams, copy=copy,
+                                          audio=not audio_path, thumbnail=with_thumb and not thumb_path)
+        if not outputs:
+            break
+        print(f"--- Extracting {'/'.join(os.path.splitext(f)[1] for _, f in outputs)} from {video_path} "
+              f"({'stream copy' if copy else 'transcode'}) ---")
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        for tmp, final in outputs:
+            if result.returncode == 0 and os.path.exists(tmp) and os.path.getsize(tmp) > 0:
+                os.replace(tmp, final)
+                if final.endswith(".jpg"):
+                    thumb_path = final
+                else:
+                    audio_path = final
+            elif os.path.exists(tmp):
+                os.remove(tmp)
+        if result.returncode == 0:
+            break
+        print(f"[Downloader] ffmpeg extraction failed: {(result.stderr or '').strip()[-300:]}")
+    return audio_path, thumb_path
+
+def download_audio(url: str, output_path: str = "downloads", progress_callback=None, info=None):
+    """
+    下载音频（及缩略图、字幕）。info 为预先解析好的 yt-dlp 信息字典（如 metadata_cache 中的缓存），
+    传入时直接基于它选格式并下载，不再解析视频页；未传入时只解析一次，重试阶段复用。
+    """
     import yt_dlp
     if not os.path.exists(output_path):
         os.makedirs(output_path)
@@ -58,16 +177,29 @@ def download_audio(url: str, output_path: str = "downloads", progress_callback=N
     if cookies_path and os.path.exists(cookies_path):
         ydl_opts['cookiefile'] = cookies_path
 
+    # 页面只解析一次：resolved_info 为未做格式选择前的完整信息（含 formats / subtitles），
+    # 每次尝试都在本地按当前选项重新选格式与字幕，再用 process_info 直接下载
+    resolved_info = info
+
     # 多层重试策略：
     # 尝试 1: 完整下载（cookies + 字幕）
-    # 尝试 2: 禁用字幕（cookies, 无字幕）—— 处理字幕 429 限流
-    # 尝试 3: 禁用 cookies（无 cookies, 无字幕）—— 处理过期 cookies 导致格式不可用
+    # 尝试 2: 禁用字幕（cookies, 无字幕）—— 处理字幕 429 限流，复用已解析信息
+    # 尝试 3: 禁用 cookies（无 cookies, 无字幕）—— 处理过期 cookies 导致格式不可用，需重新解析
     for attempt in range(3):
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+                if resolved_info is None:
+                    extracted = ydl.extract_info(url, download=False, process=False)
+                    if extracted is None:
+                        raise Exception("yt-dlp extract_info returned None")
+                    resolved_info = ydl.sanitize_info(extracted)
+
+                # 格式与字幕选择（不联网）
+                info = ydl.process_ie_result(copy.deepcopy(resolved_info), download=False)
                 if info is None:
-                    raise Exception("yt-dlp extract_info returned None")
+                    raise Exception("yt-dlp process_ie_result returned None")
+                ydl.process_info(info)
+
                 # 默认使用 m4a 格式（YouTube 原生，无需转换更快速）
                 filename = os.path.join(output_path, f"{info['id']}.m4a")
 
@@ -95,6 +227,8 @@ def download_audio(url: str, output_path: str = "downloads", progress_callback=N
                 # 格式不可用（通常是过期 cookies 导致），去掉 cookies 重试
                 print(f"[Downloader] Format not available, retrying without cookies...")
                 ydl_opts.pop('cookiefile', None)
+                # 已解析信息是带 cookies 得到的格式列表，去掉 cookies 后需重新解析
+                resolved_info = None
                 ydl_opts['writesubtitles'] = False
                 ydl_opts['writeautomaticsub'] = False
                 continue
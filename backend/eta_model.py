@@ -0,0 +1,199 @@
+"""
+任务阶段耗时记录与 ETA 预测
+各阶段的实际耗时、音频时长、模式与主机写入本地 SQLite（cache/stage_timings.db），
+按 (阶段, 模式) 拟合“耗时 = a + b × 音频时长”（b 即该阶段的实时率），样本不足时用默认系数。
+process_task / worker 通过 StageClock 切换阶段，save_status 的 eta 由它动态给出。
+"""
+import os
+import time
+import socket
+import sqlite3
+from app_logger import get_logger
+logger = get_logger(__name__)
+
+TIMINGS_PATH = os.environ.get(
+    "STAGE_TIMINGS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "stage_timings.db"),
+)
+
+# 流水线阶段顺序；import_subtitles（缓存 / 现成字幕）与 transcribe 互斥，占同一位置
+STAGE_ORDER = {
+    "download": 0,
+    "extract_audio": 1,
+    "transcribe": 2,
+    "import_subtitles": 2,
+    "llm": 3,
+    "finalize": 4,
+}
+PIPELINE = ["download", "extract_audio", "transcribe", "llm", "finalize"]
+
+# 默认系数 (a 秒, b 秒/音频秒)；transcribe 按模式区分
+DEFAULT_COEFFICIENTS = {
+    ("download", None): (20.0, 0.01),
+    ("extract_audio", None): (3.0, 0.01),
+    ("transcribe", "local"): (10.0, 0.25),
+    ("transcribe", "cloud"): (5.0, 0.08),
+    ("import_subtitles", None): (2.0, 0.0),
+    ("llm", None): (10.0, 0.02),
+    ("finalize", None): (3.0, 0.0),
+}
+# 音频时长未知时的假定值（与 queue_policy.DEFAULT_DURATION_SECONDS 一致）
+DEFAULT_AUDIO_SECONDS = 600
+MIN_SAMPLES = 5
+SAMPLE_WINDOW = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stage_timings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT,
+    stage TEXT NOT NULL,
+    mode TEXT,
+    host TEXT,
+    audio_seconds REAL,
+    duration_seconds REAL NOT NULL,
+    load_avg REAL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_stage_timings_stage ON stage_timings(stage, mode, id);
+"""
+
+
+def _connect(path=None):
+    path = path or TIMINGS_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _mode_key(stage, mode):
+    """只有转录阶段按模式区分"""
+    return mode if stage == "transcribe" else None
+
+
+def record(stage, duration_seconds, audio_seconds=None, mode=None, task_id=None, host=None, path=None):
+    """写入一条阶段耗时（失败只记日志，不影响任务）"""
+    try:
+        load_avg = os.getloadavg()[0] if hasattr(os, "getloadavg") else None
+        conn = _connect(path)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO stage_timings (task_id, stage, mode, host, audio_seconds, duration_seconds, load_avg, recorded_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (task_id, stage, _mode_key(stage, mode), host or socket.gethostname(),
+                     audio_seconds, duration_seconds, load_avg, time.time()),
+                )
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.info(f"[EtaModel] 记录阶段耗时失败 {stage}: {e}")
+
+
+def fit(samples):
+    """对 [(音频时长, 耗时)] 做最小二乘拟合，返回 (a, b)；系数不为负"""
+    n = len(samples)
+    mean_x = sum(x for x, _ in samples) / n
+    mean_y = sum(y for _, y in samples) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in samples)
+    if var_x <= 1e-9:
+        return mean_y, 0.0
+    b = sum((x - mean_x) * (y - mean_y) for x, y in samples) / var_x
+    b = max(0.0, b)
+    a = max(0.0, mean_y - b * mean_x)
+    return a, b
+
+
+class EtaModel:
+    """按 (阶段, 模式) 拟合的阶段耗时模型；优先使用本机样本，不足时用全部主机样本"""
+
+    def __init__(self, path=None, host=None):
+        self.path = path
+        self.host = host or socket.gethostname()
+        self._coefficients = {}
+
+    def _load_samples(self, stage, mode, host=None):
+        if not os.path.exists(self.path or TIMINGS_PATH):
+            return []
+        conn = _connect(self.path)
+        try:
+            sql = ("SELECT audio_seconds, duration_seconds FROM stage_timings "
+                   "WHERE stage = ? AND mode IS ? AND audio_seconds IS NOT NULL")
+            params = [stage, mode]
+            if host:
+                sql += " AND host = ?"
+                params.append(host)
+            sql += " ORDER BY id DESC LIMIT ?"
+            params.append(SAMPLE_WINDOW)
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def coefficients(self, stage, mode=None):
+        key = (stage, _mode_key(stage, mode))
+        if key not in self._coefficients:
+            coef = DEFAULT_COEFFICIENTS.get(key) or DEFAULT_COEFFICIENTS.get((stage, "local")) \
+                or DEFAULT_COEFFICIENTS.get((stage, None), (5.0, 0.0))
+            try:
+                samples = self._load_samples(*key, host=self.host)
+                if len(samples) < MIN_SAMPLES:
+                    samples = self._load_samples(*key)
+                if len(samples) >= MIN_SAMPLES:
+                    coef = fit(samples)
+            except Exception as e:
+                logger.info(f"[EtaModel] 读取阶段耗时失败 {stage}: {e}")
+            self._coefficients[key] = coef
+        return self._coefficients[key]
+
+    def stage_seconds(self, stage, audio_seconds=None, mode=None):
+        a, b = self.coefficients(stage, mode)
+        return a + b * (audio_seconds or DEFAULT_AUDIO_SECONDS)
+
+    def remaining(self, stage, audio_seconds=None, mode=None, fraction=0.0, elapsed=0.0):
+        """
+        当前阶段剩余 + 后续阶段预测之和（秒）。
+        当前阶段已有进度比例时按实际速度外推，否则用预测值减去已耗时。
+        """
+        predicted = self.stage_seconds(stage, audio_seconds, mode)
+        if fraction >= 0.1:
+            current = elapsed * (1 - fraction) / fraction
+        else:
+            current = max(predicted - elapsed, 0.0)
+
+        order = STAGE_ORDER.get(stage, -1)
+        later = sum(self.stage_seconds(s, audio_seconds, mode) for s in PIPELINE if STAGE_ORDER[s] > order)
+        return int(max(1, round(current + later)))
+
+
+class StageClock:
+    """单个进程内的阶段计时：start() 切换阶段时记录上一阶段耗时，eta() 返回整体剩余秒数"""
+
+    def __init__(self, task_id, mode, audio_seconds=None, model=None):
+        self.task_id = task_id
+        self.mode = mode
+        self.audio_seconds = audio_seconds
+        self.model = model or EtaModel()
+        self.stage = None
+        self.started_at = None
+
+    def start(self, stage):
+        self.stop()
+        self.stage = stage
+        self.started_at = time.time()
+        return self.eta()
+
+    def stop(self):
+        """结束当前阶段并写入耗时"""
+        if self.stage is None:
+            return
+        record(self.stage, time.time() - self.started_at, audio_seconds=self.audio_seconds,
+               mode=self.mode, task_id=self.task_id)
+        self.stage = None
+        self.started_at = None
+
+    def eta(self, fraction=0.0):
+        if self.stage is None:
+            return None
+        return self.model.remaining(self.stage, self.audio_seconds, self.mode,
+                                    fraction=fraction, elapsed=time.time() - self.started_at)
@@ -4,6 +4,7 @@ import subprocess
 import time
 from supabase import create_client
 from dotenv import load_dotenv
+import thumbnails
 
 load_dotenv()
 
@@ -54,6 +55,7 @@ def fix_thumbnails():
 
     fixed_count = 0
     missing_count = 0
+    variant_count = 0
 
     for v in vids:
         video_id = v['id']
@@ -108,7 +110,15 @@ def fix_thumbnails():
             # Rate limiting
             time.sleep(0.5)
 
-    print(f"\nFinished. Fixed: {fixed_count}, Remaining Missing: {missing_count}")
+        # 回填卡片 / 大图 WebP 版本（已生成的直接跳过）
+        if os.path.exists(local_path):
+            before = thumbnails.variants(local_filename)
+            created = thumbnails.generate(local_filename)
+            if len(created) > len(before):
+                print(f"  [VARIANTS] {video_id}: {', '.join(created.values())}")
+                variant_count += 1
+
+    print(f"\nFinished. Fixed: {fixed_count}, Remaining Missing: {missing_count}, Variants generated: {variant_count}")
 
 if __name__ == "__main__":
     fix_thumbnails()
@@ -0,0 +1,42 @@
+"""
+视频关键词同步（keywords / video_keywords）
+关键词 upsert、关联建立与计数自增都在 sync_video_keywords RPC（migrations/006_keyword_sync.sql）
+内一次完成，计数由数据库原子自增。RPC 不可用时直接报错，不退回客户端读改写计数
+（并发任务同时更新同一关键词时会丢失计数）。
+"""
+
+
+class KeywordSyncError(RuntimeError):
+    """sync_video_keywords RPC 调用失败（如未执行 006 迁移）"""
+
+
+def _clean_keywords(keywords):
+    """去除空白与重复关键词，保持原有顺序。"""
+    seen = set()
+    cleaned = []
+    for kw in keywords or []:
+        if not isinstance(kw, str):
+            continue
+        kw_clean = kw.strip()
+        if kw_clean and kw_clean not in seen:
+            seen.add(kw_clean)
+            cleaned.append(kw_clean)
+    return cleaned
+
+
+def sync_video_keywords(client, video_id, keywords):
+    """
+    批量同步视频关键词：一次 sync_video_keywords RPC 完成 upsert、关联与原子计数。
+    返回本次新建立关联的关键词数；RPC 失败时抛出 KeywordSyncError（调用方记录后继续）。
+    """
+    names = _clean_keywords(keywords)
+    if not client or not names:
+        return 0
+
+    try:
+        res = client.rpc("sync_video_keywords", {"p_video_id": video_id, "p_keywords": names}).execute()
+    except Exception as e:
+        print(f"[SUPABASE] sync_video_keywords RPC failed for {video_id}: {e}")
+        raise KeywordSyncError(
+            f"sync_video_keywords RPC 调用失败（需执行 migrations/006_keyword_sync.sql）: {e}") from e
+    return res.data or 0
@@ -4,22 +4,39 @@ import json
 import time
 import asyncio
 import re
-import hashlib
 import random
 import shutil
+import base64
+import threading
 import app_logger
 app_logger.setup()
-from fastapi import FastAPI, BackgroundTasks, HTTPException, UploadFile, File, Form, Header, Depends, Request
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Header, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse, StreamingResponse, Response
 from pydantic import BaseModel
 import shutil
-import hashlib
 import random
 
-from downloader import download_audio
-from processor import split_into_paragraphs, get_youtube_thumbnail_url, translate_content, detect_language_preference
+from downloader import probe_duration
+from processor import split_into_paragraphs, translate_content, detect_language_preference
 from db import get_db
+from view_counter import ViewCountBuffer
+from admin_stats import aggregate_totals, video_llm_usage
+import text_search
+import transcript_index
+import metadata_cache
+import tracker
+import queue_policy
+import metrics
+import tracing
+import upload_store
+import status_store
+import media_cache
+import playback
+import thumbnails
+from progress_hub import ProgressHub
+from status_store import TERMINAL_STATUSES
 
 supabase = get_db()
 
@@ -27,10 +44,26 @@ supabase = get_db()
 CHANNEL_CHECK_INTERVAL_HOURS = 1  # 每小时检查一次频道更新
 MAX_VIDEOS_PER_HOUR = 5           # 每小时最多处理5个新视频
 MAX_VIDEOS_PER_DAY = 50           # 每天最多处理50个视频
+TRACKER_CONCURRENCY = 8           # 单轮追踪中 yt-dlp 子进程的并发上限
+TRACKER_TIMEOUT_SECONDS = 300     # 单轮追踪超时
 _daily_video_count = 0
+_hourly_queued = []               # 近一小时的入队记录 [(时间戳, 数量)]
+_quota_lock = threading.Lock()    # 配额在 tracker 工作线程中累加
+QUEUE_SNAPSHOT_TTL_SECONDS = 5    # /result 排队位置所用队列快照的缓存时间
+_queue_snapshot = {"at": 0.0, "tasks": [], "progress": {}, "positions": {}}
+SSE_KEEPALIVE_SECONDS = 15        # /result/{id}/events 空闲时的心跳间隔
 _last_reset_day = None
 _scheduler_started = False
 
+MEDIA_TOUCH_FLUSH_SECONDS = 60    # /media 访问记录落库间隔
+MEDIA_CACHE_SWEEP_SECONDS = 3600  # 媒体缓存按预算淘汰的间隔
+PLAYBACK_TRANSCODE_INTERVAL_SECONDS = 300  # 补齐播放用 Opus 的检查间隔
+PLAYBACK_TRANSCODE_BATCH = 5               # 每轮最多转码的文件数
+
+# ========== 浏览量写缓冲 ==========
+VIEW_FLUSH_INTERVAL_SECONDS = 30  # 浏览量批量落库间隔
+view_buffer = ViewCountBuffer()
+
 app = FastAPI()
 
 app.add_middleware(
@@ -46,10 +79,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Static files for audio playback
-app.mount("/media", StaticFiles(directory="downloads"), name="media")
+class TrackedStaticFiles(StaticFiles):
+    """静态文件命中时记录访问时间，供媒体缓存按 LRU 淘汰；缩略图版本加长期缓存头"""
 
-DOWNLOADS_DIR = "downloads"
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if path.startswith(f"{thumbnails.THUMBS_SUBDIR}/"):
+            # 文件名含内容哈希，内容变化即换名，可永久缓存
+            if response.status_code in (200, 304):
+                response.headers["Cache-Control"] = thumbnails.IMMUTABLE_CACHE_CONTROL
+        elif response.status_code in (200, 206, 304):
+            media_cache.touch(os.path.join(self.directory, path))
+        return response
+
+
+# 与 media_cache / playback 共用同一个绝对路径，不随启动目录变化
+DOWNLOADS_DIR = media_cache.DOWNLOADS_DIR
 RESULTS_DIR = "results"
 CACHE_DIR = "cache"
 DEV_DOCS_DIR = os.path.join(os.path.dirname(__file__), "..", "dev_docs")
@@ -58,6 +103,9 @@ for d in [DOWNLOADS_DIR, RESULTS_DIR, CACHE_DIR]:
     if not os.path.exists(d):
         os.makedirs(d)
 
+# Static files for audio playback
+app.mount("/media", TrackedStaticFiles(directory=DOWNLOADS_DIR), name="media")
+
 class ProcessRequest(BaseModel):
     url: str
     mode: str = "local"
@@ -74,298 +122,18 @@ class LikeRequest(BaseModel):
     video_id: str
     user_id: str
 
-def save_status(task_id, status, progress, eta=None):
-    with open(f"{RESULTS_DIR}/{task_id}_status.json", "w") as f:
-        json.dump({"status": status, "progress": progress, "eta": eta}, f)
-
-def background_process(task_id, mode, url=None, local_file=None, title=None, thumbnail=None, user_id=None, is_public=True):
-    try:
-        video_id = ""
-        description = ""
-        if url:
-            id_match = re.search(r"(?:v=|\/)([0-9A-Za-z_-]{11})", url)
-            if id_match:
-                video_id = id_match.group(1)
-            else:
-                video_id = hashlib.md5(url.encode()).hexdigest()[:11]
-        elif local_file:
-            video_id = os.path.splitext(os.path.basename(local_file))[0]
-
-        # 1. Media Retrieval
-        file_path = local_file
-        if url:
-            # Check cache
-            possible_exts = ["m4a", "mp3", "mp4", "webm"]
-            for ext in possible_exts:
-                p = f"{DOWNLOADS_DIR}/{video_id}.{ext}"
-                if os.path.exists(p):
-                    file_path = p
-                    break
-            
-            # Metadata Retrieval
-            import yt_dlp
-            ydl_opts_meta = {
-                'quiet': True,
-                'no_warnings': True,
-                'nocheckcertificate': True,
-                'js_runtimes': {'node': {}},
-                'remote_components': {'ejs:github'},
-            }
-
-            # YouTube Cookies Support
-            cookies_path = os.environ.get("YOUTUBE_COOKIES_PATH")
-            if cookies_path and os.path.exists(cookies_path):
-                ydl_opts_meta['cookiefile'] = cookies_path
-            
-            channel = None
-            channel_id = None
-            channel_avatar = None
-            channel_url = None
-
-            try:
-                with yt_dlp.YoutubeDL(ydl_opts_meta) as ydl:
-                    info = ydl.extract_info(url, download=False)
-                    title = info.get('title', title or 'Unknown Title')
-                    thumbnail = info.get('thumbnail', thumbnail)
-                    description = info.get('description', '')
-                    channel = info.get('uploader') or info.get('channel') or info.get('uploader_id')
-                    channel_id = info.get('uploader_id') or info.get('channel_id')
-                    channel_url = info.get('uploader_url') or info.get('channel_url')
-                    
-                    if not channel:
-                        # If extraction failed but we have a channel_id, 
-                        # we'll try to use channel_name if it was already set elsewhere,
-                        # but we won't default to the ID here to avoid UCo2... showing as Name.
-                        pass
-
-                # Separate block for avatar to avoid losing channel info if this fails
-                if channel_url:
-                    try:
-                        with yt_dlp.YoutubeDL({'quiet': True, 'extract_flat': True}) as ydl_chan:
-                            chan_info = ydl_chan.extract_info(channel_url, download=False)
-                            if chan_info and chan_info.get('thumbnails'):
-                                channel_avatar = chan_info['thumbnails'][-1]['url']
-                    except Exception as ce:
-                        print(f"Failed to fetch channel avatar for {channel_url}: {ce}")
-            except Exception as e:
-                print(f"Metadata extraction failed for {url}: {e}")
-                title = title or "Unknown Title"
-                thumbnail = thumbnail or get_youtube_thumbnail_url(url)
-
-            if not file_path:
-                def on_download_progress(p):
-                    current_p = 20 + (p * 0.2)
-                    save_status(task_id, "downloading", int(current_p), eta=35)
-
-                save_status(task_id, "scheduling_download", 20, eta=40)
-                file_path, _, _ = download_audio(url, output_path=DOWNLOADS_DIR, progress_callback=on_download_progress)
-        
-        # 1.5 Audio Extraction (for uploaded videos)
-        transcription_source_path = file_path
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext in [".mp4", ".mov", ".avi", ".webm", ".mkv"]:
-            base_path = os.path.splitext(file_path)[0]
-            extracted_audio_path = base_path + ".mp3"
-            extracted_thumb_path = base_path + ".jpg"
-
-            # Audio extraction
-            if not os.path.exists(extracted_audio_path):
-                save_status(task_id, "extracting_audio", 45, eta=10)
-                print(f"--- Extracting audio from {file_path} to {extracted_audio_path} ---")
-                import subprocess
-                try:
-                    subprocess.run(
-                        ["ffmpeg", "-i", file_path, "-q:a", "0", "-map", "a", extracted_audio_path, "-y"],
-                        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-                    )
-                    transcription_source_path = extracted_audio_path
-                except Exception as e:
-                    print(f"Audio extraction failed: {e}. Trying to transcribe video directly...")
-            else:
-                transcription_source_path = extracted_audio_path
-            
-            # Thumbnail extraction
-            if not os.path.exists(extracted_thumb_path):
-                print(f"--- Extracting thumbnail from {file_path} to {extracted_thumb_path} ---")
-                import subprocess
-                try:
-                    subprocess.run(
-                        ["ffmpeg", "-i", file_path, "-ss", "00:00:01", "-vframes", "1", extracted_thumb_path, "-y"],
-                        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-                    )
-                    thumbnail = os.path.basename(extracted_thumb_path)
-                except Exception as e:
-                    print(f"Thumbnail extraction failed: {e}")
-            else:
-                thumbnail = os.path.basename(extracted_thumb_path)
+class UploadSessionRequest(BaseModel):
+    filename: str
+    size: int
+    part_size: int = None
+    mode: str = "local"
+    user_id: str = None
+    is_public: bool = True
 
-            # Cleanup original video if audio was successfully extracted
-            if os.path.exists(extracted_audio_path) and file_path != extracted_audio_path:
-                try:
-                    print(f"--- Automatic Cleanup: Removing original video file: {file_path} ---")
-                    os.remove(file_path)
-                    file_path = extracted_audio_path  # 更新路径指向已提取的音频，确保 media_path 正确
-                except Exception as e:
-                    print(f"Failed to remove original video: {e}")
-
-        # 2. 启动独立的 Worker 进程执行转录
-        import subprocess
-        worker_script = os.path.join(os.path.dirname(__file__), "worker.py")
-        
-        cmd = [
-            "python3", worker_script,
-            "--file", transcription_source_path,
-            "--title", title or "Unknown",
-            "--description", description,
-            "--model", "large-v3-turbo"
-        ]
-
-        if video_id:
-            cmd.append(f"--video-id={video_id}")
-
-        # "--" 防止以 "-" 开头的 task_id 被 argparse 误判为 flag
-        cmd.extend(["--", task_id, mode])
-        
-        print(f"--- 启动 Worker 进程: {' '.join(cmd)} ---")
-        
-        # 启动 worker 并等待完成
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            cwd=os.path.dirname(__file__)
-        )
-        
-        # 实时输出日志
-        for line in process.stdout:
-            print(f"[Worker] {line.rstrip()}")
-        
-        # 等待进程结束
-        return_code = process.wait()
-        
-        if return_code != 0:
-            stderr_output = process.stderr.read()
-            print(f"[Worker] 错误输出:\n{stderr_output}", file=sys.stderr)
-            raise Exception(f"Worker 进程失败 (exit code: {return_code})")
-        
-        print(f"--- Worker 进程成功完成 ---")
-        
-        # 3. 读取 Worker 生成的结果并补充元数据
-        result_file = f"{RESULTS_DIR}/{task_id}.json"
-        with open(result_file, "r", encoding="utf-8") as f:
-            result = json.load(f)
-        
-        # 补充主进程才有的信息
-        result["url"] = url or "Uploaded File"
-        # 优先使用本地缩略图文件（稳定可靠），仅在不存在时回退到 URL
-        if video_id:
-            local_thumb = f"{DOWNLOADS_DIR}/{video_id}.jpg"
-            if os.path.exists(local_thumb):
-                thumbnail = os.path.basename(local_thumb)
-        result["thumbnail"] = thumbnail
-        result["media_path"] = os.path.basename(file_path)
-        result["user_id"] = user_id
-        result["channel"] = channel
-        result["channel_id"] = channel_id
-        result["channel_avatar"] = channel_avatar
-        
-        # 重新保存
-        with open(result_file, "w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
-            
-        # 4. Save to Supabase
-        if supabase:
-            try:
-                video_data = {
-                    "id": video_id if url else task_id,
-                    "title": result["title"],
-                    "thumbnail": thumbnail,
-                    "user_id": user_id,
-                    "is_public": is_public,
-                    "media_path": os.path.basename(file_path),
-                    "report_data": {
-                        "paragraphs": result["paragraphs"],
-                        "raw_subtitles": result["raw_subtitles"],
-                        "summary": result.get("summary"),
-                        "keywords": result.get("keywords"),
-                        "detected_language": result.get("detected_language"),
-                        "channel": result.get("channel"),
-                        "channel_id": result.get("channel_id"),
-                        "channel_avatar": result.get("channel_avatar")
-                    },
-                    "usage": result["usage"],
-                    "status": "completed"
-                }
-                supabase.table("videos").upsert(video_data).execute()
-                print(f"Successfully saved to Supabase: {video_data['id']}")
-
-                # 4.5 关键词关系持久化
-                keywords = result.get("keywords", [])
-                if keywords:
-                    for kw in keywords:
-                        kw_clean = kw.strip()
-                        if not kw_clean: continue
-                        
-                        # 获取或创建关键词记录并增加计数
-                        kw_res = supabase.table("keywords").select("id, count").eq("name", kw_clean).execute()
-                        if kw_res.data:
-                            kw_id = kw_res.data[0]["id"]
-                            new_count = (kw_res.data[0]["count"] or 0) + 1
-                            supabase.table("keywords").update({"count": new_count}).eq("id", kw_id).execute()
-                        else:
-                            new_kw = supabase.table("keywords").insert({"name": kw_clean, "count": 1}).execute()
-                            if new_kw.data:
-                                kw_id = new_kw.data[0]["id"]
-                            else: continue
-                        
-                        # 建立关联
-                        supabase.table("video_keywords").upsert({
-                            "video_id": video_data["id"],
-                            "keyword_id": kw_id
-                        }).execute()
-                    print(f"Successfully synced {len(keywords)} keywords for {video_data['id']}")
-
-                if user_id:
-                    submission_data = {
-                        "video_id": video_data["id"],
-                        "user_id": user_id,
-                        "task_id": task_id
-                    }
-                    try:
-                        supabase.table("submissions").insert(submission_data).execute()
-                    except Exception as sub_e:
-                        print(f"Submission record already exists or insert failed: {sub_e}")
-                        # Fallback to update to ensure video_id is correctly linked to task_id
-                        supabase.table("submissions").update({
-                            "video_id": video_data["id"]
-                        }).eq("task_id", task_id).execute()
-                    print(f"Successfully saved submission for user: {user_id}")
-
-            except Exception as e:
-                print(f"Failed to save to Supabase: {e}")
-            
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        error_msg = str(e)
-        with open(f"{RESULTS_DIR}/{task_id}_error.json", "w") as f:
-            json.dump({"error": error_msg}, f)
-        save_status(task_id, "failed", 0)
-        # 同步错误信息到数据库
-        if supabase:
-            try:
-                existing = supabase.table("videos").select("report_data").eq("id", task_id).execute()
-                if existing.data:
-                    rd = existing.data[0].get("report_data") or {}
-                    rd["error"] = error_msg
-                    supabase.table("videos").update({
-                        "status": "failed",
-                        "report_data": rd
-                    }).eq("id", task_id).execute()
-                    print(f"[Error] 已将错误信息写入数据库: {task_id}: {error_msg[:100]}")
-            except Exception as db_e:
-                print(f"[Error] 写入数据库错误信息失败: {db_e}")
+def save_status(task_id, status, progress, eta=None):
+    status_store.save_status(task_id, status, progress, eta)
+    # 本进程内的状态变化直接推送给 SSE 订阅者；其他进程的写入由 progress_hub 按版本号发现
+    progress_hub.publish(task_id, {"status": status, "progress": progress, "eta": eta})
 
 @app.post("/process")
 async def process_video(request: ProcessRequest, background_tasks: BackgroundTasks):
@@ -396,7 +164,22 @@ async def process_video(request: ProcessRequest, background_tasks: BackgroundTas
     # 如果无法提取 YouTube ID,使用时间戳
     if not task_id:
         task_id = str(int(time.time()))
-    
+    else:
+        # 单飞：同一视频已在排队 / 处理中或已完成时不重新入队（否则会把 videos 行改回 queued、
+        # 删除已有结果而重复转录），只把当前用户的提交关联到已有任务；已完成的直接返回。
+        # 先查询再 upsert 不是原子操作：并发的首次提交仍可能都入队（见 docs/backend_process_flow.md）
+        existing = _existing_task_status(task_id)
+        if existing:
+            print(f"[Process] 视频 {task_id} 已有任务 ({existing})，合并提交")
+            _link_submission(task_id, request.user_id)
+            return {"task_id": task_id, "deduplicated": True, "status": existing}
+
+    # 元数据缓存中已有时长（如 tracker 解析过）时用于准入估算，并写入供调度估算耗时
+    cached_info = metadata_cache.get_video_info(task_id) if len(task_id) == 11 else None
+    duration = cached_info.get("duration") if cached_info else None
+    _admit_submission({"id": task_id, "source": "manual", "user_id": request.user_id,
+                       "duration": duration, "mode": request.mode})
+
     save_status(task_id, "queued", 0)
 
     # 清理旧的结果和错误文件，防止 GET /result 返回陈旧数据（重新提交场景）
@@ -428,47 +211,65 @@ async def process_video(request: ProcessRequest, background_tasks: BackgroundTas
                     "source": "manual"
                 }
             }
+            if duration:
+                video_data["report_data"]["duration"] = duration
             supabase.table("videos").upsert(video_data).execute()
-            
-            if request.user_id:
-                try:
-                    # 改用 insert + try-update 逻辑,避开缺失的 task_id 唯一约束导致的 upsert 错误
-                    supabase.table("submissions").insert({
-                        "user_id": request.user_id,
-                        "video_id": task_id,
-                        "task_id": task_id
-                    }).execute()
-                except Exception as sub_e:
-                    # 如果 insert 失败(如记录已存在),尝试使用 update
-                    print(f"Submission insert failed in /process (expected if exists): {sub_e}")
-                    supabase.table("submissions").update({
-                        "video_id": task_id
-                    }).eq("task_id", task_id).execute()
+            _link_submission(task_id, request.user_id)
 
         except Exception as e:
             print(f"Failed to create queued record in Supabase: {e}")
 
-    # 不再直接启动 BackgroundTasks，由外部 scheduler.py 轮关注
-    # background_tasks.add_task(background_process, task_id, request.mode, url=request.url, user_id=request.user_id)
+    # 处理由外部 scheduler.py 轮询认领后交给 process_task.py（下载 / 提取音频 / 转录的唯一入口）
     return {"task_id": task_id}
 
-@app.post("/upload")
-async def upload_audio(background_tasks: BackgroundTasks, file: UploadFile = File(...), mode: str = Form("local"), user_id: str = Form(None), is_public: bool = Form(True)):
-    if not user_id:
-        raise HTTPException(status_code=400, detail="需要登录后才能上传文件，请刷新页面重新登录")
-    # 使用文件内容 hash 生成唯一 ID
-    content = await file.read()
-    file_hash = hashlib.md5(content).hexdigest()[:8]
-    
-    # 使用 'up_' 前缀区分上传文件与 YouTube 视频
-    task_id = f"up_{file_hash}"
-    
-    ext = os.path.splitext(file.filename)[1] or ".mp3"
-    file_path = os.path.join(DOWNLOADS_DIR, f"{task_id}{ext}")
-    
-    with open(file_path, "wb") as f:
-        f.write(content)
-    
+def _existing_task_status(task_id):
+    """已有任务的状态（queued / processing / completed），没有或已失败返回 None"""
+    if supabase:
+        try:
+            res = supabase.table("videos").select("status").eq("id", task_id).execute()
+            if res.data:
+                status = res.data[0].get("status")
+                return status if status in ("queued", "processing", "completed") else None
+        except Exception as e:
+            print(f"[Submit] 查询已有任务失败 {task_id}: {e}")
+    if os.path.exists(f"{RESULTS_DIR}/{task_id}.json"):
+        return "completed"
+    local = status_store.get_status(task_id)
+    status = local and local.get("status")
+    return None if status in ("failed", None) else status
+
+
+def _link_submission(task_id, user_id):
+    """把用户的提交关联到任务（/process、/upload 共用，重复提交时只补 submission）"""
+    if not (supabase and user_id):
+        return
+    try:
+        # 改用 insert + try-update 逻辑,避开缺失的 task_id 唯一约束导致的 upsert 错误
+        supabase.table("submissions").insert({
+            "user_id": user_id,
+            "video_id": task_id,
+            "task_id": task_id
+        }).execute()
+    except Exception as sub_e:
+        # 如果 insert 失败(如记录已存在),尝试使用 update
+        print(f"Submission insert failed (expected if exists): {sub_e}")
+        supabase.table("submissions").update({
+            "video_id": task_id
+        }).eq("task_id", task_id).execute()
+
+
+def _queue_uploaded_file(task_id, file_path, title, mode, user_id, is_public, reused_file=False):
+    """
+    为已落盘的上传文件创建任务。同内容任务已在排队 / 处理 / 已完成时不再入队，
+    只为当前用户补一条 submission，返回 {"task_id", "deduplicated"}。
+    """
+    if reused_file:
+        status = _existing_task_status(task_id)
+        if status:
+            print(f"[Upload] 相同内容任务已存在 ({task_id}, {status})，跳过入队")
+            _link_submission(task_id, user_id)
+            return {"task_id": task_id, "deduplicated": True, "status": status}
+
     # Generate random colored thumbnail
     colors = ["#3B82F6", "#10B981", "#F59E0B", "#EF4444", "#8B5CF6", "#EC4899"]
     random_color = random.choice(colors)
@@ -486,7 +287,7 @@ async def upload_audio(background_tasks: BackgroundTasks, file: UploadFile = Fil
         try:
             video_data = {
                 "id": task_id,
-                "title": file.filename,
+                "title": title,
                 "thumbnail": random_color,
                 "media_path": os.path.basename(file_path),
                 "status": "queued",
@@ -497,31 +298,292 @@ async def upload_audio(background_tasks: BackgroundTasks, file: UploadFile = Fil
                     "user_id": user_id,
                     "is_public": is_public,
                     "local_file": file_path,
-                    "source": "manual"
+                    "source": "manual",
+                    "duration": probe_duration(file_path)
                 }
             }
             supabase.table("videos").upsert(video_data).execute()
-            
-            if user_id:
-                try:
-                    # 避开缺少 task_id 唯一约束导致的 upsert 错误
-                    supabase.table("submissions").insert({
-                        "user_id": user_id,
-                        "video_id": task_id,
-                        "task_id": task_id
-                    }).execute()
-                except Exception as sub_e:
-                    print(f"Submission insert failed in /upload (expected if exists): {sub_e}")
-                    supabase.table("submissions").update({
-                        "video_id": task_id
-                    }).eq("task_id", task_id).execute()
+            _link_submission(task_id, user_id)
 
         except Exception as e:
             print(f"Failed to create queued record in Supabase: {e}")
 
-    # background_tasks.add_task(background_process, mode, local_file=file_path, title=file.filename, thumbnail=random_color, user_id=user_id, is_public=is_public)
-    
-    return {"task_id": task_id}
+    return {"task_id": task_id, "deduplicated": False}
+
+
+@app.post("/upload")
+async def upload_audio(request: Request):
+    """
+    表单字段：file、mode（默认 local）、user_id、is_public（默认 true）。
+    直接解析请求流而不用 UploadFile：Starlette 会在进入处理函数前把整个请求体缓存到临时文件，
+    文件会落盘两次，且没有 Content-Length 时要等全部收完才能判断超限。
+    """
+    # 请求体明显超限时直接拒绝（multipart 头部开销按 1MB 估）
+    content_length = int(request.headers.get("content-length") or 0)
+    if content_length > upload_store.MAX_UPLOAD_BYTES + 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"文件超过上传上限 {upload_store.MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+
+    # 按块写入临时文件并增量计算哈希，不在内存中缓存整个文件
+    try:
+        fields, filename, tmp_path, hasher = await upload_store.stream_multipart(
+            request.headers.get("content-type"), request.stream(), DOWNLOADS_DIR)
+    except upload_store.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except upload_store.UploadFormError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 前端先追加文件再追加其他字段，user_id 只能在收完请求体后校验
+    user_id = fields.get("user_id") or None
+    if not user_id:
+        upload_store.discard(tmp_path)
+        raise HTTPException(status_code=400, detail="需要登录后才能上传文件，请刷新页面重新登录")
+    if hasher.size == 0:
+        upload_store.discard(tmp_path)
+        raise HTTPException(status_code=400, detail="上传文件为空")
+    mode = fields.get("mode") or "local"
+    is_public = fields.get("is_public", "true").strip().lower() not in ("false", "0", "off", "no")
+
+    # 以内容哈希命名（'up_' 前缀区分上传文件与 YouTube 视频），相同内容只保留一份
+    ext = upload_store.safe_extension(filename)
+    task_id, file_path, reused = await asyncio.to_thread(upload_store.commit, tmp_path, hasher, ext, DOWNLOADS_DIR)
+
+    return await asyncio.to_thread(
+        _queue_uploaded_file, task_id, file_path, filename, mode, user_id, is_public, reused)
+
+
+# ========== 可续传分片上传：init → PUT 分片 → complete ==========
+
+def _session_or_http_error(func, *args):
+    try:
+        return func(*args)
+    except upload_store.UploadSessionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+@app.post("/upload/sessions")
+async def create_upload_session(req: UploadSessionRequest):
+    """
+    新建续传会话。返回 upload_id、part_size 与 total_parts：
+    分片 i 对应字节范围 [i*part_size, min((i+1)*part_size, size))，逐个 PUT 到 /upload/sessions/{upload_id}/parts/{i}。
+    """
+    if not req.user_id:
+        raise HTTPException(status_code=400, detail="需要登录后才能上传文件，请刷新页面重新登录")
+    meta = await asyncio.to_thread(
+        _session_or_http_error, lambda: upload_store.create_session(
+            DOWNLOADS_DIR, req.filename, req.size, req.part_size,
+            mode=req.mode, user_id=req.user_id, is_public=req.is_public))
+    return upload_store.session_status(meta, DOWNLOADS_DIR)
+
+
+@app.get("/upload/sessions/{upload_id}")
+async def get_upload_session(upload_id: str):
+    """续传时查询已收到 / 缺少的分片"""
+    meta = _session_or_http_error(upload_store.load_session, upload_id, DOWNLOADS_DIR)
+    return await asyncio.to_thread(upload_store.session_status, meta, DOWNLOADS_DIR)
+
+
+@app.put("/upload/sessions/{upload_id}/parts/{index}")
+async def put_upload_part(upload_id: str, index: int, request: Request, x_part_sha256: str = Header(None)):
+    """上传单个分片（请求体为原始字节），X-Part-SHA256 头为该分片的 sha256 十六进制摘要"""
+    if not x_part_sha256:
+        raise HTTPException(status_code=400, detail="缺少 X-Part-SHA256 校验头")
+    meta = _session_or_http_error(upload_store.load_session, upload_id, DOWNLOADS_DIR)
+    try:
+        return await upload_store.write_part(meta, index, request.stream(), x_part_sha256, DOWNLOADS_DIR)
+    except upload_store.UploadSessionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+@app.post("/upload/sessions/{upload_id}/complete")
+async def complete_upload_session(upload_id: str):
+    """校验分片齐全后拼接，按内容哈希落盘并创建 up_{hash} 任务（与 /upload 相同的去重逻辑）"""
+    meta = _session_or_http_error(upload_store.load_session, upload_id, DOWNLOADS_DIR)
+    task_id, file_path, reused = await asyncio.to_thread(
+        _session_or_http_error, upload_store.assemble, meta, DOWNLOADS_DIR)
+    return await asyncio.to_thread(
+        _queue_uploaded_file, task_id, file_path, meta["filename"], meta.get("mode", "local"),
+        meta.get("user_id"), meta.get("is_public", True), reused)
+
+
+@app.delete("/upload/sessions/{upload_id}")
+async def abort_upload_session(upload_id: str):
+    _session_or_http_error(upload_store.load_session, upload_id, DOWNLOADS_DIR)
+    await asyncio.to_thread(upload_store.remove_session, upload_id, DOWNLOADS_DIR)
+    return {"status": "aborted"}
+
+def _refresh_queue_snapshot(now):
+    """刷新队列快照（缓存 QUEUE_SNAPSHOT_TTL_SECONDS 秒），失败返回 False"""
+    if now - _queue_snapshot["at"] <= QUEUE_SNAPSHOT_TTL_SECONDS:
+        return True
+    try:
+        tasks = queue_policy.fetch_active_tasks(supabase)
+    except Exception as e:
+        print(f"[Queue] 获取队列失败: {e}")
+        return False
+    local = status_store.get_statuses(t["id"] for t in tasks if t.get("status") == "processing")
+    progress = {tid: s.get("progress") or 0 for tid, s in local.items()}
+    _queue_snapshot.update({
+        "at": now,
+        "tasks": tasks,
+        "progress": progress,
+        "positions": queue_policy.queue_positions(tasks, now, progress),
+    })
+    return True
+
+def _admit_submission(task):
+    """
+    /process 的准入控制：单用户在途任务超限或预计等待超过积压上限时返回 429 + Retry-After。
+    快照最多滞后数秒，接收后立即把新任务并入快照，突发提交也会被计数。取队列失败时放行。
+    """
+    now = time.time()
+    if not supabase or not _refresh_queue_snapshot(now):
+        return
+    rejected = queue_policy.admission(_queue_snapshot["tasks"], task, now, _queue_snapshot["progress"])
+    if rejected:
+        reason, retry_after = rejected
+        print(f"[Queue] 拒绝提交 {task['id']} ({queue_policy.tenant(task)}): {reason}, retry after {retry_after}s")
+        detail = "您排队中的任务过多，请稍后再提交" if reason == "tenant_inflight_limit" else "当前排队任务过多，请稍后再试"
+        raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(retry_after)})
+    tasks = [t for t in _queue_snapshot["tasks"] if t["id"] != task["id"]]
+    tasks.append({**task, "status": "queued", "created_at": now})
+    _queue_snapshot["tasks"] = tasks
+    _queue_snapshot["positions"] = queue_policy.queue_positions(tasks, now, _queue_snapshot["progress"])
+
+def _queue_info(task_id):
+    """排队任务的位置与预计开始时间（队列快照缓存数秒，轮询不逐次查库）"""
+    now = time.time()
+    if not _refresh_queue_snapshot(now):
+        return {}
+
+    info = _queue_snapshot["positions"].get(task_id)
+    if not info:
+        return {}
+    from datetime import datetime, timezone
+    return {
+        "queue_position": info["queue_position"],
+        "predicted_start_at": datetime.fromtimestamp(info["predicted_start"], timezone.utc).isoformat(),
+        "predicted_wait_seconds": int(max(0, info["predicted_start"] - now)),
+    }
+
+def _live_status(task_id):
+    """
+    progress_hub 的读取函数：只读本地状态库（及 _error.json），不查 Supabase。
+    返回 (版本, 状态)；排队中的任务把队列快照的时间片计入版本，位置变化也能推送。
+    """
+    stored = status_store.get_status(task_id)
+    if not stored:
+        return None, None
+    version = stored["version"]
+    status = status_store.public_fields(stored)
+    if status.get("status") == "failed":
+        error_path = f"{RESULTS_DIR}/{task_id}_error.json"
+        status["detail"] = "Unknown error"
+        if os.path.exists(error_path):
+            try:
+                with open(error_path, "r") as f:
+                    status["detail"] = json.load(f).get("error", status["detail"])
+            except (OSError, ValueError):
+                pass
+    elif status.get("status") == "queued":
+        status.update(_queue_info(task_id))
+        version = (version, int(time.time() // QUEUE_SNAPSHOT_TTL_SECONDS))
+    return version, status
+
+progress_hub = ProgressHub(_live_status)
+
+def _sse_event(status):
+    return f"event: status\ndata: {json.dumps(status, ensure_ascii=False)}\n\n"
+
+@app.get("/result/{task_id}/events")
+async def stream_result_status(request: Request, task_id: str):
+    """
+    任务进度的 Server-Sent Events 流，替代前端对 /result/{id} 的定时轮询。
+    同一任务的所有观看者共享 progress_hub 的一个观察者；completed / failed 后关闭流。
+    """
+    fallback = None
+    _, live = await asyncio.to_thread(_live_status, task_id)
+    if live is None:
+        # 本地尚无状态文件：查一次库确认任务存在（每个连接一次，而非每次推送）
+        fallback = await asyncio.to_thread(_stored_task_status, task_id)
+        if fallback is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+
+    async def events():
+        if fallback:
+            yield _sse_event(fallback)
+            if fallback["status"] in TERMINAL_STATUSES:
+                return
+        async for status in progress_hub.subscribe(task_id, keepalive=SSE_KEEPALIVE_SECONDS):
+            if status is None:
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            yield _sse_event(status)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+def _stored_task_status(task_id):
+    """无本地状态文件时的兜底：Supabase 中的任务状态，或本地结果文件"""
+    if supabase:
+        try:
+            response = supabase.table("videos").select("status").eq("id", task_id).execute()
+            if response.data:
+                status = response.data[0]["status"]
+                return {"status": status, "progress": 100 if status in TERMINAL_STATUSES else 0, "eta": None}
+        except Exception as e:
+            print(f"[SSE] Supabase 查询失败: {e}")
+    if os.path.exists(f"{RESULTS_DIR}/{task_id}.json"):
+        return {"status": "completed", "progress": 100, "eta": None}
+    return None
+
+
+@app.api_route("/playback/{media_path}", methods=["GET", "HEAD"])
+async def serve_playback(request: Request, media_path: str, original: bool = False):
+    """
+    播放器音频：优先返回低码率 Opus 播放版本，尚未生成时回退到原始音频；
+    original=true 时始终返回原始 / 已提取音频（不支持 Ogg Opus 的浏览器用）。
+    支持单段 Range（206 / 416）、ETag / If-None-Match（304）与 If-Range。
+    """
+    path = await asyncio.to_thread(playback.resolve, media_path, DOWNLOADS_DIR, not original)
+    if not path:
+        raise HTTPException(status_code=404, detail="Media not found")
+    st = os.stat(path)
+    tag = playback.etag(st)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": tag,
+        "Cache-Control": playback.CACHE_CONTROL,
+        "Vary": "Range",
+    }
+    media_cache.touch(path)
+    if tag in (request.headers.get("if-none-match") or ""):
+        return Response(status_code=304, headers=headers)
+
+    size = st.st_size
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != tag:
+        range_header = None
+    try:
+        byte_range = playback.parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range:
+        status_code = 206
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    if request.method == "HEAD" or size == 0:
+        return Response(status_code=status_code, headers=headers, media_type=playback.media_type(path))
+    return StreamingResponse(playback.iter_file(path, start, end), status_code=status_code,
+                             headers=headers, media_type=playback.media_type(path))
 
 @app.get("/result/{task_id}")
 async def get_result_status(request: Request, task_id: str, user_id: str = None, lang: str = None):
@@ -587,6 +649,7 @@ async def get_result_status(request: Request, task_id: str, user_id: str = None,
                         "url": "N/A",
                         "youtube_id": video["id"] if len(video["id"]) == 11 else None,
                         "thumbnail": get_full_thumbnail_url(video["thumbnail"], request),
+                        "thumbnail_variants": get_thumbnail_variants(video["thumbnail"], request),
                         "media_path": video["media_path"],
                         "paragraphs": display_paragraphs,
                         "summary": display_summary,
@@ -596,7 +659,7 @@ async def get_result_status(request: Request, task_id: str, user_id: str = None,
                         "channel": report.get("channel"),
                         "channel_id": report.get("channel_id"),
                         "channel_avatar": report.get("channel_avatar"),
-                        "view_count": video.get("view_count", 0),
+                        "view_count": (video.get("view_count") or 0) + view_buffer.pending(task_id),
                         "interaction_count": video.get("interaction_count", 0),
                         "is_liked": is_liked,
                         "mtime": video.get("created_at"),
@@ -606,11 +669,10 @@ async def get_result_status(request: Request, task_id: str, user_id: str = None,
                         "translation_available": translation_available,
                     }
                 elif video["status"] in ("queued", "processing"):
-                    # 任务正在排队或处理中，从本地 _status.json 读取实时进度
-                    status_path = f"{RESULTS_DIR}/{task_id}_status.json"
-                    if os.path.exists(status_path):
-                        with open(status_path, "r") as f:
-                            local_status = json.load(f)
+                    # 任务正在排队或处理中，从本地状态库读取实时进度
+                    local_status = status_store.get_status(task_id)
+                    if local_status:
+                        local_status = status_store.public_fields(local_status)
                         # 竞态修复：本地已 failed 但 Supabase 尚未同步，走 failed 分支逻辑
                         if local_status.get("status") == "failed":
                             error_path = f"{RESULTS_DIR}/{task_id}_error.json"
@@ -619,8 +681,13 @@ async def get_result_status(request: Request, task_id: str, user_id: str = None,
                                 with open(error_path, "r") as ef:
                                     detail = json.load(ef).get("error", detail)
                             return {"status": "failed", "detail": detail, "progress": 0}
+                        if video["status"] == "queued":
+                            local_status.update(_queue_info(task_id))
                         return local_status
-                    return {"status": video["status"], "progress": 0, "eta": None}
+                    status = {"status": video["status"], "progress": 0, "eta": None}
+                    if video["status"] == "queued":
+                        status.update(_queue_info(task_id))
+                    return status
                 elif video["status"] == "failed":
                     # 任务已失败，从本地错误文件获取详情
                     error_path = f"{RESULTS_DIR}/{task_id}_error.json"
@@ -634,13 +701,13 @@ async def get_result_status(request: Request, task_id: str, user_id: str = None,
 
     file_path = f"{RESULTS_DIR}/{task_id}.json"
     error_path = f"{RESULTS_DIR}/{task_id}_error.json"
-    status_path = f"{RESULTS_DIR}/{task_id}_status.json"
     
     # 1. Try finding by Task ID directly
     if os.path.exists(file_path):
         with open(file_path, "r", encoding="utf-8") as f:
             result = json.load(f)
             if "thumbnail" in result:
+                result["thumbnail_variants"] = get_thumbnail_variants(result["thumbnail"], request)
                 result["thumbnail"] = get_full_thumbnail_url(result["thumbnail"], request)
             return {**result, "status": "completed", "progress": 100}
     
@@ -653,6 +720,7 @@ async def get_result_status(request: Request, task_id: str, user_id: str = None,
                         data = json.load(f)
                         if data.get("youtube_id") == task_id:
                             if "thumbnail" in data:
+                                data["thumbnail_variants"] = get_thumbnail_variants(data["thumbnail"], request)
                                 data["thumbnail"] = get_full_thumbnail_url(data["thumbnail"], request)
                             return {**data, "status": "completed", "progress": 100}
                 except:
@@ -661,13 +729,13 @@ async def get_result_status(request: Request, task_id: str, user_id: str = None,
     if os.path.exists(error_path):
         with open(error_path, "r") as f:
             return {"status": "failed", "detail": json.load(f).get("error"), "progress": 0}
-    elif os.path.exists(status_path):
-        with open(status_path, "r") as f:
-            result = json.load(f)
-            if "thumbnail" in result:
-                result["thumbnail"] = get_full_thumbnail_url(result["thumbnail"], request)
-            return result
-            
+    local_status = status_store.get_status(task_id)
+    if local_status:
+        result = status_store.public_fields(local_status)
+        if "thumbnail" in result:
+            result["thumbnail"] = get_full_thumbnail_url(result["thumbnail"], request)
+        return result
+
     raise HTTPException(status_code=404, detail="Task not found")
 
 def get_full_thumbnail_url(thumbnail: str, request: Request = None) -> str:
@@ -688,6 +756,14 @@ def get_full_thumbnail_url(thumbnail: str, request: Request = None) -> str:
     
     return f"{base_url}/media/{thumbnail}"
 
+def get_thumbnail_variants(thumbnail: str, request: Request = None):
+    """缩略图尺寸版本的完整 URL {"card", "full"}（卡片用小图），尚未生成时返回 None，前端回退到 thumbnail"""
+    try:
+        found = thumbnails.variants(thumbnail)
+    except OSError:
+        return None
+    return {k: get_full_thumbnail_url(v, request) for k, v in found.items()} or None
+
 # API Endpoints
 @app.get("/history")
 async def get_history(user_id: str = None):
@@ -704,32 +780,30 @@ async def get_history(user_id: str = None):
             # First, fetch queued/processing videos for active_tasks
             active_vid_res = supabase.table("videos").select("id, status, created_at").order("created_at", desc=True).limit(100).execute()
             print(f"[DEBUG] Raw videos count from Supabase: {len(active_vid_res.data)}")
+            # 处理中任务的本地实时进度：一次查询取回
+            local_statuses = status_store.get_statuses(
+                v["id"] for v in active_vid_res.data if v["status"] == "processing")
             for v in active_vid_res.data:
                 if v["status"] in ["queued", "processing", "failed"]:
                     # failed 任务进度归零，不显示误导性的 100%
                     if v["status"] == "failed":
                         real_progress = 0
                     elif v["status"] == "processing":
-                        # 尝试从本地 _status.json 提取真实进度
+                        # 尝试从本地状态库提取真实进度
                         real_progress = 5
                         real_status = "processing"
-                        local_status_path = f"{RESULTS_DIR}/{v['id']}_status.json"
-                        if os.path.exists(local_status_path):
-                            try:
-                                with open(local_status_path, "r") as f:
-                                    status_data = json.load(f)
-                                    local_s = status_data.get("status")
-                                    # 竞态修复：本地已 failed 但 Supabase 尚未同步
-                                    if local_s == "failed":
-                                        real_progress = 0
-                                        real_status = "failed"
-                                    elif local_s == "completed":
-                                        real_progress = 100
-                                        real_status = "completed"
-                                    else:
-                                        real_progress = status_data.get("progress", real_progress)
-                            except:
-                                pass
+                        status_data = local_statuses.get(v["id"])
+                        if status_data:
+                            local_s = status_data.get("status")
+                            # 竞态修复：本地已 failed 但 Supabase 尚未同步
+                            if local_s == "failed":
+                                real_progress = 0
+                                real_status = "failed"
+                            elif local_s == "completed":
+                                real_progress = 100
+                                real_status = "completed"
+                            else:
+                                real_progress = status_data.get("progress", real_progress)
                         v["status"] = real_status
                     else:
                         real_progress = 0
@@ -834,28 +908,17 @@ async def get_history(user_id: str = None):
 
     # Handle active tasks (remains local for now as they are transient)
     if os.path.exists(RESULTS_DIR):
-        status_files = [f for f in os.listdir(RESULTS_DIR) if f.endswith("_status.json")]
-        for sf in status_files:
-            tid = sf.replace("_status.json", "")
+        # queued / processing 不限时间，其余状态只显示最近一小时内更新的（一次查询）
+        from datetime import datetime
+        for tid, status_data in status_store.list_active(recent_seconds=3600):
             if tid in active_taskId_set:
                 continue # Already added from Supabase
-                
             if not os.path.exists(f"{RESULTS_DIR}/{tid}.json") and not os.path.exists(f"{RESULTS_DIR}/{tid}_error.json"):
-                mtime = os.path.getmtime(f"{RESULTS_DIR}/{sf}")
-                from datetime import datetime
-                mtime_str = datetime.fromtimestamp(mtime).isoformat()
-                # For queued/processing, don't limit to 3600s if it's recently submitted
-                try:
-                    with open(f"{RESULTS_DIR}/{sf}", "r") as f:
-                        status_data = json.load(f)
-                        status = status_data.get("status", "pending")
-                        # If it's queued or processing, show it regardless of 1-hour limit (maybe up to 24h)
-                        if status in ["queued", "processing"] or (time.time() - mtime < 3600):
-                            active_tasks.append({
-                                "id": tid, "status": status,
-                                "progress": status_data.get("progress", 0), "mtime": mtime_str
-                            })
-                except: pass
+                active_tasks.append({
+                    "id": tid, "status": status_data["status"],
+                    "progress": status_data.get("progress", 0),
+                    "mtime": datetime.fromtimestamp(status_data["updated_at"]).isoformat()
+                })
                 
         # 3. Fetch recent processing history (last 50, all statuses)
         recent_records = []
@@ -898,119 +961,163 @@ async def get_history(user_id: str = None):
         "summary": {"total_duration": 0, "total_cost": 0, "video_count": 0}
     }
 
+def _encode_explore_cursor(created_at, video_id):
+    """键集分页游标：(created_at, id) 编码为 URL 安全字符串"""
+    raw = f"{created_at}|{video_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _decode_explore_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    created_at, video_id = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|", 1)
+    return created_at, video_id
+
 @app.get("/explore")
-async def get_explore(request: Request, page: int = 1, limit: int = 24, q: str = None, user_id: str = None):
+async def get_explore(request: Request, page: int = 1, limit: int = 24, q: str = None, user_id: str = None, cursor: str = None):
+    """
+    首页视频流。传 cursor 时走键集分页（响应中的 next_cursor 用于下一页），
+    否则按 page 兼容页码分页。检索、隐藏与上传过滤均在数据库内完成（见 migrations/009_explore_search.sql）。
+    """
     req_user_id = user_id # Rename locally for clarity
+    limit = max(1, min(limit, 100))
     if not supabase:
         # Fallback to local history but only YouTube ones
         try:
             res = await get_history(user_id=req_user_id)
             items = [i for i in res.get("items", []) if len(str(i.get("id", ""))) == 11]
             
-            # Simple local pagination and search
+            # 本地检索：与数据库相同的 CJK 二元切分口径
             if q:
-                q = q.lower()
-                items = [i for i in items if q in str(i.get("title", "")).lower()]
-                
-            start = (page - 1) * limit
-            end = start + limit
+                items = [i for i in items if text_search.matches(q, str(i.get("title", "")))]
+
+            # 本地键集分页：按 (mtime, id) 降序
+            items.sort(key=lambda i: (str(i.get("mtime", "")), str(i.get("id", ""))), reverse=True)
+            if cursor:
+                try:
+                    c_time, c_id = _decode_explore_cursor(cursor)
+                except Exception:
+                    raise HTTPException(status_code=400, detail="Invalid cursor")
+                page_items = [i for i in items if (str(i.get("mtime", "")), str(i.get("id", ""))) < (c_time, c_id)][:limit]
+            else:
+                start = (page - 1) * limit
+                page_items = items[start:start + limit]
+
+            next_cursor = None
+            if len(page_items) == limit:
+                last = page_items[-1]
+                next_cursor = _encode_explore_cursor(last.get("mtime", ""), last.get("id", ""))
             return {
-                "items": items[start:end],
+                "items": page_items,
                 "total": len(items),
                 "page": page,
-                "limit": limit
+                "limit": limit,
+                "next_cursor": next_cursor
             }
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"Explore fallback failed: {e}")
-            return {"items": [], "total": 0, "page": page, "limit": limit}
+            return {"items": [], "total": 0, "page": page, "limit": limit, "next_cursor": None}
     
-    try:
-        # 获取隐藏频道列表
-        hidden_channel_ids = set()
+    params = {"p_query": q or None, "p_limit": limit}
+    if cursor:
         try:
-            hidden_channels = supabase.table("channel_settings") \
-                .select("channel_id") \
-                .eq("hidden_from_home", True) \
-                .execute()
-            if hidden_channels.data:
-                hidden_channel_ids = {c["channel_id"] for c in hidden_channels.data}
-        except Exception as e:
-            # 表可能不存在，忽略错误
-            print(f"[Explore] channel_settings 查询失败（表可能不存在）: {e}")
-        
-        # Start building the query
-        # 确保 req_user_id 在查询中可用（如果需要隐私过滤）
-        query = supabase.table("videos") \
-            .select("id, title, thumbnail, created_at, view_count, status, hidden_from_home, is_public, report_data->channel, report_data->channel_id, report_data->channel_avatar, report_data->summary, report_data->keywords", count="exact") \
-            .eq("status", "completed") \
-            .eq("is_public", True)
-            
-        if q:
-            search_query = f"%{q}%"
-            query = query.or_(f"title.ilike.{search_query},report_data->>channel.ilike.{search_query},report_data->>summary.ilike.{search_query}")
+            params["p_cursor_created_at"], params["p_cursor_id"] = _decode_explore_cursor(cursor)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    else:
+        params["p_offset"] = (page - 1) * limit
 
-        # Execute with pagination
-        start = (page - 1) * limit
-        end = start + limit - 1
-        
-        response = query.order("created_at", desc=True) \
-            .range(start, end) \
-            .execute()
-        
-        # If req_user_id is provided, fetch their liked videos to mark items
+    try:
+        def fetch_page():
+            return supabase.rpc("explore_videos", params).execute()
+
+        def fetch_total():
+            # 游标模式不需要总数，省去一次计数查询
+            if cursor:
+                return None
+            return supabase.rpc("explore_videos_count", {"p_query": q or None}).execute()
+
+        def fetch_likes():
+            if not req_user_id:
+                return None
+            return supabase.table("user_likes").select("video_id").eq("user_id", req_user_id).execute()
+
+        response, count_res, like_res = await asyncio.gather(
+            asyncio.to_thread(fetch_page),
+            asyncio.to_thread(fetch_total),
+            asyncio.to_thread(fetch_likes),
+            return_exceptions=True
+        )
+        if isinstance(response, Exception):
+            raise response
+
+        # If req_user_id is provided, mark their liked videos
         liked_ids = set()
-        if req_user_id:
-            try:
-                like_res = supabase.table("user_likes").select("video_id").eq("user_id", req_user_id).execute()
-                if like_res.data:
-                    liked_ids = {l["video_id"] for l in like_res.data}
-            except Exception as le:
-                print(f"Failed to fetch likes in explore: {le}")
+        if isinstance(like_res, Exception):
+            print(f"Failed to fetch likes in explore: {like_res}")
+        elif like_res is not None and like_res.data:
+            liked_ids = {l["video_id"] for l in like_res.data}
 
         items = []
-        if response.data:
-            for v in response.data:
-                # Skip uploads - heuristic: youtube IDs are 11 chars
-                vid = str(v.get("id", ""))
-                if len(vid) != 11 or vid.startswith("up_"):
-                    continue
-                
-                # Skip hidden videos (individual or by channel)
-                if v.get("hidden_from_home"):
-                    continue
-                
-                video_channel_id = v.get("channel_id")
-                if video_channel_id and video_channel_id in hidden_channel_ids:
-                    continue
-                
-                items.append({
-                    "id": vid,
-                    "title": v.get("title", "Untitled"),
-                    "thumbnail": get_full_thumbnail_url(v.get("thumbnail", ""), request),
-                    "channel": v.get("channel"),
-                    "channel_id": v.get("channel_id"),
-                    "channel_avatar": v.get("channel_avatar"),
-                    "summary": v.get("summary"),
-                    "keywords": v.get("keywords"),
-                    "date": v.get("created_at"),
-                    "views": v.get("view_count", 0),
-                    "is_liked": vid in liked_ids
-                })
+        for v in response.data or []:
+            vid = str(v.get("id", ""))
+            items.append({
+                "id": vid,
+                "title": v.get("title", "Untitled"),
+                "thumbnail": get_full_thumbnail_url(v.get("thumbnail", ""), request),
+                "thumbnail_variants": get_thumbnail_variants(v.get("thumbnail", ""), request),
+                "channel": v.get("channel"),
+                "channel_id": v.get("channel_id"),
+                "channel_avatar": v.get("channel_avatar"),
+                "summary": v.get("summary"),
+                "keywords": v.get("keywords"),
+                "date": v.get("created_at"),
+                "views": v.get("view_count", 0),
+                "is_liked": vid in liked_ids
+            })
+
+        total = None
+        if isinstance(count_res, Exception):
+            print(f"[Explore] Count failed: {count_res}")
+        elif count_res is not None:
+            total = count_res.data
+
+        next_cursor = None
+        if len(items) == limit:
+            last = response.data[-1]
+            next_cursor = _encode_explore_cursor(last["created_at"], last["id"])
             
         return {
             "items": items,
-            "total": response.count if response.count is not None else len(items),
+            "total": total if total is not None else len(items),
             "page": page,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": next_cursor
         }
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
         print(f"[Explore] Fetch failed: {e}")
-        # Explicitly check for NameError to debug if it persists
-        if isinstance(e, NameError):
-            print(f"[Explore] Critical NameError: {e}. Check local scope.")
-        return {"items": [], "total": 0, "page": page, "limit": limit}
+        return {"items": [], "total": 0, "page": page, "limit": limit, "next_cursor": None}
+
+
+@app.get("/search")
+async def search_transcripts(request: Request, q: str = None, limit: int = 20, user_id: str = None):
+    """在转录全文、标题与摘要中检索，返回视频及命中句子的时间戳与高亮摘要"""
+    if not q or not q.strip():
+        return {"query": q, "items": []}
+    limit = max(1, min(limit, 50))
+    try:
+        items = await asyncio.to_thread(transcript_index.search, q, limit, user_id)
+    except Exception as e:
+        print(f"[Search] 检索失败: {e}")
+        return {"query": q, "items": []}
+    for item in items:
+        item["thumbnail_variants"] = get_thumbnail_variants(item.get("thumbnail"), request)
+        item["thumbnail"] = get_full_thumbnail_url(item.get("thumbnail"), request)
+    return {"query": q, "items": items}
 
 
 @app.get("/trending-keywords")
@@ -1106,6 +1213,7 @@ async def get_bookshelf(request: Request, user_id: str, limit: int = 40):
                     "id": video["id"],
                     "title": video["title"],
                     "thumbnail": get_full_thumbnail_url(video["thumbnail"], request),
+                    "thumbnail_variants": get_thumbnail_variants(video["thumbnail"], request),
                     "mtime": item["created_at"],
                     "status": video["status"],
                     "is_public": video.get("is_public", True),
@@ -1124,6 +1232,7 @@ async def get_bookshelf(request: Request, user_id: str, limit: int = 40):
                         "id": video["id"],
                         "title": video["title"],
                         "thumbnail": get_full_thumbnail_url(video["thumbnail"], request),
+                        "thumbnail_variants": get_thumbnail_variants(video["thumbnail"], request),
                         "mtime": item["created_at"],
                         "status": video["status"],
                         "is_public": video.get("is_public", True),
@@ -1216,7 +1325,6 @@ async def get_dev_doc(filename: str):
 # 双语翻译端点
 # ═══════════════════════════════════════════════════════════════
 
-import threading
 _translate_locks = {}  # video_id -> Lock
 
 class TranslateRequest(BaseModel):
@@ -1316,17 +1424,9 @@ async def translate_video(video_id: str, req: TranslateRequest):
 async def add_view(task_id: str):
     if not supabase:
         return {"status": "ok", "message": "Local mode, no DB update"}
-    try:
-        # Get current view count
-        response = supabase.table("videos").select("view_count").eq("id", task_id).execute()
-        if response.data:
-            current_count = response.data[0].get("view_count", 0)
-            supabase.table("videos").update({"view_count": current_count + 1}).eq("id", task_id).execute()
-            return {"status": "success", "view_count": current_count + 1}
-        return {"status": "error", "message": "Video not found"}
-    except Exception as e:
-        print(f"Failed to increment view count: {e}")
-        return {"status": "error", "message": str(e)}
+    # 仅写入进程内缓冲，由 view_flush_loop 定期批量原子落库
+    view_buffer.add(task_id)
+    return {"status": "success", "pending": view_buffer.pending(task_id)}
 
 @app.post("/result/{task_id}/like")
 async def toggle_like_legacy(task_id: str):
@@ -1423,6 +1523,7 @@ async def dev_compare_subtitles(video_id: str):
                 try:
                     with open(os.path.join(CACHE_DIR, f), "r", encoding="utf-8") as rf:
                         models_data[model_name] = json.load(rf)
+                    media_cache.touch(os.path.join(CACHE_DIR, f))
                 except: continue
 
     return {
@@ -1516,19 +1617,26 @@ async def get_visibility_settings(request: Request):
 
 @app.get("/admin/stats", dependencies=[Depends(verify_admin_key)])
 async def get_admin_stats():
-    """获取管理驾驶舱的核心统计数据"""
+    """获取管理驾驶舱的核心统计数据（读取触发器维护的预聚合表，耗时与归档规模无关）"""
     if not supabase:
         return {"error": "Database not connected"}
     
     try:
-        # 1. 获取所有视频的基本数据用于统计
-        # 增加 report_data 字段以进行用量估算
-        all_videos_res = supabase.table("videos") \
-            .select("id, title, status, usage, report_data, interaction_count, view_count, created_at") \
-            .execute()
-        all_videos = all_videos_res.data if all_videos_res.data else []
-        
-        video_count = len(all_videos)
+        # 1. 全局汇总：由 migrations/008_admin_stats.sql 的触发器增量维护
+        totals = None
+        try:
+            totals_res = supabase.table("admin_stats_totals").select("*").eq("id", 1).execute()
+            if totals_res.data:
+                totals = totals_res.data[0]
+        except Exception as e:
+            print(f"[Admin] admin_stats_totals 查询失败（迁移 008 可能未执行），回退到轻量扫描: {e}")
+
+        if totals is None:
+            # 回退：只读取用量相关的小字段，不再拉取 report_data
+            scan_res = supabase.table("videos") \
+                .select("status, usage, view_count, interaction_count") \
+                .execute()
+            totals = aggregate_totals(scan_res.data or [])
         
         # 2. 活跃用户 (DAU) - 过去 24 小时有行为的用户数
         from datetime import datetime, timedelta
@@ -1543,78 +1651,18 @@ async def get_admin_stats():
         unique_users = set(v["user_id"] for v in dau_res.data) if dau_res.data else set()
         dau_count = len(unique_users)
         
-        # 3. 统计项初始化
-        total_interactions = 0
-        total_views = 0
-        total_llm_cost = 0.0
-        llm_usage_history = []
-        
-        # 估算函数：基于文本长度估算 Token 和费用
-        def estimate_llm_usage(report_data):
-            if not report_data: return 0, 0, 0.0
-            
-            # 提取文本
-            text = ""
-            paragraphs = report_data.get("paragraphs") or []
-            if paragraphs:
-                for p in paragraphs:
-                    for s in p.get("sentences", []):
-                        text += s.get("text", "")
-            
-            if not text:
-                raw_subs = report_data.get("raw_subtitles") or []
-                text = "".join([s.get("text", "") for s in raw_subs])
-            
-            char_count = len(text)
-            if char_count == 0: return 0, 0, 0.0
-            
-            # 估算逻辑：1汉字 ≈ 1.5 token (考虑提示词开销 * 2.5 倍率)
-            estimated_tokens = int(char_count * 2.5)
-            # 按照 gpt-4o-mini 平均值 $0.15/1M tokens 估算
-            estimated_cost = (estimated_tokens / 1000000.0) * 0.15
-            
-            return int(estimated_tokens * 0.7), int(estimated_tokens * 0.3), estimated_cost
-
-        # 4. 遍历视频进行聚合
-        for v in all_videos:
-            total_interactions += (v.get("interaction_count") or 0)
-            total_views += (v.get("view_count") or 0)
-            
-            usage = v.get("usage") or {}
-            cost = usage.get("llm_cost")
-            
-            is_estimated = False
-            if cost is None or cost == 0:
-                if v.get("status") == "completed":
-                    _, _, est_cost = estimate_llm_usage(v.get("report_data"))
-                    cost = est_cost
-                    is_estimated = True
-                else:
-                    cost = 0.0
-            
-            total_llm_cost += cost
+        # 3. 最近 20 条 LLM 用量记录（估算值已在写入时存入 usage.estimated_llm）
+        recent_res = supabase.table("videos") \
+            .select("id, title, status, usage, created_at") \
+            .order("created_at", desc=True) \
+            .limit(20) \
+            .execute()
 
-            # 构建历史记录（取最近 20 条）
-            # 我们先存起来，后面排序
-        
-        # 5. 构建 LLM 历史记录
-        sorted_videos = sorted(all_videos, key=lambda x: x.get("created_at", ""), reverse=True)
-        for v in sorted_videos[:20]:
+        llm_usage_history = []
+        for v in recent_res.data or []:
             usage = v.get("usage") or {}
-            report_data = v.get("report_data") or {}
-            
-            p_tokens = usage.get("llm_tokens", {}).get("prompt_tokens")
-            c_tokens = usage.get("llm_tokens", {}).get("completion_tokens")
-            cost = usage.get("llm_cost")
             model = usage.get("model", "gpt-4o-mini")
-            is_estimated = False
-            
-            if cost is None or cost == 0:
-                if v.get("status") == "completed":
-                    p_tokens, c_tokens, cost = estimate_llm_usage(report_data)
-                    is_estimated = True
-                else:
-                    p_tokens, c_tokens, cost = 0, 0, 0.0
+            p_tokens, c_tokens, cost, is_estimated = video_llm_usage(v.get("status"), usage)
 
             llm_usage_history.append({
                 "id": v["id"],
@@ -1627,29 +1675,94 @@ async def get_admin_stats():
                 "created_at": v["created_at"]
             })
 
-        # 6. 热力图数据
+        # 4. 近 30 天每日 LLM 用量
+        llm_usage_daily = []
+        try:
+            daily_res = supabase.table("admin_llm_usage_daily") \
+                .select("*") \
+                .order("day", desc=True) \
+                .limit(30) \
+                .execute()
+            llm_usage_daily = daily_res.data or []
+        except Exception as e:
+            print(f"[Admin] admin_llm_usage_daily 查询失败: {e}")
+
+        # 5. 热力图数据
         heatmap_res = supabase.table("admin_heatmap_data").select("*").execute()
         
-        # 7. 爆款视频 Top 5
-        top_videos = sorted(all_videos, key=lambda x: (x.get("interaction_count") or 0), reverse=True)[:5]
+        # 6. 爆款视频 Top 5
+        top_res = supabase.table("videos") \
+            .select("id, title, interaction_count") \
+            .order("interaction_count", desc=True) \
+            .limit(5) \
+            .execute()
+        top_videos = top_res.data or []
         
+        total_clicks = int(totals.get("total_interactions") or 0) + int(totals.get("total_views") or 0)
         return {
             "stats": {
-                "video_count": f"{video_count:,}",
+                "video_count": f"{int(totals.get('video_count') or 0):,}",
                 "dau": str(dau_count),
-                "total_clicks": f"{total_interactions + total_views:,}", 
-                "total_llm_cost": f"${total_llm_cost:,.2f}",
+                "total_clicks": f"{total_clicks:,}", 
+                "total_llm_cost": f"${float(totals.get('total_llm_cost') or 0):,.2f}",
                 "retention": "84%" 
             },
             "heatmap": heatmap_res.data,
             "top_videos": [{"id": v["id"], "title": v["title"], "interaction_count": v.get("interaction_count", 0)} for v in top_videos],
-            "llm_usage_history": llm_usage_history
+            "llm_usage_history": llm_usage_history,
+            "llm_usage_daily": llm_usage_daily
         }
     except Exception as e:
         print(f"Failed to fetch admin stats: {e}")
         return {"error": str(e)}
 
 
+@app.get("/metrics", dependencies=[Depends(verify_admin_key)])
+async def get_metrics():
+    """
+    Prometheus 文本格式的运行指标（各进程累计写入 cache/metrics.db）：
+    阶段耗时直方图、转录实时率、各 LLM 服务器 token 速度、缓存命中、任务完成/失败计数。
+    抓取时需带 X-Admin-Key 头。
+    """
+    body = await asyncio.to_thread(metrics.render_prometheus)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/admin/traces/{task_id}", dependencies=[Depends(verify_admin_key)])
+async def get_task_traces(task_id: str):
+    """
+    任务的执行链路（scheduler → process_task → worker 各阶段 span），每次执行一个 trace，最近的在前。
+    span 含 depth（嵌套层级）、耗时、状态与属性，可直接按 depth 缩进展示。
+    """
+    traces = await asyncio.to_thread(tracing.read_trace, task_id)
+    if not traces:
+        raise HTTPException(status_code=404, detail="No trace recorded for this task")
+    return {"task_id": task_id, "traces": traces}
+
+
+@app.get("/admin/tasks/{task_id}/status-history", dependencies=[Depends(verify_admin_key)])
+async def get_task_status_history(task_id: str):
+    """任务当前状态与本轮处理的阶段切换记录（来自本地状态库）"""
+    current = await asyncio.to_thread(status_store.get_status, task_id)
+    if not current:
+        raise HTTPException(status_code=404, detail="Task not found")
+    history = await asyncio.to_thread(status_store.get_history, task_id)
+    return {"task_id": task_id, "current": current, "history": history}
+
+
+@app.get("/admin/media-cache", dependencies=[Depends(verify_admin_key)])
+async def get_media_cache_usage():
+    """媒体缓存各类别（音频 / 视频 / 字幕 / 缩略图 / ASR）的占用、预算、固定文件数与磁盘余量"""
+    return await asyncio.to_thread(media_cache.usage)
+
+
+@app.post("/admin/media-cache/sweep", dependencies=[Depends(verify_admin_key)])
+async def sweep_media_cache(dry_run: bool = False):
+    """立即执行一轮缓存淘汰；dry_run=true 时只返回将被删除的文件"""
+    return await asyncio.to_thread(media_cache.sweep, dry_run)
+
+
+
 @app.post("/admin/visibility/channel", dependencies=[Depends(verify_admin_key)])
 async def update_channel_settings(request: ChannelSettingsRequest):
     """更新频道设置"""
@@ -1667,6 +1780,8 @@ async def update_channel_settings(request: ChannelSettingsRequest):
         data["updated_at"] = "now()"
         
         supabase.table("channel_settings").upsert(data).execute()
+        if request.hidden_from_home is not None:
+            await asyncio.to_thread(transcript_index.set_channel_hidden, request.channel_id, request.hidden_from_home)
         return {"status": "success"}
     except Exception as e:
         print(f"Failed to update channel settings: {e}")
@@ -1683,6 +1798,8 @@ async def update_video_visibility(request: VideoVisibilityRequest):
             .update({"hidden_from_home": request.hidden_from_home}) \
             .eq("id", request.video_id) \
             .execute()
+        # 全文检索与 /explore 使用同一可见性
+        await asyncio.to_thread(transcript_index.set_visibility, request.video_id, hidden=request.hidden_from_home)
         return {"status": "success"}
     except Exception as e:
         print(f"Failed to update video visibility: {e}")
@@ -1690,11 +1807,10 @@ async def update_video_visibility(request: VideoVisibilityRequest):
 
 # ========== 后台调度任务 ==========
 async def run_channel_tracker():
-    """异步运行频道追踪脚本（不阻塞事件循环）"""
+    """在 API 进程内执行一轮频道追踪，按每日 / 每小时配额限制入队数量"""
     global _daily_video_count, _last_reset_day
 
     from datetime import date
-    import subprocess
 
     # 每日重置计数器
     today = date.today()
@@ -1703,52 +1819,60 @@ async def run_channel_tracker():
         _last_reset_day = today
         print(f"[Tracker] 新的一天，重置每日视频计数器")
 
-    # 检查每日限额
-    if _daily_video_count >= MAX_VIDEOS_PER_DAY:
-        print(f"[Tracker] 已达每日处理上限 ({MAX_VIDEOS_PER_DAY})，跳过本次检查")
-        return
-
-    print(f"[Tracker] 开始检查频道更新... (今日已处理: {_daily_video_count}/{MAX_VIDEOS_PER_DAY})")
+    # 最近一小时内已入队的数量（滑动窗口）
+    now = time.time()
+    _hourly_queued[:] = [(t, n) for t, n in _hourly_queued if now - t < 3600]
+    hourly_count = sum(n for _, n in _hourly_queued)
+
+    budget = min(MAX_VIDEOS_PER_DAY - _daily_video_count, MAX_VIDEOS_PER_HOUR - hourly_count)
+    # tracker 作为公平排队中的一个租户，同样受在途任务上限约束
+    tracker_inflight = 0
+    if supabase and await asyncio.to_thread(_refresh_queue_snapshot, now):
+        tracker_inflight = sum(1 for t in _queue_snapshot["tasks"]
+                               if queue_policy.tenant(t) == queue_policy.TRACKER_TENANT)
+        budget = min(budget, queue_policy.MAX_INFLIGHT_PER_TENANT - tracker_inflight)
+    if budget <= 0:
+        print(f"[Tracker] 已达处理上限 (今日 {_daily_video_count}/{MAX_VIDEOS_PER_DAY}, "
+              f"近一小时 {hourly_count}/{MAX_VIDEOS_PER_HOUR}, "
+              f"在途 {tracker_inflight}/{queue_policy.MAX_INFLIGHT_PER_TENANT})，跳过本次检查")
+        return None
+
+    print(f"[Tracker] 开始检查频道更新... (今日已处理: {_daily_video_count}/{MAX_VIDEOS_PER_DAY}, 本轮配额: {budget})")
+
+    charged = []
+
+    def charge_quota(n):
+        """每批入队落库后立即计入每日 / 每小时配额（在 tracker 的工作线程中调用）"""
+        global _daily_video_count
+        with _quota_lock:
+            _daily_video_count += n
+            _hourly_queued.append((now, n))
+            charged.append(n)
 
     try:
-        # 运行 channel_tracker.py
-        script_path = os.path.join(os.path.dirname(__file__), "scripts", "channel_tracker.py")
-        venv_python = os.path.join(os.path.dirname(__file__), "venv", "bin", "python3")
-        env = os.environ.copy()
-        env["PYTHONPATH"] = os.path.dirname(__file__)
-
-        # 使用 asyncio.to_thread 避免阻塞事件循环
-        result = await asyncio.to_thread(
-            subprocess.run,
-            [venv_python, script_path],
-            capture_output=True,
-            text=True,
-            cwd=os.path.dirname(__file__),
-            env=env,
-            timeout=300  # 5分钟超时
+        result = await asyncio.wait_for(
+            tracker.run_tracker(supabase, max_new=budget, concurrency=TRACKER_CONCURRENCY,
+                                on_queued=charge_quota),
+            timeout=TRACKER_TIMEOUT_SECONDS,
         )
-
-        if result.returncode == 0:
-            # 解析添加了多少新任务（channel_tracker.py 通过 print 输出到 stdout）
-            import re
-            match = re.search(r"Added (\d+) tasks", result.stdout)
-            if match:
-                added = int(match.group(1))
-                _daily_video_count += added
-                print(f"[Tracker] 频道检查完成，已排队 {added} 个任务 (今日累计: {_daily_video_count})")
-            else:
-                print(f"[Tracker] 频道检查完成，但未解析到任务数")
-        else:
-            print(f"[Tracker] 频道检查失败 (exit {result.returncode})")
-
-        # 始终输出 stderr 供调试（tracker 的详细日志在 stderr）
-        if result.stderr:
-            for line in result.stderr.strip().split('\n')[-5:]:  # 最后5行
-                print(f"[Tracker] {line}")
-    except subprocess.TimeoutExpired:
-        print(f"[Tracker] 频道检查超时 (>300s)")
+    except asyncio.TimeoutError:
+        # 超时前已入队的任务已通过 charge_quota 计入配额
+        print(f"[Tracker] 频道检查超时 (>{TRACKER_TIMEOUT_SECONDS}s)，超时前已排队 {sum(charged)} 个任务 "
+              f"(今日累计: {_daily_video_count})")
+        return None
     except Exception as e:
         print(f"[Tracker] 频道检查异常: {e}")
+        return None
+
+    if result["status"] != "success":
+        print(f"[Tracker] 频道检查失败: {result['message']}")
+        return result
+
+    added = result["retried"] + result["new"]
+    print(f"[Tracker] 频道检查完成，已排队 {added} 个任务 ({result['retried']} 重试, {result['new']} 新视频, "
+          f"{result['deferred']} 个超出配额顺延; 检查 {result['channels_checked']}/{result['channels_total']} 个频道) "
+          f"(今日累计: {_daily_video_count})")
+    return result
 
 
 async def scheduler_loop():
@@ -1774,11 +1898,61 @@ async def scheduler_loop():
         await asyncio.sleep(CHANNEL_CHECK_INTERVAL_HOURS * 3600)
 
 
+async def view_flush_loop():
+    """定期将浏览量缓冲批量写入数据库"""
+    while True:
+        await asyncio.sleep(VIEW_FLUSH_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(view_buffer.flush, supabase)
+        except Exception as e:
+            print(f"[ViewCounter] 刷新循环异常: {e}")
+
+
+async def media_cache_loop():
+    """定期落库 /media 访问记录，并按预算淘汰缓存文件"""
+    last_sweep = 0
+    while True:
+        await asyncio.sleep(MEDIA_TOUCH_FLUSH_SECONDS)
+        try:
+            await asyncio.to_thread(media_cache.flush_touches)
+            if time.time() - last_sweep >= MEDIA_CACHE_SWEEP_SECONDS:
+                last_sweep = time.time()
+                await asyncio.to_thread(media_cache.sweep)
+        except Exception as e:
+            print(f"[MediaCache] 清理循环异常: {e}")
+
+
+async def playback_transcode_loop():
+    """后台为已完成任务的音频生成低码率播放版本（逐个转码，最近被访问的优先）"""
+    while True:
+        await asyncio.sleep(PLAYBACK_TRANSCODE_INTERVAL_SECONDS)
+        try:
+            built = await asyncio.to_thread(playback.backfill, PLAYBACK_TRANSCODE_BATCH)
+            if built:
+                print(f"[Playback] 本轮生成 {built} 个播放版本")
+        except Exception as e:
+            print(f"[Playback] 转码循环异常: {e}")
+
+
 @app.on_event("startup")
 async def start_scheduler():
     """FastAPI 启动时启动后台频道追踪调度器"""
+    # 旧版 results/*_status.json 一次性迁入状态库
+    await asyncio.to_thread(status_store.import_legacy_files, RESULTS_DIR)
     asyncio.create_task(scheduler_loop())
     print("[Tracker] 频道追踪调度任务已注册")
+    asyncio.create_task(view_flush_loop())
+    asyncio.create_task(media_cache_loop())
+    asyncio.create_task(playback_transcode_loop())
+
+
+@app.on_event("shutdown")
+async def flush_view_counts():
+    """退出前刷新尚未落库的浏览量"""
+    await asyncio.to_thread(media_cache.flush_touches)
+    flushed = await asyncio.to_thread(view_buffer.flush, supabase)
+    if flushed:
+        print(f"[ViewCounter] 退出前已刷新 {flushed} 个视频的浏览量")
 
 
 if __name__ == "__main__":
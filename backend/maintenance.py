@@ -3,6 +3,7 @@ import json
 import time
 import sys
 from processor import split_into_paragraphs
+import status_store
 
 RESULTS_DIR = "results"
 CACHE_DIR = "cache"
@@ -22,6 +23,8 @@ def run_maintenance():
     for f in all_files:
         if f.endswith("_status.json") or f.endswith("_error.json"):
             os.remove(os.path.join(RESULTS_DIR, f))
+    finished = [tid for tid, _ in status_store.list_statuses(status_store.TERMINAL_STATUSES)]
+    status_store.delete_status(finished)
 
     report_files = [f for f in os.listdir(RESULTS_DIR) if f.endswith(".json")]
     unique_reports = {} # Key: title or ukey, Value: (filename, mtime)
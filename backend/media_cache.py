@@ -0,0 +1,356 @@
+"""
+媒体缓存管理：按类别的字节预算 + LRU 淘汰（替代 cleanup_downloads.py 的固定 3 天过期）
+downloads/ 中的音频、播放用 Opus、视频原件、字幕、缩略图与 cache/ 中的 ASR 缓存各有独立策略；
+最近访问时间来自 /media 静态文件命中、process_task / worker 的缓存命中（写入 cache/media_cache.db），
+从未记录访问的文件以 mtime 计。在途任务（status_store 中未 completed / failed 的，含下载、转录、LLM 等阶段）
+的文件与刚写入的文件不会被淘汰。用户上传的原件与其提取出的音频（up_*）无法重新下载，不计入预算也不淘汰。
+"""
+import os
+import time
+import shutil
+import sqlite3
+import threading
+import status_store
+import upload_store
+from app_logger import get_logger
+logger = get_logger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DOWNLOADS_DIR = os.path.join(BACKEND_DIR, "downloads")
+CACHE_DIR = os.path.join(BACKEND_DIR, "cache")
+INDEX_PATH = os.environ.get("MEDIA_CACHE_INDEX_PATH", os.path.join(CACHE_DIR, "media_cache.db"))
+
+GB = 1024 ** 3
+
+
+def _env_gb(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return None if value.strip().lower() in ("", "none", "unlimited") else float(value)
+
+
+# 各类别的策略：budget_gb 为字节预算（None 不限），max_age_days 为最长未访问天数（None 不限）
+POLICIES = {
+    # 播放用低码率 Opus（playback.py 生成），需排在 audio 之前匹配
+    "playback": {
+        "root": "downloads",
+        "suffix": ".play.opus",
+        "budget_gb": _env_gb("MEDIA_CACHE_PLAYBACK_GB", 5),
+        "max_age_days": None,
+    },
+    "audio": {
+        "root": "downloads",
+        "exts": (".m4a", ".mp3", ".opus", ".ogg", ".webm", ".wav", ".aac", ".flac"),
+        "budget_gb": _env_gb("MEDIA_CACHE_AUDIO_GB", 20),
+        "max_age_days": None,
+    },
+    # 上传 / 下载的视频原件：提取音频后即删除，残留的只是失败任务的中间产物
+    "video": {
+        "root": "downloads",
+        "exts": (".mp4", ".mov", ".avi", ".mkv"),
+        "budget_gb": _env_gb("MEDIA_CACHE_VIDEO_GB", 5),
+        "max_age_days": 1,
+    },
+    "subtitle": {
+        "root": "downloads",
+        "exts": (".vtt", ".srt", ".srv1", ".srv3", ".json3", ".ttml"),
+        "budget_gb": _env_gb("MEDIA_CACHE_SUBTITLE_GB", 0.5),
+        "max_age_days": 30,
+    },
+    # 缩略图被结果页与 Supabase 记录直接引用，默认只统计不淘汰
+    "thumbnail": {
+        "root": "downloads",
+        "exts": (".jpg", ".jpeg", ".png", ".webp"),
+        "budget_gb": _env_gb("MEDIA_CACHE_THUMBNAIL_GB", None),
+        "max_age_days": None,
+    },
+    # ASR 结果重新计算代价最高，预算单独给
+    "asr": {
+        "root": "cache",
+        "suffix": "_raw.json",
+        "budget_gb": _env_gb("MEDIA_CACHE_ASR_GB", 2),
+        "max_age_days": None,
+    },
+}
+# 这些类别中的上传文件是唯一副本（不能像 YouTube 音频那样重新下载），只统计不淘汰；
+# 由其生成的播放版本、ASR 缓存等可重建，照常淘汰
+UPLOAD_SOURCE_CATEGORIES = ("audio", "video")
+# 磁盘剩余空间低于此值时，按全局 LRU 继续淘汰可淘汰类别（缩略图除外）
+MIN_FREE_GB = _env_gb("MEDIA_CACHE_MIN_FREE_GB", 5)
+# 最近修改过的文件（下载 / 提取中）不参与淘汰
+GRACE_SECONDS = 10 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media_access (
+    name TEXT PRIMARY KEY,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# 进程内的访问记录缓冲 {name: (最近访问时间, 次数)}，/media 高频命中不逐次写库
+_touched = {}
+_touched_lock = threading.Lock()
+
+
+def _connect():
+    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+    conn = sqlite3.connect(INDEX_PATH, timeout=10, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _roots():
+    return {"downloads": DOWNLOADS_DIR, "cache": CACHE_DIR}
+
+
+def _name(path):
+    """文件在索引中的名字（如 downloads/x.m4a），不在受管目录下返回 None"""
+    directory, base = os.path.split(os.path.abspath(path))
+    for label, root in _roots().items():
+        if directory == os.path.abspath(root):
+            return f"{label}/{base}"
+    return None
+
+
+def category_of(root, filename):
+    if filename.startswith(".") or ".tmp." in filename:
+        return None
+    lower = filename.lower()
+    for category, policy in POLICIES.items():
+        if policy["root"] != root:
+            continue
+        if "suffix" in policy and lower.endswith(policy["suffix"]):
+            return category
+        if os.path.splitext(lower)[1] in policy.get("exts", ()):
+            return category
+    return None
+
+
+def touch(path, flush=False):
+    """记录一次访问；flush=True 时立即写库（子进程退出前不会再有刷新机会）"""
+    name = _name(path)
+    if not name:
+        return
+    with _touched_lock:
+        _, hits = _touched.get(name, (0, 0))
+        _touched[name] = (time.time(), hits + 1)
+    if flush:
+        flush_touches()
+
+
+def flush_touches():
+    """把缓冲的访问记录批量写入索引，返回写入条数；失败时放回缓冲"""
+    global _touched
+    with _touched_lock:
+        if not _touched:
+            return 0
+        batch, _touched = _touched, {}
+    try:
+        conn = _connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO media_access (name, last_access, hits) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET last_access = MAX(last_access, excluded.last_access), "
+                "hits = hits + excluded.hits",
+                [(name, at, hits) for name, (at, hits) in batch.items()],
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.info(f"[MediaCache] 写入访问记录失败: {e}")
+        with _touched_lock:
+            for name, (at, hits) in batch.items():
+                old_at, old_hits = _touched.get(name, (0, 0))
+                _touched[name] = (max(at, old_at), hits + old_hits)
+        return 0
+    return len(batch)
+
+
+def _load_index():
+    try:
+        conn = _connect()
+        try:
+            return {name: (at, hits) for name, at, hits in conn.execute("SELECT name, last_access, hits FROM media_access")}
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.info(f"[MediaCache] 读取访问索引失败: {e}")
+        return {}
+
+
+def _pinned_ids():
+    """在途任务（未 completed / failed，含各处理阶段）的 ID，其媒体与缓存不淘汰"""
+    return {tid for tid, _ in status_store.list_in_flight()}
+
+
+def _is_pinned(filename, pinned):
+    stem = filename.split(".", 1)[0]
+    return stem in pinned or any(filename.startswith(f"{tid}_") for tid in pinned)
+
+
+def _is_upload_source(category, filename):
+    return category in UPLOAD_SOURCE_CATEGORIES and filename.startswith(upload_store.UPLOAD_ID_PREFIX)
+
+
+def scan(now=None):
+    """列出受管文件：[{name, path, category, size, mtime, last_access, hits, pinned, upload}]"""
+    now = now or time.time()
+    index = _load_index()
+    with _touched_lock:
+        pending = dict(_touched)
+    pinned = _pinned_ids()
+    entries = []
+    for label, root in _roots().items():
+        if not os.path.isdir(root):
+            continue
+        with os.scandir(root) as it:
+            for entry in it:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                category = category_of(label, entry.name)
+                if not category:
+                    continue
+                st = entry.stat()
+                name = f"{label}/{entry.name}"
+                at, hits = index.get(name, (0, 0))
+                if name in pending:
+                    at, hits = max(at, pending[name][0]), hits + pending[name][1]
+                entries.append({
+                    "name": name,
+                    "path": entry.path,
+                    "category": category,
+                    "size": st.st_size,
+                    "mtime": st.st_mtime,
+                    "last_access": max(at, st.st_mtime),
+                    "hits": hits,
+                    "pinned": _is_pinned(entry.name, pinned) or now - st.st_mtime < GRACE_SECONDS,
+                    "upload": _is_upload_source(category, entry.name),
+                })
+    return entries
+
+
+def _disk_free(path):
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        return None
+
+
+def plan_evictions(entries, now=None, disk_free=None):
+    """
+    按策略挑选要淘汰的文件（不删除）：先淘汰超过 max_age_days 的，再按 LRU 压到各类别预算内，
+    最后磁盘剩余不足 MIN_FREE_GB 时跨类别按 LRU 继续淘汰。返回 [(entry, 原因)]。
+    """
+    now = now or time.time()
+    # 上传的唯一副本不是缓存：既不淘汰，也不占用预算挤掉可重新下载的文件
+    entries = [e for e in entries if not e.get("upload")]
+    chosen = {}
+    for category, policy in POLICIES.items():
+        files = [e for e in entries if e["category"] == category]
+        candidates = sorted((e for e in files if not e["pinned"]), key=lambda e: e["last_access"])
+        if policy["max_age_days"] is not None:
+            for e in candidates:
+                if now - e["last_access"] > policy["max_age_days"] * 86400:
+                    chosen[e["name"]] = (e, "max_age")
+        if policy["budget_gb"] is not None:
+            total = sum(e["size"] for e in files if e["name"] not in chosen)
+            for e in candidates:
+                if total <= policy["budget_gb"] * GB:
+                    break
+                if e["name"] not in chosen:
+                    chosen[e["name"]] = (e, "budget")
+                    total -= e["size"]
+
+    if disk_free is not None and MIN_FREE_GB is not None:
+        free = disk_free + sum(e["size"] for e, _ in chosen.values())
+        evictable = sorted(
+            (e for e in entries if not e["pinned"] and e["name"] not in chosen
+             and POLICIES[e["category"]]["budget_gb"] is not None),
+            key=lambda e: e["last_access"],
+        )
+        for e in evictable:
+            if free >= MIN_FREE_GB * GB:
+                break
+            chosen[e["name"]] = (e, "disk_pressure")
+            free += e["size"]
+    return list(chosen.values())
+
+
+def sweep(dry_run=False, now=None):
+    """执行一轮淘汰，返回 {"evicted", "freed_bytes", "by_category", "files"}"""
+    now = now or time.time()
+    flush_touches()
+    entries = scan(now)
+    plan = plan_evictions(entries, now, _disk_free(DOWNLOADS_DIR))
+    report = {"evicted": 0, "freed_bytes": 0, "by_category": {}, "files": [], "dry_run": dry_run}
+    removed = []
+    for e, reason in plan:
+        if not dry_run:
+            try:
+                os.remove(e["path"])
+            except FileNotFoundError:
+                pass
+            except OSError as err:
+                logger.info(f"[MediaCache] 删除失败 {e['name']}: {err}")
+                continue
+            removed.append(e["name"])
+        report["evicted"] += 1
+        report["freed_bytes"] += e["size"]
+        cat = report["by_category"].setdefault(e["category"], {"files": 0, "bytes": 0})
+        cat["files"] += 1
+        cat["bytes"] += e["size"]
+        report["files"].append({"name": e["name"], "size": e["size"], "reason": reason})
+
+    if not dry_run:
+        # 已删除与已不存在的文件从索引中移除
+        existing = {e["name"] for e in entries}
+        stale = [name for name in _load_index() if name not in existing]
+        try:
+            conn = _connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany("DELETE FROM media_access WHERE name = ?", [(n,) for n in removed + stale])
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
+        except Exception as err:
+            logger.info(f"[MediaCache] 清理访问索引失败: {err}")
+    if report["evicted"]:
+        logger.info(f"[MediaCache] {'预计' if dry_run else '已'}淘汰 {report['evicted']} 个文件，"
+                    f"释放 {report['freed_bytes'] / 1024 / 1024:.1f} MB")
+    return report
+
+
+def usage(now=None):
+    """各类别的占用统计（供管理接口）"""
+    entries = scan(now)
+    categories = {}
+    for category, policy in POLICIES.items():
+        files = [e for e in entries if e["category"] == category]
+        budget = policy["budget_gb"]
+        categories[category] = {
+            "files": len(files),
+            "bytes": sum(e["size"] for e in files),
+            "budget_bytes": int(budget * GB) if budget is not None else None,
+            "max_age_days": policy["max_age_days"],
+            "pinned_files": sum(1 for e in files if e["pinned"]),
+            "upload_files": sum(1 for e in files if e["upload"]),
+            "upload_bytes": sum(e["size"] for e in files if e["upload"]),
+            "oldest_access": min((e["last_access"] for e in files), default=None),
+            "hits": sum(e["hits"] for e in files),
+        }
+    disk = None
+    try:
+        total, used, free = shutil.disk_usage(DOWNLOADS_DIR)
+        disk = {"total_bytes": total, "used_bytes": used, "free_bytes": free,
+                "min_free_bytes": int(MIN_FREE_GB * GB) if MIN_FREE_GB is not None else None}
+    except OSError:
+        pass
+    with _touched_lock:
+        pending = len(_touched)
+    return {"categories": categories, "disk": disk, "pending_touches": pending}
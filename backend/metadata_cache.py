@@ -0,0 +1,131 @@
+"""
+yt-dlp 元数据磁盘缓存
+同一视频在 tracker 入队、process_task 取元数据、下载阶段会重复解析页面；
+视频信息按 video_id、频道头像按频道 URL 缓存到 cache/metadata/，带 TTL，多进程共享。
+"""
+import os
+import json
+import time
+import hashlib
+import metrics
+from app_logger import get_logger
+logger = get_logger(__name__)
+
+CACHE_DIR = os.environ.get(
+    "METADATA_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "metadata"),
+)
+# 视频信息里的媒体直链约 6 小时过期，供下载复用时不宜缓存过久
+VIDEO_INFO_TTL_SECONDS = int(os.environ.get("METADATA_CACHE_TTL", 3600))
+CHANNEL_AVATAR_TTL_SECONDS = int(os.environ.get("CHANNEL_AVATAR_CACHE_TTL", 7 * 24 * 3600))
+
+
+def _entry_path(kind, key, cache_dir=None):
+    # 频道 URL 含 / 等字符，统一哈希为文件名
+    name = key if kind == "videos" else hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir or CACHE_DIR, kind, f"{name}.json")
+
+
+def _read(kind, key, ttl, cache_dir=None):
+    path = _entry_path(kind, key, cache_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.info(f"[MetadataCache] 缓存文件损坏，忽略 {path}: {e}")
+        return None
+    if time.time() - entry.get("fetched_at", 0) > ttl:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    return entry.get("data")
+
+
+def _write(kind, key, data, cache_dir=None):
+    path = _entry_path(kind, key, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 先写临时文件再原子替换，避免其他进程读到半个文件
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": time.time(), "key": key, "data": data}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.info(f"[MetadataCache] 写入缓存失败 {path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def get_video_info(video_id, ttl=None, cache_dir=None):
+    """读取缓存的 yt-dlp 视频信息（已 sanitize 的 JSON 字典），过期或不存在返回 None"""
+    if not video_id:
+        return None
+    info = _read("videos", video_id, VIDEO_INFO_TTL_SECONDS if ttl is None else ttl, cache_dir)
+    metrics.cache_lookup("video_info", info is not None)
+    return info
+
+
+def put_video_info(video_id, info, cache_dir=None):
+    if video_id and info:
+        _write("videos", video_id, info, cache_dir)
+
+
+def get_channel_avatar(channel_url, ttl=None, cache_dir=None):
+    """
+    读取缓存的频道头像。返回 (命中, 头像 URL)：
+    频道确实没有头像时也会缓存 None，避免每个视频都重新解析频道页。
+    """
+    if not channel_url:
+        return False, None
+    entry = _read("channels", channel_url, CHANNEL_AVATAR_TTL_SECONDS if ttl is None else ttl, cache_dir)
+    metrics.cache_lookup("channel_avatar", entry is not None)
+    if entry is None:
+        return False, None
+    return True, entry.get("avatar")
+
+
+def put_channel_avatar(channel_url, avatar, cache_dir=None):
+    if channel_url:
+        _write("channels", channel_url, {"avatar": avatar}, cache_dir)
+
+
+def extract_video_info(url, video_id, ydl_opts):
+    """
+    优先读缓存，未命中时用 yt-dlp 解析（download=False）并写回缓存。
+    返回可直接交给 downloader.download_audio(info=...) 的信息字典。
+    """
+    info = get_video_info(video_id)
+    if info:
+        logger.info(f"[MetadataCache] 命中视频信息缓存 {video_id}")
+        return info
+
+    import yt_dlp
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+        if info is None:
+            raise Exception("yt-dlp extract_info returned None")
+        # sanitize 后可 JSON 序列化，也可再交给 process_ie_result 复用
+        info = ydl.sanitize_info(info)
+    put_video_info(video_id or info.get("id"), info)
+    return info
+
+
+def fetch_channel_avatar(channel_url):
+    """按频道缓存头像；未命中时解析一次频道页（extract_flat）"""
+    hit, avatar = get_channel_avatar(channel_url)
+    if hit:
+        return avatar
+
+    import yt_dlp
+    with yt_dlp.YoutubeDL({'quiet': True, 'extract_flat': True}) as ydl_chan:
+        chan_info = ydl_chan.extract_info(channel_url, download=False)
+        if chan_info and chan_info.get('thumbnails'):
+            avatar = chan_info['thumbnails'][-1]['url']
+    put_channel_avatar(channel_url, avatar)
+    return avatar
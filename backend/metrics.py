@@ -0,0 +1,300 @@
+"""
+轻量运行指标：阶段耗时直方图与计数器
+各进程（API / scheduler / process_task / worker）用 timed() 包住下载、转录、LLM 等阶段，
+观测值先在进程内存中累加，由后台线程每 FLUSH_SECONDS 秒（及进程退出时）合并写入本地 SQLite
+（cache/metrics.db），热路径不做磁盘 IO、不等写锁；API 进程的 /metrics 以 Prometheus 文本格式导出。
+同时保留本进程内的阶段汇总，任务结束时写入结果的 usage["metrics"]。
+"""
+import os
+import json
+import time
+import atexit
+import sqlite3
+import functools
+import threading
+import tracing
+from app_logger import get_logger
+logger = get_logger(__name__)
+
+METRICS_PATH = os.environ.get(
+    "METRICS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "metrics.db"),
+)
+PREFIX = "tldw_"
+FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", "10"))
+
+# 直方图桶上界；未列出的指标按秒计
+SECONDS_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+BUCKETS = {
+    "asr_rtf": (0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1, 2),
+    "llm_tokens_per_second": (1, 5, 10, 25, 50, 100, 200, 500),
+}
+HELP = {
+    "stage_seconds": "各处理阶段耗时（秒）",
+    "asr_rtf": "转录实时率（转录耗时 / 音频时长）",
+    "llm_tokens_per_second": "LLM 单个 chunk 的生成速度（completion tokens / 秒）",
+    "llm_tokens_total": "LLM token 消耗",
+    "llm_chunk_retries_total": "质量不合格或调用失败而重试的 chunk 数",
+    "cache_requests_total": "缓存查询次数（按命中 / 未命中）",
+    "tasks_total": "结束的任务数（按结果）",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metric_series (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    count REAL NOT NULL DEFAULT 0,
+    sum REAL NOT NULL DEFAULT 0,
+    buckets TEXT,
+    updated_at REAL,
+    PRIMARY KEY (name, labels)
+);
+"""
+
+# 本进程内的阶段汇总 {stage: {"count", "total_seconds", "max_seconds"}}
+_summary = {}
+_summary_lock = threading.Lock()
+
+# 尚未写入数据库的增量 {(name, labels): {"kind", "count", "sum", "buckets"}}
+_pending = {}
+_pending_lock = threading.Lock()
+_flusher = None
+# 本进程已建过表的数据库路径（每个进程只建一次）
+_schema_ready = set()
+
+
+def _connect(path=None):
+    path = path or METRICS_PATH
+    if path not in _schema_ready:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+    if path not in _schema_ready:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _schema_ready.add(path)
+    return conn
+
+
+def _label_key(labels):
+    return json.dumps({k: str(v) for k, v in labels.items() if v is not None}, sort_keys=True, ensure_ascii=False)
+
+
+def _record(name, kind, value, labels):
+    """在内存中累加一条序列的增量，由 flush() 批量写入"""
+    key = (name, _label_key(labels))
+    with _pending_lock:
+        entry = _pending.get(key)
+        if entry is None:
+            entry = _pending[key] = {"kind": kind, "count": 0, "sum": 0.0, "buckets": None}
+        if kind == "histogram":
+            bounds = BUCKETS.get(name, SECONDS_BUCKETS)
+            if entry["buckets"] is None:
+                entry["buckets"] = [0] * (len(bounds) + 1)
+            slot = next((i for i, b in enumerate(bounds) if value <= b), len(bounds))
+            entry["buckets"][slot] += 1
+            entry["count"] += 1
+        else:
+            entry["count"] += value
+        entry["sum"] += value
+    _ensure_flusher()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_SECONDS)
+        flush()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _pending_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True)
+            _flusher.start()
+
+
+def flush(path=None):
+    """
+    把内存中的增量在一个写事务里合并进数据库，返回写入的序列数。
+    失败只记日志并丢弃本批（与单次写入失败时一致），不影响任务。
+    """
+    with _pending_lock:
+        batch = dict(_pending)
+        _pending.clear()
+    if not batch:
+        return 0
+    try:
+        conn = _connect(path)
+        try:
+            # BEGIN IMMEDIATE 拿写锁后再读，多进程并发累加不丢数
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            for (name, key), delta in batch.items():
+                row = conn.execute(
+                    "SELECT count, sum, buckets FROM metric_series WHERE name = ? AND labels = ?",
+                    (name, key),
+                ).fetchone()
+                count, total, buckets = row if row else (0, 0, None)
+                if delta["kind"] == "histogram":
+                    counts = json.loads(buckets) if buckets else [0] * len(delta["buckets"])
+                    buckets = json.dumps([a + b for a, b in zip(counts, delta["buckets"])])
+                conn.execute(
+                    "INSERT OR REPLACE INTO metric_series (name, labels, kind, count, sum, buckets, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (name, key, delta["kind"], count + delta["count"], total + delta["sum"], buckets, now),
+                )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.info(f"[Metrics] 写入指标失败（{len(batch)} 条序列）: {e}")
+    return len(batch)
+
+
+# process_task / worker 等短命进程退出前写入剩余增量
+atexit.register(flush)
+
+
+def observe(name, value, **labels):
+    """向直方图记录一个观测值"""
+    if value is None:
+        return
+    _record(name, "histogram", float(value), labels)
+
+
+def incr(name, amount=1, **labels):
+    """计数器累加"""
+    if amount:
+        _record(name, "counter", float(amount), labels)
+
+
+def cache_lookup(cache, hit):
+    """记录一次缓存查询的命中情况"""
+    incr("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+class timed:
+    """
+    阶段计时，可作上下文管理器或装饰器：
+        with metrics.timed("download"): ...
+        @metrics.timed("summarize")
+    结束时写入 stage_seconds{stage, status} 直方图并计入本进程汇总；elapsed 为本次耗时。
+    有活动 trace 时同时记录同名 span。
+    """
+
+    def __init__(self, stage, **labels):
+        self.stage = stage
+        self.labels = labels
+        self.elapsed = None
+        self._started = None
+        self._span = None
+
+    def __enter__(self):
+        self._span = tracing.span(self.stage, **self.labels).__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self._started
+        self._span.__exit__(exc_type, exc, tb)
+        observe("stage_seconds", self.elapsed, stage=self.stage,
+                status="error" if exc_type else "ok", **self.labels)
+        with _summary_lock:
+            entry = _summary.setdefault(self.stage, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            entry["count"] += 1
+            entry["total_seconds"] += self.elapsed
+            entry["max_seconds"] = max(entry["max_seconds"], self.elapsed)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(self.stage, **self.labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def timings_summary():
+    """本进程内各阶段的次数 / 总耗时 / 最大耗时（秒，保留 3 位）"""
+    with _summary_lock:
+        return {
+            stage: {
+                "count": entry["count"],
+                "total_seconds": round(entry["total_seconds"], 3),
+                "max_seconds": round(entry["max_seconds"], 3),
+            }
+            for stage, entry in _summary.items()
+        }
+
+
+def merge_summaries(*summaries):
+    """合并多个进程的阶段汇总（worker 写入结果，process_task 再并入自己的阶段）"""
+    merged = {}
+    for summary in summaries:
+        for stage, entry in (summary or {}).items():
+            target = merged.setdefault(stage, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            target["count"] += entry.get("count", 0)
+            target["total_seconds"] = round(target["total_seconds"] + entry.get("total_seconds", 0), 3)
+            target["max_seconds"] = max(target["max_seconds"], entry.get("max_seconds", 0))
+    return merged
+
+
+def reset_summary():
+    with _summary_lock:
+        _summary.clear()
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels.items()) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in items) + "}"
+
+
+def _format_number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus(path=None):
+    """读取累计序列，输出 Prometheus 文本格式（text/plain; version=0.0.4）；先写入本进程未落盘的增量"""
+    path = path or METRICS_PATH
+    flush(path)
+    if not os.path.exists(path):
+        return ""
+    conn = _connect(path)
+    try:
+        rows = conn.execute(
+            "SELECT name, labels, kind, count, sum, buckets FROM metric_series ORDER BY name, labels"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    lines = []
+    current = None
+    for name, label_json, kind, count, total, buckets in rows:
+        metric = PREFIX + name
+        if name != current:
+            current = name
+            if name in HELP:
+                lines.append(f"# HELP {metric} {HELP[name]}")
+            lines.append(f"# TYPE {metric} {kind}")
+        labels = json.loads(label_json)
+        if kind == "histogram":
+            bounds = BUCKETS.get(name, SECONDS_BUCKETS)
+            cumulative = 0
+            for bound, n in zip(list(bounds) + ["+Inf"], json.loads(buckets)):
+                cumulative += n
+                le = bound if bound == "+Inf" else _format_number(bound)
+                lines.append(f"{metric}_bucket{_format_labels(labels, {'le': le})} {_format_number(cumulative)}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {_format_number(total)}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {_format_number(count)}")
+        else:
+            lines.append(f"{metric}{_format_labels(labels)} {_format_number(count)}")
+    return "\n".join(lines) + "\n" if lines else ""
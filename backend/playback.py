@@ -0,0 +1,157 @@
+"""
+播放用低码率音频（/playback/{media_path} 的数据源）
+原始音频（yt-dlp 下载的 m4a/webm 或旧版高质量 mp3）码率偏高，带宽受限时同时收听的人数有限。
+后台为每个视频生成一份单声道低码率 Opus（downloads/{id}.play.opus），播放接口优先返回它，
+没有时回退到原始音频；支持 Range / ETag / Cache-Control，拖动进度只传输需要的字节。
+"""
+import os
+import subprocess
+import media_cache
+from downloader import _ffmpeg_binary, find_extracted_audio
+from app_logger import get_logger
+logger = get_logger(__name__)
+
+PLAYBACK_SUFFIX = ".play.opus"
+# 语音内容 24 kbps 单声道 Opus 已足够清晰，约为 128 kbps AAC 的五分之一
+PLAYBACK_BITRATE = os.environ.get("PLAYBACK_OPUS_BITRATE", "24k")
+CACHE_CONTROL = "public, max-age=86400"
+CHUNK_SIZE = 64 * 1024
+TRANSCODE_TIMEOUT_SECONDS = 1800
+
+MEDIA_TYPES = {
+    ".opus": "audio/ogg; codecs=opus",
+    ".ogg": "audio/ogg",
+    ".m4a": "audio/mp4",
+    ".mp3": "audio/mpeg",
+    ".webm": "audio/webm",
+    ".wav": "audio/wav",
+    ".aac": "audio/aac",
+    ".flac": "audio/flac",
+    ".mp4": "video/mp4",
+}
+
+
+def rendition_path(source_path):
+    stem = os.path.basename(source_path).split(".", 1)[0]
+    return os.path.join(os.path.dirname(source_path), stem + PLAYBACK_SUFFIX)
+
+
+def transcode_command(source_path, output_path):
+    return [
+        _ffmpeg_binary("ffmpeg"), "-y", "-v", "error", "-i", source_path,
+        "-map", "0:a:0", "-vn", "-ac", "1",
+        "-c:a", "libopus", "-b:a", PLAYBACK_BITRATE, "-application", "voip",
+        "-f", "ogg", output_path,
+    ]
+
+
+def _is_fresh(rendition, source_path):
+    try:
+        return os.path.getmtime(rendition) >= os.path.getmtime(source_path)
+    except OSError:
+        return False
+
+
+def build_rendition(source_path):
+    """生成播放版本，已有且不旧于原始音频时直接复用；失败返回 None（播放时回退原始音频）"""
+    output = rendition_path(source_path)
+    if _is_fresh(output, source_path):
+        return output
+    tmp = output.replace(PLAYBACK_SUFFIX, f".tmp{PLAYBACK_SUFFIX}")
+    try:
+        result = subprocess.run(transcode_command(source_path, tmp), stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True, timeout=TRANSCODE_TIMEOUT_SECONDS)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        result = None
+        logger.info(f"[Playback] 转码失败 {source_path}: {e}")
+    if result is not None and result.returncode == 0 and os.path.exists(tmp) and os.path.getsize(tmp) > 0:
+        os.replace(tmp, output)
+        logger.info(f"[Playback] 已生成 {os.path.basename(output)} "
+                    f"({os.path.getsize(source_path) / 1024 / 1024:.1f} MB → {os.path.getsize(output) / 1024 / 1024:.1f} MB)")
+        return output
+    if result is not None:
+        logger.info(f"[Playback] 转码失败 {source_path}: {(result.stderr or '').strip()[-300:]}")
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    return None
+
+
+def pending(limit=None):
+    """
+    缺少播放版本的原始音频，最近访问的在前。跳过媒体缓存固定的文件：在途任务
+    （status_store.list_in_flight，未 completed / failed，含转录、LLM 等阶段）等处理完再转码，
+    不与转录抢 CPU；刚写入的文件（宽限期内）同样跳过。
+    """
+    entries = [e for e in media_cache.scan() if e["category"] == "audio" and not e["pinned"]]
+    todo = [e for e in entries if not _is_fresh(rendition_path(e["path"]), e["path"])]
+    todo.sort(key=lambda e: e["last_access"], reverse=True)
+    return [e["path"] for e in todo[:limit]]
+
+
+def backfill(limit=None):
+    """为缺少播放版本的音频逐个转码，返回成功数量"""
+    return sum(1 for path in pending(limit) if build_rendition(path))
+
+
+def resolve(media_path, downloads_dir=None, prefer_rendition=True):
+    """
+    根据 media_path（结果中的文件名）选出实际要播放的文件：播放版本 → 原始音频 →
+    同名的已提取音频（media_path 为视频原件时）。返回路径，找不到返回 None。
+    prefer_rendition=False 时跳过 Opus 播放版本（供不支持 Ogg Opus 的浏览器回退）。
+    """
+    downloads_dir = downloads_dir or media_cache.DOWNLOADS_DIR
+    name = os.path.basename(media_path or "")
+    if not name or name.startswith("."):
+        return None
+    source = os.path.join(downloads_dir, name)
+    rendition = rendition_path(source)
+    if prefer_rendition and os.path.exists(rendition) and (not os.path.exists(source) or _is_fresh(rendition, source)):
+        return rendition
+    if os.path.isfile(source):
+        return source
+    return find_extracted_audio(os.path.join(downloads_dir, name.split(".", 1)[0]))
+
+
+def media_type(path):
+    return MEDIA_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+
+
+def etag(stat_result):
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    解析单段 Range 头，返回闭区间 (start, end)；无 Range、格式不支持或多段时返回 None（整体返回）。
+    区间超出文件范围时抛 ValueError（应返回 416）。
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, sep, end_text = header[len("bytes="):].strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # bytes=-N：最后 N 个字节
+            start, end = max(size - int(end_text), 0), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end or size == 0:
+        raise ValueError(f"unsatisfiable range {header} for size {size}")
+    return start, min(end, size - 1)
+
+
+def iter_file(path, start, end, chunk_size=CHUNK_SIZE):
+    """按块读取文件的闭区间 [start, end]"""
+    remaining = end - start + 1
+    with open(path, "rb") as f:
+        f.seek(start)
+        while remaining > 0:
+            data = f.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
@@ -16,19 +16,22 @@ if not shutil.which('ffmpeg'):
             os.environ['PATH'] = candidate + ':' + os.environ.get('PATH', '')
             break
 
-from downloader import download_audio
+from downloader import download_audio, probe_duration, extract_media, find_extracted_audio
 from processor import split_into_paragraphs, get_youtube_thumbnail_url
-from db import get_db
+from db import get_db, sync_video_keywords
+import transcript_index
+import metadata_cache
+import eta_model
+import metrics
+import tracing
+import status_store
+import media_cache
+import thumbnails
+from status_store import save_status
 
 supabase = get_db()
 RESULTS_DIR = "results"
-DOWNLOADS_DIR = "downloads"
-
-def save_status(task_id, status, progress, eta=None):
-    if not os.path.exists(RESULTS_DIR):
-        os.makedirs(RESULTS_DIR)
-    with open(f"{RESULTS_DIR}/{task_id}_status.json", "w") as f:
-        json.dump({"status": status, "progress": progress, "eta": eta}, f)
+DOWNLOADS_DIR = media_cache.DOWNLOADS_DIR
 
 def process_video_task(task_id):
     logger.info(f"--- [Process Task] Starting task: {task_id} ---")
@@ -54,8 +57,9 @@ def process_video_task(task_id):
                 url = temp_data.get("url")
                 local_file = video.get("media_path")
                 # Handle cases where media_path is just a filename
-                if local_file and not os.path.isabs(local_file) and not local_file.startswith(DOWNLOADS_DIR):
-                    local_file = os.path.join(DOWNLOADS_DIR, local_file)
+                # （旧记录可能带相对的 downloads/ 前缀）
+                if local_file and not os.path.isabs(local_file):
+                    local_file = os.path.join(DOWNLOADS_DIR, os.path.basename(local_file))
                 # Verify the file actually exists (may have been cleaned up)
                 if local_file and not os.path.exists(local_file):
                     logger.info(f"--- [Process Task] media_path file missing: {local_file}, will re-download ---")
@@ -70,16 +74,14 @@ def process_video_task(task_id):
 
     # Fallback to local status if Supabase didn't have it or failed
     if not url and not local_file:
-        status_file = f"{RESULTS_DIR}/{task_id}_status.json"
-        if os.path.exists(status_file):
-            with open(status_file, "r") as f:
-                data = json.load(f)
-                url = data.get("url")
-                local_file = data.get("local_file")
-                title = data.get("title", title)
-                mode = data.get("mode", "cloud")
-                user_id = data.get("user_id")
-                is_public = data.get("is_public", True)
+        data = status_store.get_status(task_id)
+        if data:
+            url = data.get("url")
+            local_file = data.get("local_file")
+            title = data.get("title", title)
+            mode = data.get("mode", "cloud")
+            user_id = data.get("user_id")
+            is_public = data.get("is_public", True)
 
     # If the URL is from our own domain, it's likely a mis-submitted result page.
     # We should fallback to a standard YouTube URL if the task_id looks like a YouTube ID.
@@ -105,6 +107,9 @@ def process_video_task(task_id):
                 logger.info(f"[Process Task] Failed to update Supabase on abort: {e}")
         return False
 
+    # 阶段计时：记录各阶段实际耗时，并据历史耗时动态给出 eta
+    clock = eta_model.StageClock(task_id, mode, audio_seconds=existing_report_data.get("duration"))
+
     try:
         video_id = ""
         description = ""
@@ -129,6 +134,8 @@ def process_video_task(task_id):
                 p = f"{DOWNLOADS_DIR}/{video_id}.{ext}"
                 if os.path.exists(p):
                     file_path = p
+                    # 命中记一次访问，避免刚复用的文件被按 LRU 淘汰
+                    media_cache.touch(p, flush=True)
                     break
 
             # Double-check: cached path must actually exist
@@ -136,8 +143,7 @@ def process_video_task(task_id):
                 logger.info(f"--- [Process Task] Cached file not found: {file_path}, will re-download ---")
                 file_path = None
             
-            # Metadata Retrieval
-            import yt_dlp
+            # Metadata Retrieval（优先复用 tracker / 此前任务写入的元数据缓存）
             ydl_opts_meta = {
                 'quiet': True,
                 'no_warnings': True,
@@ -145,28 +151,22 @@ def process_video_task(task_id):
             }
             
             channel_url = None
+            info = None
 
             try:
-                with yt_dlp.YoutubeDL(ydl_opts_meta) as ydl:
-                    info = ydl.extract_info(url, download=False)
-                    title = info.get('title', title or 'Unknown Title')
-                    thumbnail = info.get('thumbnail', thumbnail)
-                    description = info.get('description', '')
-                    channel = info.get('uploader') or info.get('channel') or info.get('uploader_id')
-                    channel_id = info.get('uploader_id') or info.get('channel_id')
-                    channel_url = info.get('uploader_url') or info.get('channel_url')
-                    
-                    if not channel:
-                        # Avoid falling back to ID if name extraction failed
-                        pass
+                info = metadata_cache.extract_video_info(url, video_id, ydl_opts_meta)
+                title = info.get('title', title or 'Unknown Title')
+                thumbnail = info.get('thumbnail', thumbnail)
+                description = info.get('description', '')
+                channel = info.get('uploader') or info.get('channel') or info.get('uploader_id')
+                channel_id = info.get('uploader_id') or info.get('channel_id')
+                channel_url = info.get('uploader_url') or info.get('channel_url')
+                clock.audio_seconds = info.get('duration') or clock.audio_seconds
 
-                # Avatar block
+                # Avatar block（按频道缓存，同频道视频不再重复解析频道页）
                 if channel_url:
                     try:
-                        with yt_dlp.YoutubeDL({'quiet': True, 'extract_flat': True}) as ydl_chan:
-                            chan_info = ydl_chan.extract_info(channel_url, download=False)
-                            if chan_info and chan_info.get('thumbnails'):
-                                channel_avatar = chan_info['thumbnails'][-1]['url']
+                        channel_avatar = metadata_cache.fetch_channel_avatar(channel_url)
                     except Exception as ce:
                         logger.info(f"Failed to fetch channel avatar for {channel_url}: {ce}")
             except Exception as e:
@@ -177,60 +177,44 @@ def process_video_task(task_id):
             if not file_path:
                 def on_download_progress(p):
                     current_p = 20 + (p * 0.2)
-                    save_status(task_id, "downloading", int(current_p), eta=35)
+                    save_status(task_id, "downloading", int(current_p), eta=clock.eta(p / 100.0))
 
-                save_status(task_id, "scheduling_download", 20, eta=40)
-                file_path, _, _ = download_audio(url, output_path=DOWNLOADS_DIR, progress_callback=on_download_progress)
+                save_status(task_id, "scheduling_download", 20, eta=clock.start("download"))
+                with metrics.timed("download"):
+                    file_path, _, _ = download_audio(url, output_path=DOWNLOADS_DIR, progress_callback=on_download_progress, info=info)
         
         # 1.5 Audio Extraction (for uploaded videos)
         transcription_source_path = file_path
         ext = os.path.splitext(file_path)[1].lower()
         if ext in [".mp4", ".mov", ".avi", ".webm", ".mkv"]:
-            base_path = os.path.splitext(file_path)[0]
-            extracted_audio_path = base_path + ".mp3"
-            extracted_thumb_path = base_path + ".jpg"
-
-            # Audio extraction
-            if not os.path.exists(extracted_audio_path):
-                save_status(task_id, "extracting_audio", 45, eta=10)
-                logger.info(f"--- Extracting audio from {file_path} to {extracted_audio_path} ---")
-                try:
-                    subprocess.run(
-                        ["ffmpeg", "-i", file_path, "-q:a", "0", "-map", "a", extracted_audio_path, "-y"],
-                        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-                    )
-                    transcription_source_path = extracted_audio_path
-                except Exception as e:
-                    logger.info(f"Audio extraction failed: {e}. Trying to transcribe video directly...")
-            else:
-                transcription_source_path = extracted_audio_path
-            
-            # Thumbnail extraction
-            if not os.path.exists(extracted_thumb_path):
-                logger.info(f"--- Extracting thumbnail from {file_path} to {extracted_thumb_path} ---")
-                try:
-                    subprocess.run(
-                        ["ffmpeg", "-i", file_path, "-ss", "00:00:01", "-vframes", "1", extracted_thumb_path, "-y"],
-                        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-                    )
-                    thumbnail = os.path.basename(extracted_thumb_path)
-                except Exception as e:
-                    logger.info(f"Thumbnail extraction failed: {e}")
-            else:
+            # 一次 ffmpeg 调用取出音频（可封装时 stream copy，不重新编码）与缩略图
+            if not find_extracted_audio(os.path.splitext(file_path)[0]):
+                save_status(task_id, "extracting_audio", 45, eta=clock.start("extract_audio"))
+            with metrics.timed("extract_audio"):
+                extracted_audio_path, extracted_thumb_path = extract_media(file_path)
+            if extracted_thumb_path:
                 thumbnail = os.path.basename(extracted_thumb_path)
 
-            # Cleanup original video
-            if os.path.exists(extracted_audio_path) and file_path != extracted_audio_path:
+            if extracted_audio_path:
+                transcription_source_path = extracted_audio_path
+                # Cleanup original video
                 try:
                     logger.info(f"--- Automatic Cleanup: Removing original video file: {file_path} ---")
                     os.remove(file_path)
                 except Exception as e:
                     logger.info(f"Failed to remove original video: {e}")
+            else:
+                logger.info("Audio extraction failed. Trying to transcribe video directly...")
 
         # 2. Start Worker Process - verify source file exists
         if not os.path.exists(transcription_source_path):
             raise FileNotFoundError(f"转录源文件不存在: {transcription_source_path}")
 
+        # 转录阶段由 worker 自己计时；音频时长未知时在此探测一次并传给 worker
+        clock.stop()
+        if not clock.audio_seconds:
+            clock.audio_seconds = probe_duration(transcription_source_path)
+
         worker_script = os.path.join(os.path.dirname(__file__), "worker.py")
         
         cmd = [
@@ -243,6 +227,8 @@ def process_video_task(task_id):
 
         if video_id:
             cmd.append(f"--video-id={video_id}")
+        if clock.audio_seconds:
+            cmd.append(f"--audio-seconds={clock.audio_seconds}")
 
         # "--" 防止以 "-" 开头的 task_id 被 argparse 误判为 flag
         cmd.extend(["--", task_id, mode])
@@ -254,7 +240,8 @@ def process_video_task(task_id):
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True,
-            cwd=os.path.dirname(__file__)
+            cwd=os.path.dirname(__file__),
+            env=tracing.child_env()
         )
         
         for line in process.stdout:
@@ -284,6 +271,7 @@ def process_video_task(task_id):
             logger.info(f"--- 清理残留错误文件: {error_file} ---")
 
         # 3. Finalize results
+        clock.start("finalize")
         result_file = f"{RESULTS_DIR}/{task_id}.json"
         with open(result_file, "r", encoding="utf-8") as f:
             result = json.load(f)
@@ -295,14 +283,30 @@ def process_video_task(task_id):
             if os.path.exists(local_thumb):
                 thumbnail = os.path.basename(local_thumb)
         result["thumbnail"] = thumbnail
+        # 卡片 / 大图 WebP 版本（失败不影响任务，可用 fix_thumbnails.py 回填）
+        try:
+            thumbnails.generate(thumbnail)
+        except Exception as e:
+            logger.info(f"--- [Process Task] 缩略图版本生成失败: {e} ---")
         result["media_path"] = os.path.basename(transcription_source_path)
         result["user_id"] = user_id
         result["channel"] = channel
         result["channel_id"] = channel_id
         result["channel_avatar"] = channel_avatar
+        result["is_public"] = is_public
+        # 并入本进程的阶段耗时（下载 / 抽音频），与 worker 的汇总合并
+        usage_metrics = result.setdefault("usage", {}).setdefault("metrics", {})
+        usage_metrics["stages"] = metrics.merge_summaries(usage_metrics.get("stages"), metrics.timings_summary())
         
         with open(result_file, "w", encoding="utf-8") as f:
             json.dump(result, f, ensure_ascii=False, indent=2)
+
+        # 3.5 全文索引（失败不影响任务完成，可用 scripts/build_search_index.py 回填）
+        try:
+            n_segments = transcript_index.index_result(video_id if url else task_id, result, is_public=is_public)
+            logger.info(f"--- [Process Task] 已写入全文索引: {n_segments} 个片段 ---")
+        except Exception as idx_e:
+            logger.info(f"[Process Task] 全文索引写入失败: {idx_e}")
             
         # 4. Save to Supabase
         if supabase:
@@ -330,32 +334,22 @@ def process_video_task(task_id):
                     "status": "completed"
                 }
                 logger.info(f"--- [Process Task] Saving results to Supabase for video {video_data['id']} ---")
-                res = supabase.table("videos").upsert(video_data).execute()
+                with metrics.timed("supabase_sync"):
+                    res = supabase.table("videos").upsert(video_data).execute()
                 if not res.data:
                     logger.info(f"[Process Task] Warning: Upsert returned empty data for {video_data['id']}")
                 else:
                     logger.info(f"Successfully saved to Supabase: {video_data['id']}")
                 
-                # Keywords sync
+                # Keywords sync（单次 RPC 批量 upsert + 原子计数）
                 keywords = result.get("keywords", [])
                 if keywords:
                     logger.info(f"--- [Process Task] Syncing {len(keywords)} keywords ---")
-                    for kw in keywords:
-                        kw_clean = kw.strip()
-                        if not kw_clean: continue
-                        try:
-                            kw_res = supabase.table("keywords").select("id, count").eq("name", kw_clean).execute()
-                            if kw_res.data:
-                                kw_id = kw_res.data[0]["id"]
-                                new_count = (kw_res.data[0]["count"] or 0) + 1
-                                supabase.table("keywords").update({"count": new_count}).eq("id", kw_id).execute()
-                            else:
-                                new_kw = supabase.table("keywords").insert({"name": kw_clean, "count": 1}).execute()
-                                if new_kw.data: kw_id = new_kw.data[0]["id"]
-                                else: continue
-                            supabase.table("video_keywords").upsert({"video_id": video_data["id"], "keyword_id": kw_id}).execute()
-                        except Exception as kw_e:
-                            logger.info(f"[Process Task] Error syncing keyword '{kw_clean}': {kw_e}")
+                    try:
+                        with metrics.timed("supabase_keywords"):
+                            sync_video_keywords(supabase, video_data["id"], keywords)
+                    except Exception as kw_e:
+                        logger.info(f"[Process Task] Error syncing keywords: {kw_e}")
 
                 if user_id:
                     # submissions table should already have a link if it was created during /process
@@ -384,6 +378,8 @@ def process_video_task(task_id):
                 # If Supabase sync fails, we DO NOT mark it as completed in the results file if we want to retry,
                 # but here the task is physically "done", so we keep it completed locally but log the failure.
         
+        clock.stop()
+        metrics.incr("tasks_total", status="completed", mode=mode)
         save_status(task_id, "completed", 100)
         return True
 
@@ -401,6 +397,7 @@ def process_video_task(task_id):
         if not existing_has_traceback:
             with open(error_file, "w") as f:
                 json.dump({"error": str(e), "traceback": traceback.format_exc()}, f, ensure_ascii=False)
+        metrics.incr("tasks_total", status="failed", mode=mode)
         save_status(task_id, "failed", 100)
         if supabase:
             try:
@@ -414,5 +411,7 @@ if __name__ == "__main__":
         sys.exit(1)
     
     tid = sys.argv[1]
-    success = process_video_task(tid)
+    with tracing.span("process_task") as task_span:
+        success = process_video_task(tid)
+        task_span.set(success=success)
     sys.exit(0 if success else 1)
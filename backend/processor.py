@@ -8,6 +8,7 @@ from openai import OpenAI
 from dotenv import load_dotenv
 from server_pool import ServerPool, OllamaServer
 from app_logger import get_logger
+import metrics
 
 load_dotenv()
 logger = get_logger(__name__)
@@ -361,14 +362,18 @@ def _process_chunk_single(idx, chunk, context, llm_client, model, prompt_templat
     content = None
     response = None
     max_attempts = 5
-    for attempt in range(max_attempts):
-        response = llm_client.chat.completions.create(**call_kwargs)
-        content = response.choices[0].message.content
-        if content and content.strip():
-            break
-        wait = 2 ** attempt
-        logger.info(f"Chunk {idx+1}: empty response (attempt {attempt+1}/{max_attempts}), retrying in {wait}s...")
-        time.sleep(wait)
+    server = _server_label(llm_client)
+    with metrics.timed("llm_chunk", server=server):
+        for attempt in range(max_attempts):
+            call_started = time.perf_counter()
+            response = llm_client.chat.completions.create(**call_kwargs)
+            call_seconds = time.perf_counter() - call_started
+            content = response.choices[0].message.content
+            if content and content.strip():
+                break
+            wait = 2 ** attempt
+            logger.info(f"Chunk {idx+1}: empty response (attempt {attempt+1}/{max_attempts}), retrying in {wait}s...")
+            time.sleep(wait)
 
     logger.info(f"--- Chunk {idx+1}/{total_chunks} LLM Response Received ---")
 
@@ -389,6 +394,10 @@ def _process_chunk_single(idx, chunk, context, llm_client, model, prompt_templat
         "completion_tokens": response.usage.completion_tokens,
         "total_tokens": response.usage.total_tokens,
     }
+    metrics.incr("llm_tokens_total", usage["prompt_tokens"], server=server, type="prompt")
+    metrics.incr("llm_tokens_total", usage["completion_tokens"], server=server, type="completion")
+    if call_seconds > 0 and usage["completion_tokens"]:
+        metrics.observe("llm_tokens_per_second", usage["completion_tokens"] / call_seconds, server=server)
 
     # 解析段落（鲁棒查找）
     chunk_paras = []
@@ -422,13 +431,20 @@ def _process_chunk_single(idx, chunk, context, llm_client, model, prompt_templat
         elif isinstance(p, str):
             structured_paras.append({"sentences": [{"start": 0, "text": p}]})
 
-    # 质量检查
-    quality_ok, reason = _validate_chunk_quality(chunk, structured_paras, prompt_mode)
+    # 质量检查（含幻觉模式检测）
+    with metrics.timed("hallucination_check"):
+        quality_ok, reason = _validate_chunk_quality(chunk, structured_paras, prompt_mode)
     logger.info(f"Chunk {idx+1}/{total_chunks} structured. quality={quality_ok} {reason}")
 
     return idx, structured_paras, usage, quality_ok, reason
 
 
+def _server_label(llm_client):
+    """指标里的服务器标签：客户端的 base_url（未知时为 default）"""
+    base_url = getattr(llm_client, "base_url", None) or getattr(llm_client, "_base_url", None)
+    return str(base_url).rstrip("/") if base_url else "default"
+
+
 def _validate_chunk_quality(chunk_input, chunk_paras, prompt_mode):
     """验证单个 chunk 的 LLM 输出质量，返回 (is_ok, reason)"""
     from hallucination_detector import detect_hallucination_patterns
@@ -544,62 +560,65 @@ def _process_chunks_parallel(chunks, chunk_contexts, pool, params):
     # ── 重试阶段 ──
     if retry_queue:
         logger.info(f"--- [Retry] {len(retry_queue)} chunks 需要重试: {[i+1 for i in retry_queue]} ---")
-        for idx in retry_queue:
-            retried = False
-
-            # 策略 1: 尝试另一台可用 Ollama 服务器
-            for server in pool.get_available_servers():
-                try:
-                    logger.info(f"--- [Retry] Chunk {idx+1} → {server.base_url} ---")
-                    server_model = server.model or params["actual_model"]
-                    _, paras, usage, quality_ok, reason = _process_chunk_single(
-                        idx, chunks[idx], chunk_contexts[idx],
-                        server.client, server_model,
-                        params["current_prompt"], params["video_context"],
-                        params["keywords"], params["prompt_mode"], params["total_chunks"])
-                    for k in total_usage:
-                        total_usage[k] += usage.get(k, 0)
-                    if quality_ok:
-                        results[idx] = paras
-                        server.report_success()
-                        retried = True
-                        break
-                    server.report_success()
-                except Exception as e:
-                    server.report_failure()
-                    logger.info(f"--- [Retry] Chunk {idx+1} 在 {server.base_url} 失败: {e} ---")
-
-            # 策略 2: 按 YAML 优先级逐个 fallback
-            if not retried:
-                for fb_cfg in llm_provider.get_all_enabled():
-                    if retried:
-                        break
-                    # 跳过已经在策略 1 试过的 Ollama servers
-                    if fb_cfg["name"] == "ollama":
-                        continue
-                    fb_client = llm_provider._create_client(fb_cfg)
-                    if not fb_client:
-                        continue
-                    fb_model = fb_cfg.get("model", "gpt-4o-mini")
+        # 幻觉 / 质量不合格 chunk 的修复耗时
+        metrics.incr("llm_chunk_retries_total", len(retry_queue))
+        with metrics.timed("hallucination_repair"):
+            for idx in retry_queue:
+                retried = False
+
+                # 策略 1: 尝试另一台可用 Ollama 服务器
+                for server in pool.get_available_servers():
                     try:
-                        logger.info(f"--- [Retry] Chunk {idx+1} → {fb_cfg['name']} {fb_model} 兜底 ---")
+                        logger.info(f"--- [Retry] Chunk {idx+1} → {server.base_url} ---")
+                        server_model = server.model or params["actual_model"]
                         _, paras, usage, quality_ok, reason = _process_chunk_single(
                             idx, chunks[idx], chunk_contexts[idx],
-                            fb_client, fb_model,
+                            server.client, server_model,
                             params["current_prompt"], params["video_context"],
                             params["keywords"], params["prompt_mode"], params["total_chunks"])
                         for k in total_usage:
                             total_usage[k] += usage.get(k, 0)
-                        if quality_ok or paras:
+                        if quality_ok:
                             results[idx] = paras
+                            server.report_success()
                             retried = True
+                            break
+                        server.report_success()
                     except Exception as e:
-                        logger.info(f"--- [Retry] Chunk {idx+1} {fb_cfg['name']} 兜底失败: {e} ---")
-
-            # 策略 3: group_by_time 最终兜底
-            if not retried:
-                logger.info(f"--- [Retry] Chunk {idx+1} 所有重试失败，使用基础分组 ---")
-                results[idx] = group_by_time(chunks[idx])
+                        server.report_failure()
+                        logger.info(f"--- [Retry] Chunk {idx+1} 在 {server.base_url} 失败: {e} ---")
+
+                # 策略 2: 按 YAML 优先级逐个 fallback
+                if not retried:
+                    for fb_cfg in llm_provider.get_all_enabled():
+                        if retried:
+                            break
+                        # 跳过已经在策略 1 试过的 Ollama servers
+                        if fb_cfg["name"] == "ollama":
+                            continue
+                        fb_client = llm_provider._create_client(fb_cfg)
+                        if not fb_client:
+                            continue
+                        fb_model = fb_cfg.get("model", "gpt-4o-mini")
+                        try:
+                            logger.info(f"--- [Retry] Chunk {idx+1} → {fb_cfg['name']} {fb_model} 兜底 ---")
+                            _, paras, usage, quality_ok, reason = _process_chunk_single(
+                                idx, chunks[idx], chunk_contexts[idx],
+                                fb_client, fb_model,
+                                params["current_prompt"], params["video_context"],
+                                params["keywords"], params["prompt_mode"], params["total_chunks"])
+                            for k in total_usage:
+                                total_usage[k] += usage.get(k, 0)
+                            if quality_ok or paras:
+                                results[idx] = paras
+                                retried = True
+                        except Exception as e:
+                            logger.info(f"--- [Retry] Chunk {idx+1} {fb_cfg['name']} 兜底失败: {e} ---")
+
+                # 策略 3: group_by_time 最终兜底
+                if not retried:
+                    logger.info(f"--- [Retry] Chunk {idx+1} 所有重试失败，使用基础分组 ---")
+                    results[idx] = group_by_time(chunks[idx])
 
     # ── 按序组装 ──
     all_paragraphs = []
@@ -638,6 +657,7 @@ def _process_chunks_sequential(chunks, chunk_contexts, llm_client, provider, par
 
     return all_paragraphs, total_usage
 
+@metrics.timed("summarize")
 def summarize_text(full_text, title="", description="", language=None):
     """
     调用 LLM 对全文本进行总结并提炼关键词。
@@ -1117,6 +1137,7 @@ def _translate_paragraphs_chunk(idx, paragraphs_chunk, source_lang, target_lang,
     return idx, translated_paras, usage
 
 
+@metrics.timed("translate")
 def translate_content(title, paragraphs, summary, keywords, source_lang, target_lang):
     """
     将视频内容从 source_lang 翻译到 target_lang。
@@ -0,0 +1,118 @@
+"""
+任务进度推送（SSE 的数据源）
+同一任务的所有订阅者共享一个观察者协程：API 进程内 save_status 直接 publish，
+其他进程（scheduler / process_task / worker）写入的状态由观察者按状态库版本号轮询发现。
+轮询只针对有订阅者的任务，每个任务每个周期一次本地 SQLite 主键读取，与观看人数无关；不查 Supabase。
+"""
+import asyncio
+from app_logger import get_logger
+from status_store import TERMINAL_STATUSES
+logger = get_logger(__name__)
+
+POLL_INTERVAL_SECONDS = 0.5
+# 每个订阅者只需要最新状态，队列满时丢弃旧状态
+SUBSCRIBER_QUEUE_SIZE = 8
+
+
+class ProgressHub:
+    """
+    read_status(task_id) -> (版本标识, 状态字典) 或 (None, None)：
+    版本标识用于判断是否有变化（如状态库的 version），状态字典为推送给前端的内容。
+    """
+
+    def __init__(self, read_status, poll_interval=POLL_INTERVAL_SECONDS):
+        self.read_status = read_status
+        self.poll_interval = poll_interval
+        self._subscribers = {}  # task_id -> set[asyncio.Queue]
+        self._watchers = {}     # task_id -> asyncio.Task
+        self._latest = {}       # task_id -> 最近一次推送的状态
+        self._versions = {}
+        self._loop = None
+
+    def subscriber_count(self, task_id=None):
+        if task_id is not None:
+            return len(self._subscribers.get(task_id, ()))
+        return sum(len(s) for s in self._subscribers.values())
+
+    def latest(self, task_id):
+        return self._latest.get(task_id)
+
+    def publish(self, task_id, status):
+        """推送一条状态（可在任意线程调用；无订阅者时直接忽略）"""
+        loop = self._loop
+        if loop is None or task_id not in self._subscribers:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._fan_out(task_id, status)
+        else:
+            try:
+                loop.call_soon_threadsafe(self._fan_out, task_id, status)
+            except RuntimeError:
+                # 事件循环已关闭（如进程退出中），交给观察者下次轮询
+                pass
+
+    def _fan_out(self, task_id, status):
+        if status == self._latest.get(task_id):
+            return
+        self._latest[task_id] = status
+        for queue in list(self._subscribers.get(task_id, ())):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(status)
+
+    async def _watch(self, task_id):
+        """跨进程更新：按版本标识轮询，有变化才读取并推送"""
+        try:
+            while task_id in self._subscribers:
+                try:
+                    version, status = await asyncio.to_thread(self.read_status, task_id)
+                except Exception as e:
+                    logger.info(f"[ProgressHub] 读取状态失败 {task_id}: {e}")
+                    version, status = None, None
+                if status is not None and version != self._versions.get(task_id):
+                    self._versions[task_id] = version
+                    self._fan_out(task_id, status)
+                await asyncio.sleep(self.poll_interval)
+        except asyncio.CancelledError:
+            pass
+
+    async def subscribe(self, task_id, keepalive=None):
+        """
+        订阅任务进度的异步生成器：先给出当前状态（若有），之后每次变化给出新状态，
+        遇到 completed / failed 后结束。调用方断开时自动退订。
+        keepalive 秒内无变化时给出 None，供调用方发送心跳、检查连接。
+        """
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        subscribers = self._subscribers.setdefault(task_id, set())
+        subscribers.add(queue)
+        if task_id in self._latest:
+            queue.put_nowait(self._latest[task_id])
+        if task_id not in self._watchers:
+            self._watchers[task_id] = asyncio.create_task(self._watch(task_id))
+        try:
+            while True:
+                try:
+                    status = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield status
+                if status.get("status") in TERMINAL_STATUSES:
+                    return
+        finally:
+            subscribers.discard(queue)
+            if not subscribers:
+                self._subscribers.pop(task_id, None)
+                self._latest.pop(task_id, None)
+                self._versions.pop(task_id, None)
+                watcher = self._watchers.pop(task_id, None)
+                if watcher:
+                    watcher.cancel()
@@ -0,0 +1,203 @@
+"""
+任务队列调度策略：租户间加权公平 + 短作业优先 + 等待老化
+手动提交仍整体优先于 tracker 任务。同一层级内先按租户（提交用户；tracker 自成一个租户）做加权公平排队：
+每个租户累计已分配的估计耗时 / 权重作为虚拟时间，轮到虚拟完成时间最早的租户；
+租户内部按“估计耗时 - 老化系数 × 已等待时间”排序，短视频先跑，长视频不会被持续到来的短任务饿死。
+scheduler.get_next_task 取队首，/result 用同一排序给出排队位置与预计开始时间，
+/process 据此做准入控制（单用户在途上限、全局积压上限，超出返回 429 + Retry-After）。
+"""
+import os
+import json
+import time
+from datetime import datetime
+
+# 时长未知时（手动提交的 YouTube 链接入队时尚未取元数据）的假定时长
+DEFAULT_DURATION_SECONDS = 600
+# 与时长弱相关的固定开销：下载、元数据、LLM 摘要等
+FIXED_OVERHEAD_SECONDS = 60
+# 处理耗时 / 音频时长（实时率），按转录模式区分
+REALTIME_FACTOR = {"local": 0.25, "cloud": 0.08}
+# 每等待 1 秒，排序分值降低 AGING_RATE 秒
+AGING_RATE = 0.5
+# 层级：数值小者整体优先
+TIER_MANUAL = 0
+TIER_TRACKER = 1
+
+# 租户权重（默认 1.0），可用环境变量 QUEUE_TENANT_WEIGHTS='{"user:<uuid>": 2}' 覆盖
+TRACKER_TENANT = "tracker"
+DEFAULT_TENANT_WEIGHT = 1.0
+TENANT_WEIGHTS = json.loads(os.environ.get("QUEUE_TENANT_WEIGHTS", "{}") or "{}")
+# 准入控制：单个租户排队 + 处理中的任务数上限；全局积压（估计剩余处理时间）上限
+MAX_INFLIGHT_PER_TENANT = int(os.environ.get("QUEUE_MAX_INFLIGHT_PER_USER", 20))
+MAX_BACKLOG_SECONDS = float(os.environ.get("QUEUE_MAX_BACKLOG_SECONDS", 6 * 3600))
+# Retry-After 的下限，避免客户端紧密重试
+MIN_RETRY_AFTER_SECONDS = 30
+
+# 取队列时的轻量列（JSON 路径别名，避免拉取整个 report_data）
+QUEUE_COLUMNS = ("id, status, created_at, user_id, duration:report_data->duration, "
+                 "mode:report_data->>mode, source:report_data->>source")
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def estimate_cost(duration=None, mode=None):
+    """估计单个任务的处理耗时（秒）"""
+    try:
+        duration = float(duration) if duration else DEFAULT_DURATION_SECONDS
+    except (TypeError, ValueError):
+        duration = DEFAULT_DURATION_SECONDS
+    rtf = REALTIME_FACTOR.get(mode or "local", REALTIME_FACTOR["local"])
+    return FIXED_OVERHEAD_SECONDS + duration * rtf
+
+
+def tier(task):
+    return TIER_MANUAL if task.get("source") == "manual" else TIER_TRACKER
+
+
+def tenant(task):
+    """公平排队的租户：手动提交按用户区分，tracker 任务共用一个租户"""
+    if tier(task) == TIER_TRACKER:
+        return TRACKER_TENANT
+    return f"user:{task.get('user_id') or 'anonymous'}"
+
+
+def tenant_weight(name):
+    try:
+        return max(0.01, float(TENANT_WEIGHTS.get(name, DEFAULT_TENANT_WEIGHT)))
+    except (TypeError, ValueError):
+        return DEFAULT_TENANT_WEIGHT
+
+
+def _waited(task, now):
+    created = _timestamp(task.get("created_at"))
+    return max(0.0, now - created) if created else 0.0
+
+
+def priority(task, now=None):
+    """租户内的排序键（越小越先执行）：(层级, 估计耗时 - 老化)"""
+    now = now or time.time()
+    return tier(task), estimate_cost(task.get("duration"), task.get("mode")) - AGING_RATE * _waited(task, now)
+
+
+def order_queue(tasks, now=None, running=None):
+    """
+    按调度策略排序排队中的任务。running 为处理中的任务，计入其租户已占用的虚拟时间，
+    避免刚占用执行器的用户紧接着再次轮到。
+    """
+    now = now or time.time()
+    per_tenant = {}
+    for t in sorted(tasks, key=lambda t: (priority(t, now), t.get("created_at") or "")):
+        per_tenant.setdefault((tier(t), tenant(t)), []).append(t)
+
+    vtime = {}
+    for t in running or []:
+        key = (tier(t), tenant(t))
+        vtime[key] = vtime.get(key, 0.0) + estimate_cost(t.get("duration"), t.get("mode")) / tenant_weight(key[1])
+
+    ordered = []
+    while per_tenant:
+        def finish_key(key):
+            head = per_tenant[key][0]
+            finish = vtime.get(key, 0.0) + estimate_cost(head.get("duration"), head.get("mode")) / tenant_weight(key[1])
+            # 队首任务的等待老化同样作用于租户之间，长任务不会被其他租户的短任务持续插队
+            return key[0], finish - AGING_RATE * _waited(head, now), head.get("created_at") or ""
+        key = min(per_tenant, key=finish_key)
+        head = per_tenant[key].pop(0)
+        ordered.append(head)
+        vtime[key] = vtime.get(key, 0.0) + estimate_cost(head.get("duration"), head.get("mode")) / tenant_weight(key[1])
+        if not per_tenant[key]:
+            del per_tenant[key]
+    return ordered
+
+
+def queue_positions(tasks, now=None, progress=None):
+    """
+    计算排队任务的位置与预计开始时间。
+    tasks 含 queued 与 processing 任务；progress 为 {task_id: 0-100}，用于估算正在处理任务的剩余时间。
+    返回 {task_id: {"queue_position": 从 1 开始, "predicted_start": epoch 秒}}
+    """
+    now = now or time.time()
+    progress = progress or {}
+
+    # 顺序执行：先等正在处理的任务结束
+    busy_until = now
+    for t in tasks:
+        if t.get("status") == "processing":
+            remaining = estimate_cost(t.get("duration"), t.get("mode")) * (1 - progress.get(t["id"], 0) / 100.0)
+            busy_until += max(0.0, remaining)
+
+    positions = {}
+    start = busy_until
+    queued = [t for t in tasks if t.get("status", "queued") == "queued"]
+    running = [t for t in tasks if t.get("status") == "processing"]
+    for i, t in enumerate(order_queue(queued, now, running)):
+        positions[t["id"]] = {"queue_position": i + 1, "predicted_start": start}
+        start += estimate_cost(t.get("duration"), t.get("mode"))
+    return positions
+
+
+def admission(tasks, new_task, now=None, progress=None):
+    """
+    判断能否再接收 new_task（含 source / user_id / duration / mode）。
+    tasks 为当前排队与处理中的任务。可接收返回 None，否则返回 (原因, 建议重试秒数)：
+    - 该租户在途任务已达 MAX_INFLIGHT_PER_TENANT：等到其最早一个任务预计完成；
+    - 按公平排队插入后，新任务的预计完成时间超过 MAX_BACKLOG_SECONDS：等到超出部分消化完。
+      积压只由排在它前面的任务决定，提交少的用户即使全局队列很长也能被接收。
+    """
+    now = now or time.time()
+    progress = progress or {}
+    candidate = {**new_task, "id": new_task.get("id") or "__new__", "status": "queued",
+                 "created_at": new_task.get("created_at") or now}
+    positions = queue_positions(list(tasks) + [candidate], now, progress)
+
+    def finish_at(t):
+        cost = estimate_cost(t.get("duration"), t.get("mode"))
+        if t.get("status") == "processing":
+            return now + cost * (1 - progress.get(t["id"], 0) / 100.0)
+        return positions[t["id"]]["predicted_start"] + cost
+
+    own = [t for t in tasks if tenant(t) == tenant(candidate)]
+    if len(own) >= MAX_INFLIGHT_PER_TENANT:
+        wait = min(finish_at(t) for t in own) - now
+        return "tenant_inflight_limit", max(MIN_RETRY_AFTER_SECONDS, int(wait))
+
+    backlog = finish_at(candidate) - now
+    if backlog > MAX_BACKLOG_SECONDS:
+        return "backlog_limit", max(MIN_RETRY_AFTER_SECONDS, int(backlog - MAX_BACKLOG_SECONDS))
+    return None
+
+
+def fetch_active_tasks(client, page_size=500):
+    """
+    取全部排队中与处理中的任务（轻量列，含 user_id 供租户划分）。
+    按 created_at, id 分页取完，不截断：积压超过一页时较新的任务同样参与公平排序与排队位置计算。
+    """
+    tasks = []
+    while True:
+        res = client.table("videos") \
+            .select(QUEUE_COLUMNS) \
+            .in_("status", ["queued", "processing"]) \
+            .order("created_at", desc=False) \
+            .order("id", desc=False) \
+            .range(len(tasks), len(tasks) + page_size - 1) \
+            .execute()
+        page = res.data or []
+        tasks.extend(page)
+        if len(page) < page_size:
+            return tasks
+
+
+def select_next(client, now=None):
+    """调度器的下一个任务：取全部在途任务后按 order_queue 排序，返回队首的 id；没有排队任务返回 None"""
+    tasks = fetch_active_tasks(client)
+    queued = [t for t in tasks if t.get("status") == "queued"]
+    if not queued:
+        return None
+    running = [t for t in tasks if t.get("status") == "processing"]
+    return order_queue(queued, now, running)[0]["id"]
@@ -12,6 +12,7 @@ load_dotenv()
 
 from db import get_db
 from processor import split_into_paragraphs, summarize_text, detect_language_preference
+from admin_stats import build_usage_estimate
 
 RESULTS_DIR = "results"
 supabase = get_db()
@@ -122,6 +123,7 @@ def rerun_task(task_id: str):
         },
         "llm_cost": round(llm_cost, 6),
         "total_cost": round(old_usage.get("whisper_cost", 0) + llm_cost, 6),
+        "estimated_llm": build_usage_estimate(paragraphs, result.get("raw_subtitles")),
     }
 
     with open(result_file, "w", encoding="utf-8") as f:
@@ -5,6 +5,10 @@ import subprocess
 import sys
 from datetime import datetime, timedelta, timezone
 from db import get_db
+import queue_policy
+import tracing
+import status_store
+from status_store import save_status
 from app_logger import get_logger
 logger = get_logger(__name__)
 
@@ -16,12 +20,6 @@ CONSECUTIVE_ERRORS_BEFORE_RECONNECT = 3  # 连续失败次数触发重连
 supabase = get_db()
 _consecutive_db_errors = 0
 
-def save_status(task_id, status, progress, eta=None):
-    if not os.path.exists(RESULTS_DIR):
-        os.makedirs(RESULTS_DIR)
-    with open(f"{RESULTS_DIR}/{task_id}_status.json", "w") as f:
-        json.dump({"status": status, "progress": progress, "eta": eta}, f)
-
 def check_stuck_tasks():
     """将超时卡住的任务自动标记为 failed"""
     if not supabase:
@@ -48,56 +46,19 @@ def get_next_task():
     global supabase, _consecutive_db_errors
 
     if not supabase:
-        # Fallback to local status files if no Supabase
-        if not os.path.exists(RESULTS_DIR):
+        # 无 Supabase 时回退到本地状态库：最早入队的优先
+        queued = status_store.list_statuses(["queued"])
+        if not queued:
             return None
-
-        queued_tasks = []
-        for f in os.listdir(RESULTS_DIR):
-            if f.endswith("_status.json"):
-                with open(os.path.join(RESULTS_DIR, f), "r") as rf:
-                    try:
-                        data = json.load(rf)
-                        if data.get("status") == "queued":
-                            tid = f.replace("_status.json", "")
-                            mtime = os.path.getmtime(os.path.join(RESULTS_DIR, f))
-                            queued_tasks.append((tid, mtime))
-                    except:
-                        continue
-        if not queued_tasks:
-            return None
-
-        # Sort by mtime ascending (oldest first)
-        queued_tasks.sort(key=lambda x: x[1])
-        return {"id": queued_tasks[0][0], "is_local": True}
+        return {"id": queued[0][0], "is_local": True}
 
     try:
         if supabase:
-            # 1. First, try to fetch 'manual' tasks (highest priority)
-            response = supabase.table("videos") \
-                .select("id") \
-                .eq("status", "queued") \
-                .filter("report_data->>source", "eq", "manual") \
-                .order("created_at", desc=False) \
-                .limit(1) \
-                .execute()
-
-            if response.data:
+            # 手动任务整体优先；同层级内用户间加权公平，用户内短作业优先 + 等待老化（见 queue_policy）
+            next_id = queue_policy.select_next(supabase)
+            if next_id:
                 _consecutive_db_errors = 0
-                return {"id": response.data[0]["id"], "is_local": False}
-
-            # 2. If no manual tasks, fetch 'tracker' tasks (or those without a specific source)
-            response = supabase.table("videos") \
-                .select("id") \
-                .eq("status", "queued") \
-                .or_("report_data->>source.eq.tracker,report_data->>source.is.null") \
-                .order("created_at", desc=False) \
-                .limit(1) \
-                .execute()
-
-            if response.data:
-                _consecutive_db_errors = 0
-                return {"id": response.data[0]["id"], "is_local": False}
+                return {"id": next_id, "is_local": False}
 
             # 查询成功但无任务
             _consecutive_db_errors = 0
@@ -111,32 +72,13 @@ def get_next_task():
             supabase = get_db(force_new=True)
             _consecutive_db_errors = 0
     
-    # Fallback to local status files if Supabase is unavailable or returns nothing
-    # (Existing local logic remains as fallback)
-    if not os.path.exists(RESULTS_DIR):
-        return None
-    
-    queued_tasks = []
-    for f in os.listdir(RESULTS_DIR):
-        if f.endswith("_status.json"):
-            tid = f.replace("_status.json", "")
-            if os.path.exists(f"{RESULTS_DIR}/{tid}.json") or os.path.exists(f"{RESULTS_DIR}/{tid}_error.json"):
-                continue
-                
-            with open(os.path.join(RESULTS_DIR, f), "r") as rf:
-                try:
-                    data = json.load(rf)
-                    if data.get("status") == "queued":
-                        mtime = os.path.getmtime(os.path.join(RESULTS_DIR, f))
-                        # For local fallback, we don't differentiate priority yet as it's a rare case
-                        queued_tasks.append((tid, mtime))
-                except: continue
-                
-    if not queued_tasks:
-        return None
-    
-    queued_tasks.sort(key=lambda x: x[1])
-    return {"id": queued_tasks[0][0], "is_local": True}
+    # Fallback to local status store if Supabase is unavailable or returns nothing
+    # For local fallback, we don't differentiate priority yet as it's a rare case
+    for tid, _ in status_store.list_statuses(["queued"]):
+        if os.path.exists(f"{RESULTS_DIR}/{tid}.json") or os.path.exists(f"{RESULTS_DIR}/{tid}_error.json"):
+            continue
+        return {"id": tid, "is_local": True}
+    return None
 
 def run_scheduler():
     logger.info("--- [Scheduler] Started and monitoring queue... ---")
@@ -158,18 +100,7 @@ def run_scheduler():
                     supabase.table("videos").update({"status": "processing"}).eq("id", task_id).execute()
                 except: pass
 
-            # Trigger processing
-            # For simplicity and backward compatibility, we'll call a modified version of the processing logic
-            # OR we can just trigger the existing worker logic if it's already set up.
-            
-            # Actually, main.py's background_process is what we want, 
-            # but it's an async function inside main.py.
-            # It's better to have a CLI-driven processing entry point.
-            
-            # For now, let's assume we can call main.py's background_process logic via a script
-            # OR refactor main.py to expose it.
-            
-            # Let's create a small wrapper script 'process_task.py' that imports and runs the logic.
+            # 处理入口：process_task.py（下载、提取音频、调用 worker 转录并回写结果）
             cmd = [sys.executable, "process_task.py", task_id]
             # Use 'nice -n 15' on Unix/Mac to lower priority
             if sys.platform != "win32":
@@ -179,7 +110,10 @@ def run_scheduler():
             try:
                 # Use subprocess.run to wait for completion (sequential)
                 # 捕获 stderr 以便在崩溃时保留诊断信息
-                result = subprocess.run(cmd, stderr=subprocess.PIPE, text=True)
+                # 每次执行开启一个 trace，经环境变量传给 process_task / worker
+                with tracing.span("scheduler.run_task", task_id=task_id, is_local=task.get("is_local")) as run_span:
+                    result = subprocess.run(cmd, stderr=subprocess.PIPE, text=True, env=tracing.child_env())
+                    run_span.set(exit_code=result.returncode)
                 if result.returncode == 0:
                     logger.info(f"--- [Scheduler] Task {task_id} completed successfully ---")
                 else:
@@ -1,38 +1,85 @@
 #!/usr/bin/env python3
+"""
+关键词回填脚本
+
+用法：
+    # 为缺失关键词的视频调用 LLM 重新提取，并同步到关系表
+    python scripts/backfill_keywords.py
+
+    # 仅将已有关键词同步到 keywords / video_keywords 关系表（不调用 LLM）
+    python scripts/backfill_keywords.py --sync-only
+"""
 import os
 import sys
 import json
 import time
+import argparse
 
 # 添加父目录到路径以便导入
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from db import get_db
-from processor import summarize_text
+from db import get_db, sync_video_keywords
+
+PAGE_SIZE = 500
+
+
+def iter_videos(supabase, columns):
+    """按主键分页遍历 videos 表，避免一次性拉取全部 report_data。"""
+    last_id = None
+    while True:
+        query = supabase.table("videos").select(columns).order("id").limit(PAGE_SIZE)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.execute().data or []
+        if not page:
+            return
+        for v in page:
+            yield v
+        last_id = page[-1]["id"]
+
+
+def sync_existing():
+    """将 report_data.keywords 中已有的关键词批量同步到关系表，每个视频一次 RPC。"""
+    supabase = get_db()
+    if not supabase:
+        print("Error: Supabase client not initialized.")
+        return
+
+    print("--- Starting Keywords Relation Sync ---")
+    total, linked = 0, 0
+    for v in iter_videos(supabase, "id, report_data->keywords"):
+        keywords = v.get("keywords") or []
+        if not keywords:
+            continue
+        try:
+            linked += sync_video_keywords(supabase, v["id"], keywords)
+            total += 1
+        except Exception as e:
+            print(f"Error syncing {v['id']}: {e}")
+
+    print(f"\n--- Sync Completed: {total} videos, {linked} new keyword links ---")
+
 
 def backfill():
+    from processor import summarize_text
+
     supabase = get_db()
     if not supabase:
         print("Error: Supabase client not initialized.")
         return
 
     print("--- Starting Keywords Backfill ---")
-    
-    # 1. 获取所有视频
-    response = supabase.table("videos").select("id, title, report_data").execute()
-    videos = response.data
-    print(f"Total videos to check: {len(videos)}")
 
-    for v in videos:
+    for v in iter_videos(supabase, "id, title, report_data"):
         vid = v["id"]
         title = v["title"]
-        report_data = v.get("report_data", {})
+        report_data = v.get("report_data") or {}
         existing_keywords = report_data.get("keywords", [])
-        
+
         # 如果关键词为空，执行重新提取
         if not existing_keywords or len(existing_keywords) == 0:
             print(f"\nProcessing [{vid}] {title}...")
-            
+
             # 拼接全文
             paragraphs = report_data.get("paragraphs")
             full_text = ""
@@ -43,11 +90,11 @@ def backfill():
                         if sentences:
                             for s in sentences:
                                 full_text += s.get("text", "")
-            
+
             if not full_text:
                 print(f"Skipping {vid}: No transcription text found.")
                 continue
-                
+
             # 调用 LLM 重新提取
             description = report_data.get("description", "")
             try:
@@ -55,50 +102,30 @@ def backfill():
                 summary_data, usage = summarize_text(full_text, title=title, description=description)
                 keywords = summary_data.get("keywords", [])
                 summary = summary_data.get("summary", "")
-                
+
                 if keywords:
                     print(f"Extracted Keywords: {keywords}")
-                    
+
                     # 更新 report_data
                     report_data["keywords"] = keywords
                     report_data["summary"] = summary
-                    
+
                     # 更新数据库 videos 表
                     supabase.table("videos").update({"report_data": report_data}).eq("id", vid).execute()
-                    
+
                     # 尝试同步到关系表 (keywords / video_keywords)
                     # 如果表不存在，此步会打印错误但不会中断整个回填
                     try:
-                        for kw in keywords:
-                            kw_clean = kw.strip()
-                            if not kw_clean: continue
-                            
-                            # 获取或创建关键词
-                            kw_res = supabase.table("keywords").select("id, count").eq("name", kw_clean).execute()
-                            if kw_res.data:
-                                kw_id = kw_res.data[0]["id"]
-                                new_count = (kw_res.data[0]["count"] or 0) + 1
-                                supabase.table("keywords").update({"count": new_count}).eq("id", kw_id).execute()
-                            else:
-                                new_kw = supabase.table("keywords").insert({"name": kw_clean, "count": 1}).execute()
-                                if new_kw.data:
-                                    kw_id = new_kw.data[0]["id"]
-                                else: continue
-                            
-                            # 建立关联
-                            supabase.table("video_keywords").upsert({
-                                "video_id": vid,
-                                "keyword_id": kw_id
-                            }).execute()
+                        sync_video_keywords(supabase, vid, keywords)
                         print(f"Successfully synced relational keywords for {vid}")
                     except Exception as relational_err:
                         print(f"Warning: Relational sync failed (Keywords tables may not exist yet): {relational_err}")
                 else:
                     print(f"LLM returned no keywords for {vid}")
-                    
+
             except Exception as e:
                 print(f"Error processing {vid}: {e}")
-            
+
             # 稍作停顿，避免请求过快
             time.sleep(0.5)
         else:
@@ -107,4 +134,11 @@ def backfill():
     print("\n--- Backfill Completed ---")
 
 if __name__ == "__main__":
-    backfill()
+    parser = argparse.ArgumentParser(description="关键词回填")
+    parser.add_argument("--sync-only", action="store_true", help="仅同步已有关键词到关系表，不调用 LLM")
+    args = parser.parse_args()
+
+    if args.sync_only:
+        sync_existing()
+    else:
+        backfill()
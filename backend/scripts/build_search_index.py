@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+从 results/ 回填转录全文索引（cache/transcript_search.db）
+
+用法：
+    # 增量回填（跳过已索引的视频）
+    python scripts/build_search_index.py
+
+    # 全量重建
+    python scripts/build_search_index.py --rebuild
+"""
+import os
+import sys
+import time
+import argparse
+
+# 添加父目录到路径以便导入
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import transcript_index
+from db import get_db
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "results")
+LOOKUP_BATCH = 200
+
+
+def lookup_visibility(video_ids):
+    """从 videos 表批量读取可见性（旧版结果 JSON 不含 is_public），返回 {id: row}"""
+    supabase = get_db()
+    if not supabase:
+        raise RuntimeError("Supabase 未配置")
+    rows = {}
+    for i in range(0, len(video_ids), LOOKUP_BATCH):
+        res = supabase.table("videos") \
+            .select("id, user_id, is_public, hidden_from_home") \
+            .in_("id", video_ids[i:i + LOOKUP_BATCH]) \
+            .execute()
+        rows.update({r["id"]: r for r in res.data or []})
+    return rows
+
+
+def sync_hidden_channels():
+    supabase = get_db()
+    if not supabase:
+        return
+    try:
+        res = supabase.table("channel_settings").select("channel_id").eq("hidden_from_home", True).execute()
+        transcript_index.replace_hidden_channels([r["channel_id"] for r in res.data or []])
+    except Exception as e:
+        print(f"--- 同步隐藏频道失败: {e} ---")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="回填转录全文索引")
+    parser.add_argument("--rebuild", action="store_true", help="删除现有索引后全量重建")
+    parser.add_argument("--results-dir", default=RESULTS_DIR, help="结果 JSON 目录")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        for suffix in ("", "-wal", "-shm"):
+            path = transcript_index.INDEX_PATH + suffix
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"--- 已删除旧索引: {transcript_index.INDEX_PATH} ---")
+
+    start = time.time()
+    sync_hidden_channels()
+    videos, segments = transcript_index.backfill_from_results(
+        args.results_dir, skip_existing=not args.rebuild, lookup=lookup_visibility)
+    print(f"--- 回填完成: {videos} 个视频, {segments} 个片段, 耗时 {time.time() - start:.1f}s ---")
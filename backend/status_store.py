@@ -0,0 +1,294 @@
+"""
+任务状态存储（替代 results/{task_id}_status.json）
+API / scheduler / process_task / worker 共用本地 SQLite（cache/status.db，WAL 模式）：
+写入是单个事务，读者不会读到写了一半的状态；状态变化（阶段切换）另记一条历史，
+/history、/result 与调度器可以一次查询拿到所有活跃任务，不再扫描 results 目录。
+"""
+import os
+import json
+import time
+import sqlite3
+from app_logger import get_logger
+logger = get_logger(__name__)
+
+STATUS_DB_PATH = os.environ.get(
+    "STATUS_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "status.db"),
+)
+# 只有这两个状态表示任务已结束；其余（queued、processing 及 downloading / transcribing_local /
+# llm_processing 等阶段名）都是在途任务
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+def is_active(status):
+    """任务是否在途（排队或处于任一处理阶段）"""
+    return status not in TERMINAL_STATUSES
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_status (
+    task_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    eta INTEGER,
+    extra TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_task_status_status ON task_status (status, updated_at);
+CREATE TABLE IF NOT EXISTS task_status_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress INTEGER,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_task_status_history_task ON task_status_history (task_id, id);
+"""
+
+
+def _connect(path=None):
+    path = path or STATUS_DB_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _row_to_status(row):
+    task_id, status, progress, eta, extra, version, created_at, updated_at = row
+    data = json.loads(extra) if extra else {}
+    data.update({
+        "status": status,
+        "progress": progress,
+        "eta": eta,
+        "version": version,
+        "created_at": created_at,
+        "updated_at": updated_at,
+    })
+    return data
+
+
+_COLUMNS = "task_id, status, progress, eta, extra, version, created_at, updated_at"
+_INTERNAL_FIELDS = ("version", "created_at", "updated_at")
+
+
+def public_fields(status):
+    """去掉 version / 时间戳等内部字段，得到返回给前端的状态字典"""
+    return {k: v for k, v in status.items() if k not in _INTERNAL_FIELDS}
+
+
+def save_status(task_id, status, progress, eta=None, **extra):
+    """
+    写入任务状态（单事务，跨进程原子）；状态名变化时追加一条阶段切换历史。
+    extra 为附加字段（如 retry_count），整体替换上一次的附加字段。失败只记日志，不中断任务。
+    """
+    now = time.time()
+    try:
+        conn = _connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT status FROM task_status WHERE task_id = ?", (task_id,)
+            ).fetchone()
+            extra_json = json.dumps(extra, ensure_ascii=False) if extra else None
+            if row:
+                conn.execute(
+                    "UPDATE task_status SET status = ?, progress = ?, eta = ?, extra = ?, "
+                    "version = version + 1, updated_at = ? WHERE task_id = ?",
+                    (status, progress, eta, extra_json, now, task_id),
+                )
+            else:
+                conn.execute(
+                    f"INSERT INTO task_status ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, 1, ?, ?)",
+                    (task_id, status, progress, eta, extra_json, now, now),
+                )
+            # 重新入队视为新一轮，从头记录
+            if status == "queued" and row and row[0] != "queued":
+                conn.execute("DELETE FROM task_status_history WHERE task_id = ?", (task_id,))
+            if not row or row[0] != status:
+                conn.execute(
+                    "INSERT INTO task_status_history (task_id, status, progress, at) VALUES (?, ?, ?, ?)",
+                    (task_id, status, progress, now),
+                )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.info(f"[StatusStore] 写入状态失败 {task_id}: {e}")
+
+
+def get_status(task_id):
+    """单个任务的最新状态（含 version / updated_at），不存在返回 None"""
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                f"SELECT {_COLUMNS} FROM task_status WHERE task_id = ?", (task_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.info(f"[StatusStore] 读取状态失败 {task_id}: {e}")
+        return None
+    return _row_to_status(row) if row else None
+
+
+def get_statuses(task_ids):
+    """一次查询多个任务的状态，返回 {task_id: 状态}"""
+    task_ids = list(dict.fromkeys(task_ids))
+    if not task_ids:
+        return {}
+    result = {}
+    try:
+        conn = _connect()
+        try:
+            # SQLite 默认最多 999 个参数，分批查询
+            for i in range(0, len(task_ids), 500):
+                batch = task_ids[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT {_COLUMNS} FROM task_status WHERE task_id IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for row in rows:
+                    result[row[0]] = _row_to_status(row)
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.info(f"[StatusStore] 批量读取状态失败: {e}")
+    return result
+
+
+def list_statuses(statuses=None, since=None, exclude=None):
+    """
+    按状态筛选任务，按最近更新时间升序（最早排队的在前），返回 [(task_id, 状态)]。
+    statuses 为 None 时不限状态；exclude 为要排除的状态；since 为 Unix 时间戳，只返回此后更新过的任务。
+    """
+    clauses, params = [], []
+    if statuses:
+        clauses.append(f"status IN ({','.join('?' * len(statuses))})")
+        params.extend(statuses)
+    if exclude:
+        clauses.append(f"status NOT IN ({','.join('?' * len(exclude))})")
+        params.extend(exclude)
+    if since is not None:
+        clauses.append("updated_at >= ?")
+        params.append(since)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    try:
+        conn = _connect()
+        try:
+            rows = conn.execute(
+                f"SELECT {_COLUMNS} FROM task_status {where} ORDER BY updated_at ASC", params
+            ).fetchall()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.info(f"[StatusStore] 查询状态列表失败: {e}")
+        return []
+    return [(row[0], _row_to_status(row)) for row in rows]
+
+
+def list_in_flight():
+    """所有未结束（非 completed / failed）的任务，返回 [(task_id, 状态)]"""
+    return list_statuses(exclude=TERMINAL_STATUSES)
+
+
+def list_active(recent_seconds=3600):
+    """未结束的任务（含各处理阶段），加上最近 recent_seconds 内更新过的已结束任务，返回 [(task_id, 状态)]"""
+    try:
+        conn = _connect()
+        try:
+            rows = conn.execute(
+                f"SELECT {_COLUMNS} FROM task_status "
+                f"WHERE status NOT IN ({','.join('?' * len(TERMINAL_STATUSES))}) OR updated_at >= ? "
+                "ORDER BY updated_at ASC",
+                (*TERMINAL_STATUSES, time.time() - recent_seconds),
+            ).fetchall()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.info(f"[StatusStore] 查询活跃任务失败: {e}")
+        return []
+    return [(row[0], _row_to_status(row)) for row in rows]
+
+
+def get_history(task_id):
+    """任务本轮处理的阶段切换记录 [{"status", "progress", "at"}]，按时间先后"""
+    try:
+        conn = _connect()
+        try:
+            rows = conn.execute(
+                "SELECT status, progress, at FROM task_status_history WHERE task_id = ? ORDER BY id",
+                (task_id,),
+            ).fetchall()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.info(f"[StatusStore] 读取状态历史失败 {task_id}: {e}")
+        return []
+    return [{"status": s, "progress": p, "at": at} for s, p, at in rows]
+
+
+def delete_status(task_ids=None):
+    """删除指定任务（None 为全部）的状态与历史，返回删除的任务数"""
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        if task_ids is None:
+            count = conn.execute("DELETE FROM task_status").rowcount
+            conn.execute("DELETE FROM task_status_history")
+        else:
+            task_ids = list(task_ids)
+            count = 0
+            for tid in task_ids:
+                count += conn.execute("DELETE FROM task_status WHERE task_id = ?", (tid,)).rowcount
+                conn.execute("DELETE FROM task_status_history WHERE task_id = ?", (tid,))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return count
+
+
+def import_legacy_files(results_dir):
+    """
+    一次性导入旧版 results/{task_id}_status.json：已在库中的任务跳过，导入后删除文件。
+    以文件 mtime 作为更新时间，保持本地回退调度的先后顺序。返回导入数量。
+    """
+    if not os.path.isdir(results_dir):
+        return 0
+    imported = 0
+    for name in os.listdir(results_dir):
+        if not name.endswith("_status.json"):
+            continue
+        path = os.path.join(results_dir, name)
+        task_id = name[:-len("_status.json")]
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            mtime = os.path.getmtime(path)
+        except (OSError, ValueError) as e:
+            logger.info(f"[StatusStore] 跳过无法读取的旧状态文件 {name}: {e}")
+            continue
+        conn = _connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            exists = conn.execute("SELECT 1 FROM task_status WHERE task_id = ?", (task_id,)).fetchone()
+            if not exists:
+                status = data.pop("status", None) or "queued"
+                progress = data.pop("progress", 0) or 0
+                eta = data.pop("eta", None)
+                conn.execute(
+                    f"INSERT INTO task_status ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, 1, ?, ?)",
+                    (task_id, status, progress, eta,
+                     json.dumps(data, ensure_ascii=False) if data else None, mtime, mtime),
+                )
+                imported += 1
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        os.remove(path)
+    if imported:
+        logger.info(f"[StatusStore] 已导入 {imported} 个旧版状态文件")
+    return imported
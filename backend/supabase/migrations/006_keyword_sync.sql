@@ -0,0 +1,43 @@
+-- 006_keyword_sync.sql
+-- 存放位置: backend/supabase/migrations/006_keyword_sync.sql
+-- 描述: 关键词批量同步 RPC，一次调用完成关键词 upsert、关联建立与计数原子自增
+
+-- 1. 批量同步函数
+-- 仅对“新建立关联”的关键词 count + 1，同一视频重复处理不会重复计数，
+-- 计数自增在数据库内完成，避免客户端 select → update 的读改写竞态。
+CREATE OR REPLACE FUNCTION public.sync_video_keywords(p_video_id TEXT, p_keywords TEXT[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    linked_count INTEGER;
+BEGIN
+    -- 补齐不存在的关键词（初始 count 为 0，由下方统一累加）
+    INSERT INTO public.keywords (name, count)
+    SELECT DISTINCT btrim(k), 0
+    FROM unnest(p_keywords) AS k
+    WHERE k IS NOT NULL AND btrim(k) <> ''
+    ON CONFLICT (name) DO NOTHING;
+
+    -- 批量建立关联，并对新关联的关键词原子自增
+    WITH new_links AS (
+        INSERT INTO public.video_keywords (video_id, keyword_id)
+        SELECT p_video_id, kw.id
+        FROM public.keywords kw
+        WHERE kw.name IN (SELECT btrim(k) FROM unnest(p_keywords) AS k)
+        ON CONFLICT (video_id, keyword_id) DO NOTHING
+        RETURNING keyword_id
+    )
+    UPDATE public.keywords kw
+    SET count = COALESCE(kw.count, 0) + 1
+    FROM new_links nl
+    WHERE kw.id = nl.keyword_id;
+
+    GET DIAGNOSTICS linked_count = ROW_COUNT;
+    RETURN linked_count;
+END;
+$$;
+
+-- 2. 权限：仅后端 service_role 调用
+REVOKE ALL ON FUNCTION public.sync_video_keywords(TEXT, TEXT[]) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.sync_video_keywords(TEXT, TEXT[]) TO service_role;
@@ -0,0 +1,25 @@
+-- 007_view_counter.sql
+-- 存放位置: backend/supabase/migrations/007_view_counter.sql
+-- 描述: 浏览量批量原子自增 RPC，配合后端 view_counter.py 的写缓冲定期刷新
+
+-- 1. 批量自增函数：p_ids 与 p_counts 按下标一一对应
+CREATE OR REPLACE FUNCTION public.increment_view_counts(p_ids TEXT[], p_counts INTEGER[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    updated_count INTEGER;
+BEGIN
+    UPDATE public.videos v
+    SET view_count = COALESCE(v.view_count, 0) + d.n
+    FROM unnest(p_ids, p_counts) AS d(id, n)
+    WHERE v.id = d.id;
+
+    GET DIAGNOSTICS updated_count = ROW_COUNT;
+    RETURN updated_count;
+END;
+$$;
+
+-- 2. 权限：仅后端 service_role 调用
+REVOKE ALL ON FUNCTION public.increment_view_counts(TEXT[], INTEGER[]) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.increment_view_counts(TEXT[], INTEGER[]) TO service_role;
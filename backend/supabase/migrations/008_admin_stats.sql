@@ -0,0 +1,168 @@
+-- 008_admin_stats.sql
+-- 存放位置: backend/supabase/migrations/008_admin_stats.sql
+-- 描述: 管理驾驶舱预聚合统计表，由 videos 触发器增量维护，/admin/stats 不再全表扫描
+
+-- 1. 全局汇总表（单行，id 固定为 1）
+CREATE TABLE IF NOT EXISTS public.admin_stats_totals (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    video_count BIGINT NOT NULL DEFAULT 0,
+    completed_count BIGINT NOT NULL DEFAULT 0,
+    total_views BIGINT NOT NULL DEFAULT 0,
+    total_interactions BIGINT NOT NULL DEFAULT 0,
+    total_llm_cost NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- 2. 按天的 LLM 用量表（仅统计 completed 视频，按视频创建日期归档）
+CREATE TABLE IF NOT EXISTS public.admin_llm_usage_daily (
+    day DATE PRIMARY KEY,
+    video_count INTEGER NOT NULL DEFAULT 0,
+    estimated_count INTEGER NOT NULL DEFAULT 0,  -- 其中使用估算值的视频数
+    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    completion_tokens BIGINT NOT NULL DEFAULT 0,
+    llm_cost NUMERIC NOT NULL DEFAULT 0
+);
+
+-- 3. 单个视频的 LLM 用量口径：有真实 llm_cost 用真实值，否则 completed 视频用写入时的估算值
+CREATE OR REPLACE FUNCTION public.video_llm_usage(p_status TEXT, p_usage JSONB,
+    OUT prompt_tokens BIGINT, OUT completion_tokens BIGINT, OUT llm_cost NUMERIC, OUT is_estimated BOOLEAN)
+LANGUAGE sql IMMUTABLE
+AS $$
+    SELECT
+        CASE WHEN real_cost > 0 THEN COALESCE((p_usage->'llm_tokens'->>'prompt_tokens')::BIGINT, 0)
+             WHEN p_status = 'completed' THEN COALESCE((p_usage->'estimated_llm'->>'prompt_tokens')::BIGINT, 0)
+             ELSE 0 END,
+        CASE WHEN real_cost > 0 THEN COALESCE((p_usage->'llm_tokens'->>'completion_tokens')::BIGINT, 0)
+             WHEN p_status = 'completed' THEN COALESCE((p_usage->'estimated_llm'->>'completion_tokens')::BIGINT, 0)
+             ELSE 0 END,
+        CASE WHEN real_cost > 0 THEN real_cost
+             WHEN p_status = 'completed' THEN COALESCE((p_usage->'estimated_llm'->>'cost')::NUMERIC, 0)
+             ELSE 0 END,
+        real_cost <= 0 AND p_status = 'completed'
+    FROM (SELECT COALESCE((p_usage->>'llm_cost')::NUMERIC, 0) AS real_cost) r;
+$$;
+
+-- 4. 将一行视频的贡献以 p_sign (+1/-1) 计入汇总表
+CREATE OR REPLACE FUNCTION public.admin_stats_apply(p_row public.videos, p_sign INTEGER)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    u RECORD;
+BEGIN
+    SELECT * INTO u FROM public.video_llm_usage(p_row.status, p_row.usage);
+
+    UPDATE public.admin_stats_totals SET
+        video_count = video_count + p_sign,
+        completed_count = completed_count + CASE WHEN p_row.status = 'completed' THEN p_sign ELSE 0 END,
+        total_views = total_views + p_sign * COALESCE(p_row.view_count, 0),
+        total_interactions = total_interactions + p_sign * COALESCE(p_row.interaction_count, 0),
+        total_llm_cost = total_llm_cost + p_sign * u.llm_cost,
+        updated_at = NOW()
+    WHERE id = 1;
+
+    IF p_row.status = 'completed' THEN
+        INSERT INTO public.admin_llm_usage_daily AS d
+            (day, video_count, estimated_count, prompt_tokens, completion_tokens, llm_cost)
+        VALUES (
+            (p_row.created_at AT TIME ZONE 'utc')::DATE,
+            p_sign,
+            CASE WHEN u.is_estimated THEN p_sign ELSE 0 END,
+            p_sign * u.prompt_tokens,
+            p_sign * u.completion_tokens,
+            p_sign * u.llm_cost
+        )
+        ON CONFLICT (day) DO UPDATE SET
+            video_count = d.video_count + EXCLUDED.video_count,
+            estimated_count = d.estimated_count + EXCLUDED.estimated_count,
+            prompt_tokens = d.prompt_tokens + EXCLUDED.prompt_tokens,
+            completion_tokens = d.completion_tokens + EXCLUDED.completion_tokens,
+            llm_cost = d.llm_cost + EXCLUDED.llm_cost;
+    END IF;
+END;
+$$;
+
+-- 5. 存量数据：为缺少估算值的 completed 视频补写一次 usage.estimated_llm
+-- 口径与 admin_stats.estimate_llm_usage 一致：字数 × 2.5 ≈ tokens，按 7:3 拆分，$0.15/1M
+UPDATE public.videos v
+SET usage = COALESCE(v.usage, '{}'::JSONB) || jsonb_build_object('estimated_llm', jsonb_build_object(
+    'prompt_tokens', (e.tokens * 0.7)::BIGINT,
+    'completion_tokens', (e.tokens * 0.3)::BIGINT,
+    'cost', round(e.tokens / 1000000.0 * 0.15, 6)
+))
+FROM (
+    SELECT id, (COALESCE(NULLIF(para_chars, 0), raw_chars, 0) * 2.5)::BIGINT AS tokens
+    FROM (
+        SELECT
+            x.id,
+            (SELECT SUM(length(s->>'text'))
+             FROM jsonb_array_elements(COALESCE(x.report_data->'paragraphs', '[]'::JSONB)) p,
+                  jsonb_array_elements(COALESCE(p->'sentences', '[]'::JSONB)) s) AS para_chars,
+            (SELECT SUM(length(r->>'text'))
+             FROM jsonb_array_elements(COALESCE(x.report_data->'raw_subtitles', '[]'::JSONB)) r) AS raw_chars
+        FROM public.videos x
+        WHERE x.status = 'completed' AND NOT COALESCE(x.usage ? 'estimated_llm', FALSE)
+    ) c
+) e
+WHERE v.id = e.id;
+
+-- 6. 触发器：videos 增删改时增量维护汇总
+CREATE OR REPLACE FUNCTION public.videos_admin_stats_trigger()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM public.admin_stats_apply(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM public.admin_stats_apply(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_videos_admin_stats ON public.videos;
+CREATE TRIGGER trg_videos_admin_stats
+    AFTER INSERT OR DELETE OR UPDATE OF status, usage, view_count, interaction_count, created_at
+    ON public.videos
+    FOR EACH ROW EXECUTE FUNCTION public.videos_admin_stats_trigger();
+
+-- 7. 初始化汇总数据（重复执行本迁移会整体重算）
+INSERT INTO public.admin_stats_totals (id, video_count, completed_count, total_views, total_interactions, total_llm_cost)
+SELECT
+    1,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE v.status = 'completed'),
+    COALESCE(SUM(v.view_count), 0),
+    COALESCE(SUM(v.interaction_count), 0),
+    COALESCE(SUM(u.llm_cost), 0)
+FROM public.videos v, LATERAL public.video_llm_usage(v.status, v.usage) u
+ON CONFLICT (id) DO UPDATE SET
+    video_count = EXCLUDED.video_count,
+    completed_count = EXCLUDED.completed_count,
+    total_views = EXCLUDED.total_views,
+    total_interactions = EXCLUDED.total_interactions,
+    total_llm_cost = EXCLUDED.total_llm_cost,
+    updated_at = NOW();
+
+DELETE FROM public.admin_llm_usage_daily;
+INSERT INTO public.admin_llm_usage_daily (day, video_count, estimated_count, prompt_tokens, completion_tokens, llm_cost)
+SELECT
+    (v.created_at AT TIME ZONE 'utc')::DATE,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE u.is_estimated),
+    SUM(u.prompt_tokens),
+    SUM(u.completion_tokens),
+    SUM(u.llm_cost)
+FROM public.videos v, LATERAL public.video_llm_usage(v.status, v.usage) u
+WHERE v.status = 'completed'
+GROUP BY 1;
+
+-- 8. 索引：驾驶舱“最近 20 条”与“Top 5”走索引而非排序全表
+CREATE INDEX IF NOT EXISTS idx_videos_created_at ON public.videos(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_videos_interaction_count ON public.videos(interaction_count DESC);
+
+-- 9. 启用 RLS（仅 service_role 访问，不对前端开放）
+ALTER TABLE public.admin_stats_totals ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.admin_llm_usage_daily ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,130 @@
+-- 009_explore_search.sql
+-- 存放位置: backend/supabase/migrations/009_explore_search.sql
+-- 描述: /explore 全文检索索引（CJK 二元切分）与键集分页 RPC，隐藏/上传过滤下推到数据库
+
+-- 1. CJK 二元切分：中日韩连续字符切成重叠二元组（单字保留），其余按词切分
+-- 与后端 text_search.tokenize() 的 CJK 范围及字母、数字、标点切分规则相同；Unicode 符号（×、emoji 等）
+-- 是否算 [:punct:] 随数据库 locale 而定，可能与 Python 不同（共用用例见 backend/tests/data/tokenize_cases.json，
+-- 后端测试只对照本正则的 Python 模拟，改动本函数后需在数据库上手动核对这些用例）
+CREATE OR REPLACE FUNCTION public.cjk_bigram_text(p_text TEXT)
+RETURNS TEXT
+LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE
+AS $$
+DECLARE
+    out_text TEXT := '';
+    run TEXT;
+    m TEXT[];
+    i INTEGER;
+BEGIN
+    IF p_text IS NULL THEN
+        RETURN '';
+    END IF;
+    FOR m IN
+        SELECT regexp_matches(lower(p_text),
+            '[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]+|[^[:space:][:punct:]\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]+', 'g')
+    LOOP
+        run := m[1];
+        IF run ~ '^[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]' AND length(run) > 1 THEN
+            FOR i IN 1 .. length(run) - 1 LOOP
+                out_text := out_text || ' ' || substr(run, i, 2);
+            END LOOP;
+        ELSE
+            out_text := out_text || ' ' || run;
+        END IF;
+    END LOOP;
+    RETURN out_text;
+END;
+$$;
+
+-- 2. 检索向量：标题 + 频道 + 摘要
+ALTER TABLE public.videos ADD COLUMN IF NOT EXISTS search_tsv TSVECTOR
+    GENERATED ALWAYS AS (
+        to_tsvector('simple', public.cjk_bigram_text(
+            COALESCE(title, '') || ' ' ||
+            COALESCE(report_data->>'channel', '') || ' ' ||
+            COALESCE(report_data->>'summary', '')
+        ))
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_videos_search_tsv ON public.videos USING GIN (search_tsv);
+
+-- 3. 首页列表的部分索引：与 explore_videos 的过滤条件一致，键集分页直接走索引
+CREATE INDEX IF NOT EXISTS idx_videos_explore ON public.videos (created_at DESC, id DESC)
+    WHERE status = 'completed' AND is_public = TRUE AND hidden_from_home IS NOT TRUE;
+
+-- 4. 首页检索 RPC
+-- p_cursor_created_at / p_cursor_id 非空时走键集分页，否则按 p_offset 兼容页码分页
+CREATE OR REPLACE FUNCTION public.explore_videos(
+    p_query TEXT DEFAULT NULL,
+    p_cursor_created_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_cursor_id TEXT DEFAULT NULL,
+    p_offset INTEGER DEFAULT 0,
+    p_limit INTEGER DEFAULT 24
+)
+RETURNS TABLE (
+    id TEXT,
+    title TEXT,
+    thumbnail TEXT,
+    created_at TIMESTAMP WITH TIME ZONE,
+    view_count INTEGER,
+    channel TEXT,
+    channel_id TEXT,
+    channel_avatar TEXT,
+    summary TEXT,
+    keywords JSONB
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        v.id, v.title, v.thumbnail, v.created_at, v.view_count,
+        v.report_data->>'channel',
+        v.report_data->>'channel_id',
+        v.report_data->>'channel_avatar',
+        v.report_data->>'summary',
+        v.report_data->'keywords'
+    FROM public.videos v
+    WHERE v.status = 'completed'
+      AND v.is_public = TRUE
+      AND v.hidden_from_home IS NOT TRUE
+      -- 仅 YouTube 视频（11 位 ID），排除上传文件
+      AND length(v.id) = 11 AND v.id NOT LIKE 'up\_%'
+      AND NOT EXISTS (
+          SELECT 1 FROM public.channel_settings cs
+          WHERE cs.hidden_from_home = TRUE AND cs.channel_id = v.report_data->>'channel_id'
+      )
+      AND (
+          COALESCE(btrim(p_query), '') = ''
+          OR v.search_tsv @@ plainto_tsquery('simple', public.cjk_bigram_text(p_query))
+          -- 单字查询无法命中二元组，退回子串匹配
+          OR (char_length(btrim(p_query)) = 1 AND v.title ILIKE '%' || btrim(p_query) || '%')
+      )
+      AND (
+          p_cursor_created_at IS NULL
+          OR (v.created_at, v.id) < (p_cursor_created_at, p_cursor_id)
+      )
+    ORDER BY v.created_at DESC, v.id DESC
+    OFFSET CASE WHEN p_cursor_created_at IS NULL THEN GREATEST(p_offset, 0) ELSE 0 END
+    LIMIT LEAST(GREATEST(p_limit, 1), 100);
+$$;
+
+-- 5. 页码模式下的总数（与 explore_videos 过滤条件一致）
+CREATE OR REPLACE FUNCTION public.explore_videos_count(p_query TEXT DEFAULT NULL)
+RETURNS BIGINT
+LANGUAGE sql STABLE
+AS $$
+    SELECT COUNT(*)
+    FROM public.videos v
+    WHERE v.status = 'completed'
+      AND v.is_public = TRUE
+      AND v.hidden_from_home IS NOT TRUE
+      AND length(v.id) = 11 AND v.id NOT LIKE 'up\_%'
+      AND NOT EXISTS (
+          SELECT 1 FROM public.channel_settings cs
+          WHERE cs.hidden_from_home = TRUE AND cs.channel_id = v.report_data->>'channel_id'
+      )
+      AND (
+          COALESCE(btrim(p_query), '') = ''
+          OR v.search_tsv @@ plainto_tsquery('simple', public.cjk_bigram_text(p_query))
+          OR (char_length(btrim(p_query)) = 1 AND v.title ILIKE '%' || btrim(p_query) || '%')
+      );
+$$;
@@ -0,0 +1,16 @@
+-- 010_channel_tracking_state.sql
+-- 存放位置: backend/supabase/migrations/010_channel_tracking_state.sql
+-- 描述: 频道追踪增量状态（高水位 + 最新列表指纹 + 自适应检查间隔），不活跃频道退避检查
+
+-- 1. 每个频道的追踪状态
+ALTER TABLE public.channel_settings ADD COLUMN IF NOT EXISTS last_seen_video_id TEXT;       -- 最近一次列表的首个视频（高水位）
+ALTER TABLE public.channel_settings ADD COLUMN IF NOT EXISTS last_fingerprint TEXT;         -- 最新视频列表的指纹，未变化即无新视频
+ALTER TABLE public.channel_settings ADD COLUMN IF NOT EXISTS last_checked_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE public.channel_settings ADD COLUMN IF NOT EXISTS last_changed_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE public.channel_settings ADD COLUMN IF NOT EXISTS check_interval_minutes INTEGER DEFAULT 60;
+ALTER TABLE public.channel_settings ADD COLUMN IF NOT EXISTS next_check_at TIMESTAMP WITH TIME ZONE;  -- NULL 表示立即检查
+
+-- 2. 索引：按到期时间取待检查频道
+CREATE INDEX IF NOT EXISTS idx_channel_settings_next_check
+    ON public.channel_settings(next_check_at)
+    WHERE track_new_videos = TRUE;
@@ -4,6 +4,7 @@
 import sys, os, json
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from db import get_db
+import status_store
 
 TASK_IDS = [
     "P78fylSwdpw",
@@ -48,13 +49,11 @@ def main():
             "report_data": rd
         }).eq("id", task_id).execute()
 
-        # 3. 删除本地 _error.json（清理旧错误），更新 _status.json 为 queued
+        # 3. 删除本地 _error.json（清理旧错误），本地状态更新为 queued
         error_file = os.path.join(RESULTS_DIR, f"{task_id}_error.json")
-        status_file = os.path.join(RESULTS_DIR, f"{task_id}_status.json")
         if os.path.exists(error_file):
             os.remove(error_file)
-        with open(status_file, "w") as f:
-            json.dump({"status": "queued", "progress": 0, "eta": None}, f)
+        status_store.save_status(task_id, "queued", 0)
 
         print(f"   ✅ 已重新入队 → scheduler 将自动处理")
 
@@ -0,0 +1,42 @@
+import sys
+import os
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+from admin_stats import estimate_llm_usage, build_usage_estimate, video_llm_usage, aggregate_totals
+
+
+def test_estimate_falls_back_to_raw_subtitles():
+    paragraphs = [{"sentences": [{"text": "一二三四"}]}]
+    assert estimate_llm_usage(paragraphs) == (7, 3, 10 / 1000000.0 * 0.15)
+    assert estimate_llm_usage([], [{"text": "一二三四"}])[:2] == (7, 3)
+    assert estimate_llm_usage([], []) == (0, 0, 0.0)
+
+
+def test_video_llm_usage_prefers_real_cost():
+    usage = {
+        "llm_cost": 0.02,
+        "llm_tokens": {"prompt_tokens": 100, "completion_tokens": 50},
+        "estimated_llm": {"prompt_tokens": 1, "completion_tokens": 1, "cost": 0.5},
+    }
+    assert video_llm_usage("completed", usage) == (100, 50, 0.02, False)
+
+    usage["llm_cost"] = 0
+    assert video_llm_usage("completed", usage) == (1, 1, 0.5, True)
+    assert video_llm_usage("queued", usage) == (0, 0, 0.0, False)
+
+
+def test_aggregate_totals():
+    rows = [
+        {"status": "completed", "view_count": 3, "interaction_count": 1,
+         "usage": {"estimated_llm": build_usage_estimate([{"sentences": [{"text": "abcd"}]}])}},
+        {"status": "queued", "view_count": None, "interaction_count": 2, "usage": None},
+    ]
+    totals = aggregate_totals(rows)
+    assert totals["video_count"] == 2
+    assert totals["completed_count"] == 1
+    assert totals["total_views"] == 3
+    assert totals["total_interactions"] == 3
+    assert totals["total_llm_cost"] == round(10 / 1000000.0 * 0.15, 6)
@@ -0,0 +1,56 @@
+import sys
+import os
+import json
+import urllib.request
+import urllib.error
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+sys.path.append(os.path.join(backend_dir, "bench"))
+
+from stub_llm import StubLLMServer
+from hallucination_detector import detect_hallucination_patterns
+
+
+def _post(server, content):
+    body = json.dumps({"model": "stub", "messages": [{"role": "user", "content": content}]}).encode("utf-8")
+    req = urllib.request.Request(f"{server.base_url}/chat/completions", data=body,
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=5) as resp:
+        return json.loads(resp.read())
+
+
+def test_correction_request_echoes_sentences():
+    with StubLLMServer(latency=0, tokens_per_second=1e6) as server:
+        data = _post(server, "上下文\n原始文本：\n[0.4] 第一句\n[3.5] 第二句")
+    content = json.loads(data["choices"][0]["message"]["content"])
+    sentences = content["paragraphs"][0]["sentences"]
+    assert [s["start"] for s in sentences] == [0.4, 3.5]
+    assert sentences[0]["text"] == "第一句。"
+    assert data["usage"]["total_tokens"] == data["usage"]["prompt_tokens"] + data["usage"]["completion_tokens"]
+    assert server.stats["requests"] == 1
+
+
+def test_summary_request_uses_transcript_timestamps():
+    with StubLLMServer(latency=0, tokens_per_second=1e6) as server:
+        data = _post(server, "待分析转录文本:\n[00:01] 甲\n[00:30] 乙\n[01:05] 丙")
+    content = json.loads(data["choices"][0]["message"]["content"])
+    assert content["summary"].splitlines()[-1].endswith("[01:05]")
+    assert content["keywords"]
+
+
+def test_failure_and_hallucination_injection():
+    with StubLLMServer(latency=0, tokens_per_second=1e6, failure_rate=1.0) as server:
+        try:
+            _post(server, "[0.0] 句子")
+            assert False, "expected HTTP 500"
+        except urllib.error.HTTPError as e:
+            assert e.code == 500
+        assert server.stats["failures"] == 1
+
+    with StubLLMServer(latency=0, tokens_per_second=1e6, hallucination_rate=1.0) as server:
+        data = _post(server, "[0.0] 句子")
+    content = json.loads(data["choices"][0]["message"]["content"])
+    text = content["paragraphs"][-1]["sentences"][-1]["text"]
+    assert detect_hallucination_patterns(text)
@@ -0,0 +1,72 @@
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import channel_schedule
+
+NOW = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def test_new_channel_is_due_and_changed():
+    state = {"channel_id": "@a"}
+    assert channel_schedule.is_due(state, NOW)
+    assert channel_schedule.is_changed(state, ["v1", "v2"])
+
+
+def test_unchanged_listing_backs_off():
+    ids = ["v1", "v2"]
+    state = {"channel_id": "@a", "last_fingerprint": channel_schedule.fingerprint(ids), "check_interval_minutes": 60}
+    update = channel_schedule.next_state(state, ids, NOW)
+    assert update["check_interval_minutes"] == 120
+    assert update["next_check_at"] == (NOW + timedelta(minutes=120)).isoformat()
+    assert update["last_fingerprint"] == state["last_fingerprint"]
+    assert not channel_schedule.is_due(update, NOW + timedelta(minutes=90))
+    assert channel_schedule.is_due(update, NOW + timedelta(minutes=120))
+
+
+def test_backoff_is_capped():
+    state = {"channel_id": "@a", "last_fingerprint": channel_schedule.fingerprint(["v1"]),
+             "check_interval_minutes": channel_schedule.MAX_INTERVAL_MINUTES}
+    update = channel_schedule.next_state(state, ["v1"], NOW)
+    assert update["check_interval_minutes"] == channel_schedule.MAX_INTERVAL_MINUTES
+
+
+def test_failed_listing_keeps_interval_and_fingerprint():
+    state = {"channel_id": "@a", "last_fingerprint": "old", "check_interval_minutes": 240,
+             "last_seen_video_id": "v1"}
+    update = channel_schedule.next_state(state, [], NOW, failed=True)
+    assert update["check_interval_minutes"] == 240
+    assert update["next_check_at"] == (NOW + timedelta(minutes=240)).isoformat()
+    assert update["last_fingerprint"] == "old"
+    assert update["last_seen_video_id"] == "v1"
+
+
+def test_changed_listing_speeds_up_and_records_high_water_mark():
+    state = {"channel_id": "@a", "last_fingerprint": "old", "check_interval_minutes": 480}
+    update = channel_schedule.next_state(state, ["v9", "v1"], NOW)
+    assert update["check_interval_minutes"] == 240
+    assert update["last_seen_video_id"] == "v9"
+    assert update["last_fingerprint"] == channel_schedule.fingerprint(["v9", "v1"])
+    assert update["last_changed_at"] == NOW.isoformat()
+
+
+def test_unsettled_change_is_retried():
+    state = {"channel_id": "@a", "last_fingerprint": "old", "check_interval_minutes": 60}
+    update = channel_schedule.next_state(state, ["v9"], NOW, settled=False)
+    assert update["last_fingerprint"] is None
+    assert channel_schedule.is_changed(update, ["v9"])
+
+
+def test_update_rows_share_keys():
+    a = channel_schedule.next_state({"channel_id": "@a"}, ["v1"], NOW)
+    b = channel_schedule.next_state({"channel_id": "@b"}, [], NOW)
+    assert set(a) == set(b)
+
+
+def test_parses_postgrest_timestamps():
+    assert not channel_schedule.is_due({"next_check_at": "2026-01-01T13:00:00Z"}, NOW)
+    assert channel_schedule.is_due({"next_check_at": "2026-01-01T11:00:00.123456+00:00"}, NOW)
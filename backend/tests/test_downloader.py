@@ -0,0 +1,124 @@
+import sys
+import os
+import types
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import downloader
+
+
+class FakeYDL:
+    """记录解析与下载次数的 YoutubeDL 替身"""
+    extract_calls = 0
+    download_calls = 0
+    fail_first_with = None
+
+    def __init__(self, opts):
+        self.opts = dict(opts)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download=True, process=True):
+        assert download is False
+        FakeYDL.extract_calls += 1
+        return {"id": "abcdefghijk", "title": "t", "formats": [{"format_id": "140", "ext": "m4a"}]}
+
+    def sanitize_info(self, info):
+        return info
+
+    def process_ie_result(self, info, download=True):
+        assert download is False
+        info.update(info["formats"][0])
+        info["requested_subtitles"] = {"zh": {}} if self.opts.get("writesubtitles") else None
+        return info
+
+    def process_info(self, info):
+        FakeYDL.download_calls += 1
+        if FakeYDL.fail_first_with and FakeYDL.download_calls == 1:
+            raise Exception(FakeYDL.fail_first_with)
+
+
+def _install_fake(monkeypatch, fail_first_with=None):
+    FakeYDL.extract_calls = 0
+    FakeYDL.download_calls = 0
+    FakeYDL.fail_first_with = fail_first_with
+    monkeypatch.setitem(sys.modules, "yt_dlp", types.SimpleNamespace(YoutubeDL=FakeYDL))
+
+
+def test_single_resolution_per_download(monkeypatch, tmp_path):
+    _install_fake(monkeypatch)
+    filename, title, _ = downloader.download_audio("https://youtu.be/abcdefghijk", output_path=str(tmp_path))
+    assert filename.endswith("abcdefghijk.m4a")
+    assert title == "t"
+    assert FakeYDL.extract_calls == 1
+    assert FakeYDL.download_calls == 1
+
+
+def test_prefetched_info_skips_resolution(monkeypatch, tmp_path):
+    _install_fake(monkeypatch)
+    info = {"id": "abcdefghijk", "title": "cached", "formats": [{"format_id": "251", "ext": "webm"}]}
+    filename, title, _ = downloader.download_audio("https://youtu.be/abcdefghijk", output_path=str(tmp_path), info=info)
+    assert filename.endswith("abcdefghijk.webm")
+    assert FakeYDL.extract_calls == 0
+    # 传入的信息不应被原地修改（可能来自共享缓存）
+    assert "format_id" not in info
+
+
+def test_subtitle_retry_reuses_resolution(monkeypatch, tmp_path):
+    _install_fake(monkeypatch, fail_first_with="HTTP Error 429: Too Many Requests")
+    downloader.download_audio("https://youtu.be/abcdefghijk", output_path=str(tmp_path))
+    assert FakeYDL.extract_calls == 1
+    assert FakeYDL.download_calls == 2
+
+
+def test_format_retry_re_resolves_without_cookies(monkeypatch, tmp_path):
+    _install_fake(monkeypatch, fail_first_with="Requested format is not available")
+    downloader.download_audio("https://youtu.be/abcdefghijk", output_path=str(tmp_path))
+    assert FakeYDL.extract_calls == 2
+    assert FakeYDL.download_calls == 2
+
+
+def test_extraction_command_stream_copies_playable_audio(tmp_path):
+    base = str(tmp_path / "up_x")
+    cmd, outputs = downloader.extraction_command(base + ".mp4", base, {"audio": "aac", "video": "h264"})
+    assert cmd[cmd.index("-c:a") + 1] == "copy"
+    assert [final for _, final in outputs] == [base + ".m4a", base + ".jpg"]
+    # 音频与缩略图在同一次调用中输出
+    assert cmd.count("-i") == 1 and cmd.count("-map") == 2
+
+    cmd, outputs = downloader.extraction_command(base + ".mkv", base, {"audio": "pcm_s16le"}, thumbnail=True)
+    assert cmd[cmd.index("-c:a") + 1] == "libopus"
+    assert [final for _, final in outputs] == [base + ".opus"]
+
+
+def test_extract_media_falls_back_to_transcode(tmp_path, monkeypatch):
+    video = tmp_path / "up_y.webm"
+    video.write_bytes(b"video")
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        if cmd[cmd.index("-c:a") + 1] == "copy":
+            return types.SimpleNamespace(returncode=1, stderr="copy failed")
+        for arg in cmd:
+            if ".tmp." in arg:
+                with open(arg, "wb") as f:
+                    f.write(b"out")
+        return types.SimpleNamespace(returncode=0, stderr="")
+
+    monkeypatch.setattr(downloader, "probe_streams", lambda path: {"audio": "opus", "video": "vp9"})
+    monkeypatch.setattr("subprocess.run", fake_run)
+    audio, thumb = downloader.extract_media(str(video))
+    assert audio == str(tmp_path / "up_y.opus") and thumb == str(tmp_path / "up_y.jpg")
+    assert len(calls) == 2
+    assert not [n for n in os.listdir(tmp_path) if ".tmp." in n]
+
+    # 已提取过的产物直接复用，不再调用 ffmpeg
+    assert downloader.extract_media(str(video)) == (audio, thumb)
+    assert len(calls) == 2
@@ -0,0 +1,71 @@
+import sys
+import os
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import eta_model
+
+
+def test_fit_recovers_linear_relation():
+    samples = [(x, 5 + 0.2 * x) for x in (60, 300, 600, 1800, 3600)]
+    a, b = eta_model.fit(samples)
+    assert abs(a - 5) < 1e-6
+    assert abs(b - 0.2) < 1e-6
+
+
+def test_fit_constant_audio_length_uses_mean():
+    assert eta_model.fit([(600, 10), (600, 20)]) == (15.0, 0.0)
+
+
+def test_defaults_without_history(tmp_path):
+    model = eta_model.EtaModel(path=str(tmp_path / "none.db"), host="h1")
+    a, b = eta_model.DEFAULT_COEFFICIENTS[("transcribe", "local")]
+    assert model.stage_seconds("transcribe", 1000, "local") == a + b * 1000
+
+
+def test_history_overrides_defaults_and_prefers_host(tmp_path):
+    path = str(tmp_path / "t.db")
+    for x in (60, 120, 300, 600, 900):
+        eta_model.record("transcribe", 0.5 * x, audio_seconds=x, mode="local", host="slow", path=path)
+        eta_model.record("transcribe", 0.1 * x, audio_seconds=x, mode="local", host="fast", path=path)
+    # 云端模式样本不足，仍用默认系数
+    eta_model.record("transcribe", 1.0, audio_seconds=60, mode="cloud", host="fast", path=path)
+
+    slow = eta_model.EtaModel(path=path, host="slow")
+    fast = eta_model.EtaModel(path=path, host="fast")
+    assert abs(slow.stage_seconds("transcribe", 1000, "local") - 500) < 1e-6
+    assert abs(fast.stage_seconds("transcribe", 1000, "local") - 100) < 1e-6
+    a, b = eta_model.DEFAULT_COEFFICIENTS[("transcribe", "cloud")]
+    assert fast.stage_seconds("transcribe", 1000, "cloud") == a + b * 1000
+
+
+def test_remaining_sums_later_stages_and_uses_progress(tmp_path):
+    model = eta_model.EtaModel(path=str(tmp_path / "none.db"), host="h1")
+    audio = 1200
+    later = sum(model.stage_seconds(s, audio, "local") for s in ("extract_audio", "transcribe", "llm", "finalize"))
+
+    at_start = model.remaining("download", audio, "local")
+    assert at_start == round(model.stage_seconds("download", audio, "local") + later)
+    # 已下载一半用时 40s：当前阶段按实际速度外推还需 40s
+    assert model.remaining("download", audio, "local", fraction=0.5, elapsed=40) == round(40 + later)
+    # 字幕导入与转录互斥，后续只剩 llm + finalize
+    tail = sum(model.stage_seconds(s, audio, "local") for s in ("llm", "finalize"))
+    assert model.remaining("import_subtitles", audio, "local") == round(model.stage_seconds("import_subtitles", audio) + tail)
+
+
+def test_stage_clock_records_each_stage(tmp_path, monkeypatch):
+    path = str(tmp_path / "t.db")
+    monkeypatch.setattr(eta_model, "TIMINGS_PATH", path)
+    clock = eta_model.StageClock("task1", "local", audio_seconds=300, model=eta_model.EtaModel(path=path))
+    assert clock.eta() is None
+    assert clock.start("download") > 0
+    clock.start("extract_audio")
+    clock.stop()
+    clock.stop()
+
+    conn = eta_model._connect(path)
+    rows = conn.execute("SELECT stage, task_id, audio_seconds FROM stage_timings ORDER BY id").fetchall()
+    conn.close()
+    assert rows == [("download", "task1", 300.0), ("extract_audio", "task1", 300.0)]
@@ -0,0 +1,52 @@
+import sys
+import os
+import pytest
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import keyword_sync
+
+
+class FakeClient:
+    def __init__(self, data=None, fail=False):
+        self.data = data
+        self.fail = fail
+        self.rpcs = []
+        self.tables = []
+
+    def rpc(self, name, params):
+        self.rpcs.append((name, params))
+        return self
+
+    def table(self, name):
+        self.tables.append(name)
+        return self
+
+    def execute(self):
+        if self.fail:
+            raise Exception("function public.sync_video_keywords does not exist")
+        return type("Response", (), {"data": self.data})()
+
+
+def test_rpc_path_sends_cleaned_keywords_once():
+    client = FakeClient(data=2)
+    linked = keyword_sync.sync_video_keywords(client, "vid", [" AI ", "AI", "", None, "机器学习"])
+    assert linked == 2
+    assert client.rpcs == [("sync_video_keywords", {"p_video_id": "vid", "p_keywords": ["AI", "机器学习"]})]
+
+
+def test_rpc_failure_raises_without_racy_fallback():
+    client = FakeClient(fail=True)
+    with pytest.raises(keyword_sync.KeywordSyncError):
+        keyword_sync.sync_video_keywords(client, "vid", ["AI"])
+    # 不退回到客户端 select → upsert count 的读改写
+    assert client.tables == []
+
+
+def test_nothing_to_sync():
+    client = FakeClient()
+    assert keyword_sync.sync_video_keywords(client, "vid", ["  ", None]) == 0
+    assert keyword_sync.sync_video_keywords(None, "vid", ["AI"]) == 0
+    assert client.rpcs == []
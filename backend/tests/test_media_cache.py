@@ -0,0 +1,142 @@
+import sys
+import os
+import time
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import media_cache
+import status_store
+
+MB = 1024 * 1024
+
+
+def _setup(tmp_path, monkeypatch, **budgets_mb):
+    downloads, cache = tmp_path / "downloads", tmp_path / "cache"
+    downloads.mkdir()
+    cache.mkdir()
+    monkeypatch.setattr(media_cache, "DOWNLOADS_DIR", str(downloads))
+    monkeypatch.setattr(media_cache, "CACHE_DIR", str(cache))
+    monkeypatch.setattr(media_cache, "INDEX_PATH", str(tmp_path / "media_cache.db"))
+    monkeypatch.setattr(media_cache, "MIN_FREE_GB", None)
+    monkeypatch.setattr(media_cache, "_touched", {})
+    monkeypatch.setattr(status_store, "STATUS_DB_PATH", str(tmp_path / "status.db"))
+    policies = {k: dict(v) for k, v in media_cache.POLICIES.items()}
+    for category, mb in budgets_mb.items():
+        policies[category]["budget_gb"] = mb * MB / media_cache.GB
+    monkeypatch.setattr(media_cache, "POLICIES", policies)
+    return downloads, cache
+
+
+def _file(directory, name, size_mb, age):
+    path = directory / name
+    path.write_bytes(b"\0" * int(size_mb * MB))
+    at = time.time() - age
+    os.utime(path, (at, at))
+    return str(path)
+
+
+def test_budget_evicts_least_recently_used(tmp_path, monkeypatch):
+    downloads, _ = _setup(tmp_path, monkeypatch, audio=2.5)
+    _file(downloads, "old.m4a", 1, 3 * 86400)
+    recent = _file(downloads, "recent.m4a", 1, 2 * 86400)
+    played = _file(downloads, "played.m4a", 1, 5 * 86400)
+    thumb = _file(downloads, "old.jpg", 1, 30 * 86400)
+
+    # 最早下载但最近被播放过：按访问时间排序，不被淘汰
+    media_cache.touch(played)
+    report = media_cache.sweep()
+
+    assert [f["name"] for f in report["files"]] == ["downloads/old.m4a"]
+    assert os.path.exists(played) and os.path.exists(recent)
+    assert os.path.exists(thumb)  # 缩略图默认不淘汰
+    usage = media_cache.usage()["categories"]
+    assert usage["audio"]["files"] == 2
+    assert usage["thumbnail"]["budget_bytes"] is None
+
+
+def test_active_tasks_and_fresh_files_are_pinned(tmp_path, monkeypatch):
+    downloads, cache = _setup(tmp_path, monkeypatch, audio=0, asr=0)
+    queued = _file(downloads, "vid1.m4a", 1, 5 * 86400)
+    asr = _file(cache, "vid1_local_large_raw.json", 1, 5 * 86400)
+    fresh = _file(downloads, "vid2.m4a", 1, 60)
+    stale = _file(downloads, "vid3.m4a", 1, 5 * 86400)
+    _file(downloads, ".upload-abc.tmp", 1, 5 * 86400)
+    status_store.save_status("vid1", "queued", 0)
+
+    report = media_cache.sweep(dry_run=True)
+    assert [f["name"] for f in report["files"]] == ["downloads/vid3.m4a"]
+    assert os.path.exists(stale)  # dry run 不删除
+
+    media_cache.sweep()
+    assert os.path.exists(queued) and os.path.exists(asr) and os.path.exists(fresh)
+    assert not os.path.exists(stale)
+    assert media_cache.usage()["categories"]["audio"]["pinned_files"] == 2
+
+
+def test_tasks_in_any_running_stage_are_pinned(tmp_path, monkeypatch):
+    downloads, cache = _setup(tmp_path, monkeypatch, audio=0, asr=0)
+    for stage in ("downloading", "transcribing_local", "llm_processing"):
+        _file(downloads, f"{stage}.m4a", 1, 5 * 86400)
+        _file(cache, f"{stage}_local_large_raw.json", 1, 5 * 86400)
+        status_store.save_status(stage, stage, 50)
+    done = _file(downloads, "done.m4a", 1, 5 * 86400)
+    status_store.save_status("done", "completed", 100)
+
+    # 转录 / LLM 阶段可能远超 GRACE_SECONDS，只能靠状态固定
+    monkeypatch.setattr(media_cache, "MIN_FREE_GB", 1)
+    plan = media_cache.plan_evictions(media_cache.scan(), disk_free=0)
+    assert [e["path"] for e, _ in plan] == [done]
+
+
+def test_max_age_and_disk_pressure(tmp_path, monkeypatch):
+    downloads, cache = _setup(tmp_path, monkeypatch)
+    _file(downloads, "a.mp4", 1, 2 * 86400)      # 视频原件超过 1 天
+    _file(downloads, "b.m4a", 1, 10 * 86400)
+    _file(downloads, "c.m4a", 1, 3 * 86400)
+    _file(cache, "d_local_raw.json", 1, 20 * 86400)
+    _file(downloads, "e.jpg", 1, 40 * 86400)
+    entries = media_cache.scan()
+
+    plan = media_cache.plan_evictions(entries)
+    assert [(e["name"], reason) for e, reason in plan] == [("downloads/a.mp4", "max_age")]
+
+    # 磁盘余量不足时跨类别按 LRU 继续淘汰，直到余量达标
+    monkeypatch.setattr(media_cache, "MIN_FREE_GB", 3 * MB / media_cache.GB)
+    plan = media_cache.plan_evictions(entries, disk_free=0)
+    assert [e["name"] for e, _ in plan] == ["downloads/a.mp4", "cache/d_local_raw.json", "downloads/b.m4a"]
+
+
+def test_touches_are_buffered_until_flush(tmp_path, monkeypatch):
+    downloads, _ = _setup(tmp_path, monkeypatch)
+    path = _file(downloads, "x.m4a", 1, 86400)
+    media_cache.touch(path)
+    media_cache.touch(path)
+    media_cache.touch(str(tmp_path / "elsewhere.m4a"))  # 不在受管目录，忽略
+    assert media_cache._load_index() == {}
+
+    assert media_cache.flush_touches() == 1
+    at, hits = media_cache._load_index()["downloads/x.m4a"]
+    assert hits == 2 and time.time() - at < 5
+    assert media_cache.flush_touches() == 0
+
+
+def test_upload_sources_are_never_evicted(tmp_path, monkeypatch):
+    downloads, _ = _setup(tmp_path, monkeypatch, audio=1, video=0)
+    upload_audio = _file(downloads, "up_0123456789abcdef.m4a", 3, 30 * 86400)
+    upload_video = _file(downloads, "up_deadbeef.mp4", 1, 30 * 86400)
+    upload_play = _file(downloads, "up_0123456789abcdef.play.opus", 1, 30 * 86400)
+    youtube = _file(downloads, "vid1.m4a", 1, 2 * 86400)
+
+    monkeypatch.setattr(media_cache, "MIN_FREE_GB", 1)
+    plan = media_cache.plan_evictions(media_cache.scan(), disk_free=0)
+    # 上传原件与其音频是唯一副本：不淘汰，也不占预算挤掉 YouTube 音频；播放版本可重建，照常淘汰
+    assert sorted(e["path"] for e, _ in plan) == sorted([upload_play, youtube])
+
+    monkeypatch.setattr(media_cache, "MIN_FREE_GB", None)
+    media_cache.sweep()
+    assert os.path.exists(upload_audio) and os.path.exists(upload_video) and os.path.exists(youtube)
+    usage = media_cache.usage()["categories"]
+    assert usage["audio"]["upload_files"] == 1
+    assert usage["audio"]["upload_bytes"] == 3 * MB
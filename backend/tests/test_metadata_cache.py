@@ -0,0 +1,58 @@
+import sys
+import os
+import json
+import pytest
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import metadata_cache
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def _isolated_metrics(tmp_path, monkeypatch):
+    # 缓存命中计数写入临时库，不污染 backend/cache
+    monkeypatch.setattr(metrics, "METRICS_PATH", str(tmp_path / "metrics.db"))
+    # 指标先缓存在内存，进程退出时才写入；换成本测试独占的缓冲区，避免写到真实路径
+    monkeypatch.setattr(metrics, "_pending", {})
+
+
+def test_video_info_roundtrip_and_ttl(tmp_path):
+    info = {"id": "abcdefghijk", "title": "标题", "formats": [{"format_id": "140"}]}
+    metadata_cache.put_video_info("abcdefghijk", info, cache_dir=str(tmp_path))
+
+    assert metadata_cache.get_video_info("abcdefghijk", cache_dir=str(tmp_path)) == info
+    # 超过 TTL 视为过期，并删除缓存文件
+    assert metadata_cache.get_video_info("abcdefghijk", ttl=-1, cache_dir=str(tmp_path)) is None
+    assert metadata_cache.get_video_info("abcdefghijk", cache_dir=str(tmp_path)) is None
+
+
+def test_channel_avatar_caches_missing_avatar(tmp_path):
+    url = "https://www.youtube.com/@someone"
+    assert metadata_cache.get_channel_avatar(url, cache_dir=str(tmp_path)) == (False, None)
+
+    metadata_cache.put_channel_avatar(url, None, cache_dir=str(tmp_path))
+    assert metadata_cache.get_channel_avatar(url, cache_dir=str(tmp_path)) == (True, None)
+
+    metadata_cache.put_channel_avatar(url, "https://yt3.example/a.jpg", cache_dir=str(tmp_path))
+    assert metadata_cache.get_channel_avatar(url, cache_dir=str(tmp_path)) == (True, "https://yt3.example/a.jpg")
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    path = os.path.join(str(tmp_path), "videos", "broken00000.json")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert metadata_cache.get_video_info("broken00000", cache_dir=str(tmp_path)) is None
+
+
+def test_extract_video_info_uses_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(metadata_cache, "CACHE_DIR", str(tmp_path))
+    metadata_cache.put_video_info("abcdefghijk", {"id": "abcdefghijk", "title": "cached"})
+    # 命中缓存时不应触发网络解析
+    info = metadata_cache.extract_video_info("https://www.youtube.com/watch?v=abcdefghijk", "abcdefghijk", {})
+    assert info["title"] == "cached"
+    with open(os.path.join(str(tmp_path), "videos", "abcdefghijk.json")) as f:
+        assert json.load(f)["key"] == "abcdefghijk"
@@ -0,0 +1,96 @@
+import sys
+import os
+import pytest
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def _isolated_metrics(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_PATH", str(tmp_path / "metrics.db"))
+    monkeypatch.setattr(metrics, "_pending", {})
+    metrics.reset_summary()
+    yield
+    metrics.reset_summary()
+
+
+def test_timed_context_manager_records_histogram_and_summary():
+    with metrics.timed("download") as t:
+        pass
+    assert t.elapsed is not None and t.elapsed >= 0
+
+    text = metrics.render_prometheus()
+    assert "# TYPE tldw_stage_seconds histogram" in text
+    assert 'tldw_stage_seconds_count{stage="download",status="ok"} 1' in text
+    assert 'tldw_stage_seconds_bucket{stage="download",status="ok",le="+Inf"} 1' in text
+    assert metrics.timings_summary()["download"]["count"] == 1
+
+
+def test_timed_decorator_marks_errors():
+    @metrics.timed("summarize")
+    def boom():
+        raise ValueError("x")
+
+    with pytest.raises(ValueError):
+        boom()
+    assert 'tldw_stage_seconds_count{stage="summarize",status="error"} 1' in metrics.render_prometheus()
+
+
+def test_histogram_buckets_are_cumulative():
+    for value in (0.03, 0.3, 3):
+        metrics.observe("asr_rtf", value, mode="local")
+    text = metrics.render_prometheus()
+    assert 'tldw_asr_rtf_bucket{mode="local",le="0.05"} 1' in text
+    assert 'tldw_asr_rtf_bucket{mode="local",le="0.5"} 2' in text
+    assert 'tldw_asr_rtf_bucket{mode="local",le="+Inf"} 3' in text
+    assert 'tldw_asr_rtf_count{mode="local"} 3' in text
+
+
+def test_counters_accumulate_per_label_set():
+    metrics.cache_lookup("video_info", True)
+    metrics.cache_lookup("video_info", True)
+    metrics.cache_lookup("video_info", False)
+    metrics.incr("llm_tokens_total", 120, server="http://a:11434/v1", type="completion")
+    text = metrics.render_prometheus()
+    assert 'tldw_cache_requests_total{cache="video_info",result="hit"} 2' in text
+    assert 'tldw_cache_requests_total{cache="video_info",result="miss"} 1' in text
+    assert 'tldw_llm_tokens_total{server="http://a:11434/v1",type="completion"} 120' in text
+
+
+def test_merge_summaries_across_processes():
+    worker = {"asr": {"count": 1, "total_seconds": 30.0, "max_seconds": 30.0}}
+    task = {"download": {"count": 1, "total_seconds": 5.0, "max_seconds": 5.0},
+            "asr": {"count": 1, "total_seconds": 10.0, "max_seconds": 10.0}}
+    merged = metrics.merge_summaries(worker, task, None)
+    assert merged["asr"] == {"count": 2, "total_seconds": 40.0, "max_seconds": 30.0}
+    assert merged["download"]["count"] == 1
+
+
+def test_render_without_database_is_empty():
+    assert metrics.render_prometheus() == ""
+
+
+def test_observations_are_buffered_until_flush(monkeypatch):
+    connects = []
+    real_connect = metrics._connect
+    monkeypatch.setattr(metrics, "_connect", lambda path=None: connects.append(path) or real_connect(path))
+
+    for _ in range(50):
+        metrics.cache_lookup("video_info", True)
+        metrics.observe("stage_seconds", 0.2, stage="asr", status="ok")
+    # 热路径不打开数据库
+    assert connects == [] and not os.path.exists(metrics.METRICS_PATH)
+
+    assert metrics.flush() == 2
+    assert len(connects) == 1
+    metrics.observe("stage_seconds", 3, stage="asr", status="ok")
+    metrics.flush()
+    text = metrics.render_prometheus()
+    assert 'tldw_cache_requests_total{cache="video_info",result="hit"} 50' in text
+    assert 'tldw_stage_seconds_bucket{stage="asr",status="ok",le="0.5"} 50' in text
+    assert 'tldw_stage_seconds_count{stage="asr",status="ok"} 51' in text
+    assert metrics.flush() == 0
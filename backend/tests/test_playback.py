@@ -0,0 +1,106 @@
+import sys
+import os
+import time
+
+import pytest
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import playback
+import media_cache
+import status_store
+
+
+def _touch_file(path, data=b"x", age=0):
+    path.write_bytes(data)
+    at = time.time() - age
+    os.utime(path, (at, at))
+    return str(path)
+
+
+def test_parse_range():
+    assert playback.parse_range(None, 100) is None
+    assert playback.parse_range("bytes=0-9", 100) == (0, 9)
+    assert playback.parse_range("bytes=90-", 100) == (90, 99)
+    assert playback.parse_range("bytes=-10", 100) == (90, 99)
+    assert playback.parse_range("bytes=50-500", 100) == (50, 99)
+    # 多段 / 非法格式整体返回
+    assert playback.parse_range("bytes=0-1,5-6", 100) is None
+    assert playback.parse_range("items=0-1", 100) is None
+    with pytest.raises(ValueError):
+        playback.parse_range("bytes=100-", 100)
+
+
+def test_iter_file_reads_closed_interval(tmp_path):
+    path = _touch_file(tmp_path / "a.m4a", bytes(range(200)))
+    data = b"".join(playback.iter_file(path, 10, 149, chunk_size=32))
+    assert data == bytes(range(10, 150))
+
+
+def test_resolve_prefers_fresh_rendition(tmp_path):
+    source = _touch_file(tmp_path / "vid.m4a", age=100)
+    assert playback.resolve("vid.m4a", str(tmp_path)) == source
+    rendition = _touch_file(tmp_path / "vid.play.opus")
+    assert playback.resolve("vid.m4a", str(tmp_path)) == rendition
+    assert playback.resolve("vid.m4a", str(tmp_path), prefer_rendition=False) == source
+    # 原始音频重新下载后，旧的播放版本不再使用
+    _touch_file(tmp_path / "vid.m4a", age=-100)
+    assert playback.resolve("vid.m4a", str(tmp_path)) == source
+    # media_path 指向已删除的视频原件时找提取出的音频
+    extracted = _touch_file(tmp_path / "up.opus")
+    assert playback.resolve("up.mp4", str(tmp_path)) == extracted
+    assert playback.resolve("up.mp4", str(tmp_path), prefer_rendition=False) == extracted
+    assert playback.resolve("../secret.m4a", str(tmp_path)) is None
+    assert playback.resolve("missing.m4a", str(tmp_path)) is None
+
+
+def test_pending_skips_active_tasks_and_existing_renditions(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_cache, "DOWNLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr(media_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(media_cache, "INDEX_PATH", str(tmp_path / "media_cache.db"))
+    monkeypatch.setattr(media_cache, "_touched", {})
+    monkeypatch.setattr(status_store, "STATUS_DB_PATH", str(tmp_path / "status.db"))
+    day = 86400
+    _touch_file(tmp_path / "done.m4a", age=3 * day)
+    _touch_file(tmp_path / "done.play.opus", age=2 * day)
+    popular = _touch_file(tmp_path / "popular.m4a", age=5 * day)
+    other = _touch_file(tmp_path / "other.webm", age=2 * day)
+    _touch_file(tmp_path / "busy.m4a", age=2 * day)
+    status_store.save_status("busy", "processing", 40)
+    # 转录阶段的任务同样在途，不转码
+    _touch_file(tmp_path / "asr.m4a", age=2 * day)
+    status_store.save_status("asr", "transcribing_local", 60)
+    media_cache.touch(popular)
+
+    assert playback.pending() == [popular, other]
+    assert media_cache.category_of("downloads", "done.play.opus") == "playback"
+
+
+def test_build_rendition_keeps_original_on_failure(tmp_path, monkeypatch):
+    source = _touch_file(tmp_path / "vid.m4a", age=10)
+    commands = []
+
+    def fake_run(cmd, **kwargs):
+        commands.append(cmd)
+        with open(cmd[-1], "wb") as f:
+            f.write(b"opus")
+        return type("Result", (), {"returncode": 0, "stderr": ""})()
+
+    monkeypatch.setattr(playback.subprocess, "run", fake_run)
+    output = playback.build_rendition(source)
+    assert output == str(tmp_path / "vid.play.opus")
+    assert "libopus" in commands[0] and commands[0][-1].endswith(".tmp.play.opus")
+    # 已有新鲜的播放版本时不再转码
+    assert playback.build_rendition(source) == output and len(commands) == 1
+
+    def failing_run(cmd, **kwargs):
+        with open(cmd[-1], "wb") as f:
+            f.write(b"partial")
+        return type("Result", (), {"returncode": 1, "stderr": "boom"})()
+
+    other = _touch_file(tmp_path / "other.m4a")
+    monkeypatch.setattr(playback.subprocess, "run", failing_run)
+    assert playback.build_rendition(other) is None
+    assert sorted(os.listdir(tmp_path)) == ["other.m4a", "vid.m4a", "vid.play.opus"]
@@ -0,0 +1,91 @@
+import sys
+import os
+import json
+import asyncio
+import threading
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+from progress_hub import ProgressHub
+
+
+def _file_reader(directory, reads):
+    def read(task_id):
+        reads.append(task_id)
+        path = os.path.join(directory, f"{task_id}_status.json")
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with open(path) as f:
+                return mtime, json.load(f)
+        except OSError:
+            return None, None
+    return read
+
+
+def _write(directory, task_id, status, progress):
+    path = os.path.join(directory, f"{task_id}_status.json")
+    with open(path, "w") as f:
+        json.dump({"status": status, "progress": progress}, f)
+    # 保证 mtime 变化（部分文件系统精度较粗）
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def test_subscribers_share_one_watcher_and_stop_on_completion(tmp_path):
+    reads = []
+    hub = ProgressHub(_file_reader(str(tmp_path), reads), poll_interval=0.01)
+    _write(tmp_path, "t1", "downloading", 20)
+
+    async def collect():
+        return [s async for s in hub.subscribe("t1")]
+
+    async def main():
+        viewers = [asyncio.create_task(collect()) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert hub.subscriber_count("t1") == 3
+        assert len(hub._watchers) == 1
+        # 跨进程写入：由观察者按 mtime 发现
+        _write(tmp_path, "t1", "llm_processing", 80)
+        await asyncio.sleep(0.05)
+        _write(tmp_path, "t1", "completed", 100)
+        return await asyncio.wait_for(asyncio.gather(*viewers), 2)
+
+    results = asyncio.run(main())
+    for events in results:
+        assert [e["status"] for e in events] == ["downloading", "llm_processing", "completed"]
+    assert hub.subscriber_count() == 0
+    assert hub._watchers == {}
+    # 读取次数只取决于轮询周期，与订阅者数量无关
+    assert len(reads) < 60
+
+
+def test_publish_from_worker_thread_and_keepalive(tmp_path):
+    hub = ProgressHub(lambda task_id: (None, None), poll_interval=0.01)
+
+    async def main():
+        events = []
+
+        async def viewer():
+            async for s in hub.subscribe("t2", keepalive=0.02):
+                events.append(s)
+
+        task = asyncio.create_task(viewer())
+        await asyncio.sleep(0.05)
+        thread = threading.Thread(target=hub.publish, args=("t2", {"status": "processing", "progress": 5}))
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0.01)
+        hub.publish("t2", {"status": "processing", "progress": 5})  # 重复状态不推送
+        hub.publish("t2", {"status": "failed", "progress": 100})
+        await asyncio.wait_for(task, 1)
+        return events
+
+    events = asyncio.run(main())
+    statuses = [e for e in events if e is not None]
+    assert statuses == [{"status": "processing", "progress": 5}, {"status": "failed", "progress": 100}]
+    # 空闲期间给出 None 作为心跳
+    assert events[0] is None
+    # 无订阅者时 publish 不报错
+    hub.publish("t2", {"status": "queued"})
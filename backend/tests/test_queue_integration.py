@@ -0,0 +1,224 @@
+import sys
+import os
+import time
+import asyncio
+
+import pytest
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import queue_policy
+import status_store
+
+# scheduler / main 通过 db.py 导入 supabase；缺少依赖的环境下跳过
+for _module in ("supabase", "dotenv"):
+    pytest.importorskip(_module)
+
+
+class FakeTable:
+    """最小化的 Supabase 表查询：支持 select / eq / in_ / order / limit / range / insert / upsert / update / delete"""
+
+    def __init__(self, db, name):
+        self.db, self.name = db, name
+        self.filters, self.action, self.payload = [], "select", None
+        self._offset, self._limit = 0, None
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda r: r.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda r: r.get(column) in values)
+        return self
+
+    def order(self, column, desc=False):
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def range(self, start, end):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def insert(self, row):
+        self.action, self.payload = "insert", row
+        return self
+
+    def upsert(self, row):
+        self.action, self.payload = "upsert", row
+        return self
+
+    def update(self, values):
+        self.action, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    def execute(self):
+        rows = self.db.tables.setdefault(self.name, [])
+        self.db.calls.append((self.name, self.action, self.payload))
+        matched = [r for r in rows if all(f(r) for f in self.filters)]
+        if self.action == "insert":
+            key = self.db.unique.get(self.name)
+            if key and any(all(r.get(k) == self.payload.get(k) for k in key) for r in rows):
+                raise Exception("duplicate key value violates unique constraint")
+            rows.append(dict(self.payload))
+        elif self.action == "upsert":
+            existing = [r for r in rows if r.get("id") == self.payload.get("id")]
+            if existing:
+                existing[0].update(self.payload)
+            else:
+                rows.append(dict(self.payload))
+        elif self.action == "update":
+            for r in matched:
+                r.update(self.payload)
+        elif self.action == "delete":
+            self.db.tables[self.name] = [r for r in rows if r not in matched]
+        end = None if self._limit is None else self._offset + self._limit
+        data = matched[self._offset:end] if self.action == "select" else [self.payload]
+        return type("Response", (), {"data": data})()
+
+
+class FakeSupabase:
+    def __init__(self, **tables):
+        self.tables = {name: [dict(r) for r in rows] for name, rows in tables.items()}
+        self.unique = {"submissions": ("user_id", "video_id")}
+        self.calls = []
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+
+def _video(tid, user_id, status="queued", waited=60, duration=600):
+    return {"id": tid, "status": status, "user_id": user_id, "created_at": time.time() - waited,
+            "duration": duration, "mode": "local", "source": "manual"}
+
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(status_store, "STATUS_DB_PATH", str(tmp_path / "status.db"))
+    import scheduler
+    return scheduler
+
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    for module in ("fastapi", "openai"):
+        pytest.importorskip(module)
+    monkeypatch.chdir(tmp_path)
+    for name in ("downloads", "results", "cache"):
+        (tmp_path / name).mkdir()
+    monkeypatch.setattr(status_store, "STATUS_DB_PATH", str(tmp_path / "status.db"))
+    # 导入 main 会调用 app_logger.setup()，日志与 trace 写到临时目录而不是源码树
+    import app_logger
+    import tracing
+    monkeypatch.setattr(app_logger, "LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path / "logs" / "traces"))
+    # main 的下载目录取自 media_cache，同样指向临时目录
+    import media_cache
+    monkeypatch.setattr(media_cache, "DOWNLOADS_DIR", str(tmp_path / "downloads"))
+    import main
+    monkeypatch.setattr(main, "DOWNLOADS_DIR", str(tmp_path / "downloads"))
+    monkeypatch.setattr(main, "_queue_snapshot", {"at": 0.0, "tasks": [], "progress": {}, "positions": {}})
+    return main
+
+
+def test_scheduler_picks_fair_next_task(scheduler, monkeypatch):
+    client = FakeSupabase(videos=[
+        _video("a_running", "alice", status="processing"),
+        _video("a_queued", "alice", waited=60),
+        _video("b_queued", "bob", waited=60),
+    ])
+    monkeypatch.setattr(scheduler, "supabase", client)
+    monkeypatch.setattr(scheduler, "_consecutive_db_errors", 0)
+
+    # alice 已有任务在跑，同样等待的 bob 先轮到
+    assert scheduler.get_next_task() == {"id": "b_queued", "is_local": False}
+    assert scheduler._consecutive_db_errors == 0
+
+
+def test_admission_rejects_over_limit_with_retry_after(main, monkeypatch):
+    from fastapi import HTTPException
+    client = FakeSupabase(videos=[_video(f"v{i}", "alice") for i in range(2)])
+    monkeypatch.setattr(main, "supabase", client)
+    monkeypatch.setattr(queue_policy, "MAX_INFLIGHT_PER_TENANT", 2)
+
+    with pytest.raises(HTTPException) as exc:
+        main._admit_submission({"id": "v_new", "source": "manual", "user_id": "alice"})
+    assert exc.value.status_code == 429
+    assert int(exc.value.headers["Retry-After"]) >= queue_policy.MIN_RETRY_AFTER_SECONDS
+
+    # 其他用户不受影响；接收后立即计入快照
+    main._admit_submission({"id": "b1", "source": "manual", "user_id": "bob"})
+    assert "b1" in main._queue_snapshot["positions"]
+
+
+def _submit(main, url, user_id):
+    return asyncio.run(main.process_video(main.ProcessRequest(url=url, user_id=user_id), None))
+
+
+@pytest.mark.parametrize("status", ["queued", "processing", "completed"])
+def test_process_merges_submission_into_existing_task(main, monkeypatch, tmp_path, status):
+    vid = "abcdefghijk"
+    client = FakeSupabase(videos=[_video(vid, "alice", status=status)],
+                          submissions=[{"user_id": "alice", "video_id": vid, "task_id": vid}])
+    monkeypatch.setattr(main, "supabase", client)
+    monkeypatch.setattr(main.metadata_cache, "get_video_info", lambda video_id: None)
+    result_file = tmp_path / "results" / f"{vid}.json"
+    result_file.write_text("{}")
+
+    response = _submit(main, f"https://www.youtube.com/watch?v={vid}", "bob")
+
+    assert response == {"task_id": vid, "deduplicated": True, "status": status}
+    # 不改写 videos 行、不删除已有结果，只为 bob 补一条提交记录
+    assert not [c for c in client.calls if c[0] == "videos" and c[1] != "select"]
+    assert client.tables["videos"][0]["status"] == status
+    assert result_file.exists()
+    assert {s["user_id"] for s in client.tables["submissions"]} == {"alice", "bob"}
+
+
+def test_process_requeues_failed_task(main, monkeypatch, tmp_path):
+    vid = "abcdefghijk"
+    client = FakeSupabase(videos=[_video(vid, "alice", status="failed")])
+    monkeypatch.setattr(main, "supabase", client)
+    monkeypatch.setattr(main.metadata_cache, "get_video_info", lambda video_id: None)
+    error_file = tmp_path / "results" / f"{vid}_error.json"
+    error_file.write_text("{}")
+
+    response = _submit(main, vid, "bob")
+
+    assert response == {"task_id": vid}
+    assert client.tables["videos"][0]["status"] == "queued"
+    assert not error_file.exists()
+    assert status_store.get_status(vid)["status"] == "queued"
+    assert [s["user_id"] for s in client.tables["submissions"]] == ["bob"]
+
+
+def test_tracker_timeout_still_charges_quota(main, monkeypatch):
+    from datetime import date
+    monkeypatch.setattr(main, "supabase", None)
+    monkeypatch.setattr(main, "_daily_video_count", 0)
+    monkeypatch.setattr(main, "_last_reset_day", date.today())
+    monkeypatch.setattr(main, "_hourly_queued", [])
+    monkeypatch.setattr(main, "TRACKER_TIMEOUT_SECONDS", 0.1)
+
+    async def slow_tracker(client, max_new=None, concurrency=None, on_queued=None):
+        on_queued(2)
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(main.tracker, "run_tracker", slow_tracker)
+
+    assert asyncio.run(main.run_channel_tracker()) is None
+    # 超时前已入队的 2 个任务计入每日与每小时配额
+    assert main._daily_video_count == 2
+    assert sum(n for _, n in main._hourly_queued) == 2
@@ -0,0 +1,176 @@
+import sys
+import os
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import queue_policy
+
+NOW = 1_800_000_000.0
+
+
+def _task(tid, duration, waited, source="tracker", status="queued", mode="local", user_id=None):
+    return {"id": tid, "duration": duration, "created_at": NOW - waited,
+            "source": source, "status": status, "mode": mode, "user_id": user_id}
+
+
+def test_short_jobs_run_first():
+    tasks = [_task("long", 3 * 3600, 60), _task("short", 300, 30)]
+    assert [t["id"] for t in queue_policy.order_queue(tasks, NOW)] == ["short", "long"]
+
+
+def test_aging_prevents_starvation():
+    long_cost = queue_policy.estimate_cost(3 * 3600, "local")
+    short_cost = queue_policy.estimate_cost(300, "local")
+    # 长任务等待足够久后排到新到的短任务之前
+    waited = (long_cost - short_cost) / queue_policy.AGING_RATE + 60
+    tasks = [_task("long", 3 * 3600, waited), _task("short", 300, 0)]
+    assert queue_policy.order_queue(tasks, NOW)[0]["id"] == "long"
+
+
+def test_manual_tier_still_first():
+    tasks = [_task("tracker_short", 60, 600), _task("manual_long", 7200, 0, source="manual")]
+    assert queue_policy.order_queue(tasks, NOW)[0]["id"] == "manual_long"
+
+
+def test_unknown_duration_uses_default():
+    assert queue_policy.estimate_cost(None, "local") == queue_policy.estimate_cost(
+        queue_policy.DEFAULT_DURATION_SECONDS, "local")
+    assert queue_policy.estimate_cost("bad", "cloud") == queue_policy.estimate_cost(
+        queue_policy.DEFAULT_DURATION_SECONDS, "cloud")
+
+
+def test_positions_account_for_running_task():
+    running = _task("running", 600, 900, status="processing")
+    a = _task("a", 300, 10)
+    b = _task("b", 1200, 10)
+    positions = queue_policy.queue_positions([running, a, b], NOW, progress={"running": 50})
+
+    run_remaining = queue_policy.estimate_cost(600, "local") * 0.5
+    assert positions["a"]["queue_position"] == 1
+    assert positions["a"]["predicted_start"] == NOW + run_remaining
+    assert positions["b"]["queue_position"] == 2
+    assert positions["b"]["predicted_start"] == NOW + run_remaining + queue_policy.estimate_cost(300, "local")
+    assert "running" not in positions
+
+
+def test_parses_iso_created_at():
+    tasks = [{"id": "x", "created_at": "2026-01-01T00:00:00+00:00", "duration": 60},
+             {"id": "y", "created_at": "2026-01-01T00:00:00Z", "duration": 30}]
+    assert queue_policy.order_queue(tasks)[0]["id"] == "y"
+
+
+def test_fair_share_across_users():
+    # 用户 a 一次提交了大量任务，随后 b 只提交一个：b 不必等 a 全部跑完
+    burst = [_task(f"a{i}", 600, 120 - i, source="manual", user_id="a") for i in range(10)]
+    late = _task("b0", 600, 0, source="manual", user_id="b")
+    order = [t["id"] for t in queue_policy.order_queue(burst + [late], NOW)]
+    assert order.index("b0") <= 1
+    # 单个用户内部顺序不变
+    assert [i for i in order if i.startswith("a")] == [f"a{i}" for i in range(10)]
+
+
+def test_running_task_counts_toward_tenant_share():
+    running = [_task("a_run", 600, 900, source="manual", status="processing", user_id="a")]
+    tasks = [_task("a1", 600, 300, source="manual", user_id="a"),
+             _task("b1", 600, 0, source="manual", user_id="b")]
+    assert queue_policy.order_queue(tasks, NOW, running)[0]["id"] == "b1"
+
+
+def test_tenant_weights(monkeypatch):
+    monkeypatch.setattr(queue_policy, "TENANT_WEIGHTS", {"user:a": 3})
+    tasks = [_task(f"a{i}", 600, 0, source="manual", user_id="a") for i in range(6)] + \
+            [_task(f"b{i}", 600, 0, source="manual", user_id="b") for i in range(6)]
+    first = [t["id"][0] for t in queue_policy.order_queue(tasks, NOW)[:8]]
+    assert first.count("a") == 6
+
+
+def test_admission_limits(monkeypatch):
+    monkeypatch.setattr(queue_policy, "MAX_INFLIGHT_PER_TENANT", 3)
+    monkeypatch.setattr(queue_policy, "MAX_BACKLOG_SECONDS", 3600)
+    tasks = [_task(f"a{i}", 600, 10, source="manual", user_id="a") for i in range(3)]
+    new_a = {"id": "a9", "source": "manual", "user_id": "a", "duration": 600, "mode": "local"}
+    reason, retry_after = queue_policy.admission(tasks, new_a, NOW)
+    assert reason == "tenant_inflight_limit"
+    assert retry_after == int(queue_policy.estimate_cost(600, "local"))
+
+    # 其他用户可以进入：公平排队下它的预计完成时间不受 a 的积压影响太多
+    new_b = {"id": "b0", "source": "manual", "user_id": "b", "duration": 600, "mode": "local"}
+    assert queue_policy.admission(tasks, new_b, NOW) is None
+
+    # 全局积压过长：预计完成时间超过上限，Retry-After 为超出部分
+    long_running = [_task("big", 40000, 10, source="manual", status="processing", user_id="c")]
+    reason, retry_after = queue_policy.admission(long_running, new_b, NOW)
+    expected = queue_policy.estimate_cost(40000, "local") + queue_policy.estimate_cost(600, "local") - 3600
+    assert reason == "backlog_limit"
+    assert retry_after == int(expected)
+
+
+def test_tracker_is_one_tenant():
+    assert queue_policy.tenant(_task("x", 60, 0)) == queue_policy.TRACKER_TENANT
+    assert queue_policy.tenant(_task("y", 60, 0, source="manual")) == "user:anonymous"
+
+
+class _FakeQuery:
+    def __init__(self, rows, calls):
+        self.rows, self.calls = rows, calls
+
+    def __getattr__(self, name):
+        def record(*args, **kwargs):
+            self.calls.append((name, args))
+            return self
+        return record
+
+    def execute(self):
+        ranges = [args for name, args in self.calls if name == "range"]
+        rows = self.rows
+        if ranges:
+            start, end = ranges[-1]
+            rows = rows[start:end + 1]
+        return type("Response", (), {"data": rows})()
+
+
+def test_fetch_active_tasks_selects_tenant_column():
+    calls = []
+    rows = [_task("a", 60, 10, user_id="u1")]
+    client = type("Client", (), {"table": lambda self, name: calls.append(("table", (name,))) or _FakeQuery(rows, calls)})()
+    assert queue_policy.fetch_active_tasks(client) == rows
+    assert ("table", ("videos",)) in calls
+    select = next(args for name, args in calls if name == "select")
+    assert "user_id" in select[0]
+    assert ("in_", ("status", ["queued", "processing"])) in calls
+
+
+def test_fetch_active_tasks_pages_past_one_page():
+    calls = []
+    rows = [_task(f"t{i:04d}", 600, 60, source="manual", user_id="busy") for i in range(1200)]
+    rows.append(_task("newest", 600, 60, source="manual", user_id="quiet"))
+
+    def table(self, name):
+        # 每次查询新建一个 query，只看本次的 range 参数
+        calls.clear()
+        return _FakeQuery(rows, calls)
+
+    client = type("Client", (), {"table": table})()
+    tasks = queue_policy.fetch_active_tasks(client, page_size=500)
+    assert len(tasks) == 1201 and tasks[-1]["id"] == "newest"
+    # 超出第一页的任务同样参与公平排序：另一个用户的任务与积压用户轮流执行，不排在 1200 个任务之后
+    positions = queue_policy.queue_positions(tasks, NOW)
+    assert positions["newest"]["queue_position"] == 2
+
+
+def test_select_next_sees_tasks_beyond_first_page():
+    calls = []
+    # 积压用户已有任务在跑，排在第二页之后的另一个用户的任务应当先执行
+    rows = [_task("running", 600, 120, source="manual", status="processing", user_id="busy")]
+    rows += [_task(f"t{i:04d}", 600, 60, source="manual", user_id="busy") for i in range(1200)]
+    rows.append(_task("newest", 600, 60, source="manual", user_id="quiet"))
+
+    def table(self, name):
+        calls.clear()
+        return _FakeQuery(rows, calls)
+
+    client = type("Client", (), {"table": table})()
+    assert queue_policy.select_next(client, NOW) == "newest"
+    assert queue_policy.select_next(type("Client", (), {"table": lambda self, name: _FakeQuery([], [])})()) is None
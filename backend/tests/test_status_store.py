@@ -0,0 +1,84 @@
+import sys
+import os
+import json
+import threading
+import pytest
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import status_store
+
+
+@pytest.fixture(autouse=True)
+def _isolated_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(status_store, "STATUS_DB_PATH", str(tmp_path / "status.db"))
+
+
+def test_save_and_read_with_transition_history():
+    status_store.save_status("t1", "queued", 0)
+    status_store.save_status("t1", "downloading", 20, eta=30)
+    status_store.save_status("t1", "downloading", 35, eta=20)
+    status_store.save_status("t1", "llm_processing", 80)
+
+    current = status_store.get_status("t1")
+    assert (current["status"], current["progress"], current["version"]) == ("llm_processing", 80, 4)
+    assert status_store.public_fields(current) == {"status": "llm_processing", "progress": 80, "eta": None}
+    # 同一阶段内的进度更新不重复记入历史
+    assert [h["status"] for h in status_store.get_history("t1")] == ["queued", "downloading", "llm_processing"]
+
+    # 失败后重新入队：历史从头开始，附加字段随状态写入
+    status_store.save_status("t1", "failed", 100)
+    status_store.save_status("t1", "queued", 0, retry_count=1)
+    assert [h["status"] for h in status_store.get_history("t1")] == ["queued"]
+    assert status_store.get_status("t1")["retry_count"] == 1
+    assert status_store.get_status("missing") is None
+
+
+def test_bulk_queries():
+    status_store.save_status("a", "queued", 0)
+    status_store.save_status("b", "processing", 5)
+    status_store.save_status("c", "completed", 100)
+    status_store.save_status("d", "transcribing_local", 40)
+
+    assert set(status_store.get_statuses(["a", "c", "zzz"])) == {"a", "c"}
+    assert [tid for tid, _ in status_store.list_statuses(["queued", "processing"])] == ["a", "b"]
+    assert {tid for tid, _ in status_store.list_active(recent_seconds=3600)} == {"a", "b", "c", "d"}
+    # 处于处理阶段的任务与 queued / processing 一样不受时间窗口限制
+    assert {tid for tid, _ in status_store.list_active(recent_seconds=-1)} == {"a", "b", "d"}
+    assert [tid for tid, _ in status_store.list_in_flight()] == ["a", "b", "d"]
+    assert status_store.is_active("llm_processing") and not status_store.is_active("failed")
+
+    assert status_store.delete_status(["c"]) == 1
+    assert status_store.get_history("c") == []
+    assert status_store.delete_status() == 3
+
+
+def test_concurrent_writers_never_tear():
+    def write(n):
+        for i in range(20):
+            status_store.save_status("shared", f"stage{n}", i)
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    current = status_store.get_status("shared")
+    assert current["version"] == 80
+    assert current["progress"] == 19
+
+
+def test_import_legacy_files(tmp_path):
+    results = tmp_path / "results"
+    results.mkdir()
+    (results / "old_status.json").write_text(json.dumps({"status": "queued", "progress": 0, "url": "u"}))
+    (results / "old.json").write_text("{}")
+    status_store.save_status("kept", "processing", 40)
+    (results / "kept_status.json").write_text(json.dumps({"status": "queued", "progress": 0}))
+
+    assert status_store.import_legacy_files(str(results)) == 1
+    assert status_store.get_status("old")["url"] == "u"
+    assert status_store.get_status("kept")["status"] == "processing"
+    assert sorted(os.listdir(results)) == ["old.json"]
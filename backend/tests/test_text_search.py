@@ -0,0 +1,93 @@
+import sys
+import os
+import re
+import json
+import string
+import unicodedata
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import text_search
+from text_search import tokenize, matches
+
+
+def test_tokenize_cjk_bigrams_and_words():
+    assert tokenize("机器学习 AI_model，Python3") == ["机器", "器学", "学习", "ai", "model", "python3"]
+    assert tokenize("猫") == ["猫"]
+    assert tokenize("") == []
+
+
+def test_matches_requires_all_tokens():
+    assert matches("机器学习", "这是一节机器学习入门课")
+    assert not matches("学习机器", "这是一节机器学习入门课")
+    assert matches("python AI", "AI with Python")
+    assert matches("猫", "小猫咪")
+    assert matches("", "anything")
+
+
+def _load_cases():
+    with open(os.path.join(backend_dir, "tests", "data", "tokenize_cases.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _migration_cjk_ranges():
+    """009 迁移中 cjk_bigram_text() 正则的 CJK 字符范围（\\uXXXX 已解码）"""
+    path = os.path.join(backend_dir, "supabase", "migrations", "009_explore_search.sql")
+    with open(path, encoding="utf-8") as f:
+        sql = f.read()
+    ranges = re.search(r"regexp_matches\(lower\(p_text\),\s*'\[([^\]]+)\]\+\|", sql).group(1)
+    return ranges.encode("ascii").decode("unicode_escape")
+
+
+def _sql_tokens(text):
+    """
+    按 009 迁移中的正则用 Python 模拟 cjk_bigram_text()：CJK 范围从迁移文件读取，
+    [:punct:] 取 ASCII 标点加 Unicode 标点类（P*），即与数据库 locale 无关的部分。
+    这只是模拟，并未在 Postgres 上执行真实的 SQL 函数
+    """
+    cjk = re.compile(f"[{_migration_cjk_ranges()}]")
+
+    def kind(ch):
+        if cjk.match(ch):
+            return "cjk"
+        if ch.isspace() or ch in string.punctuation or unicodedata.category(ch).startswith("P"):
+            return None
+        return "word"
+
+    runs, current, current_kind = [], "", None
+    for ch in text.lower():
+        k = kind(ch)
+        if k != current_kind and current:
+            runs.append(current)
+            current = ""
+        current_kind = k
+        if k:
+            current += ch
+    if current:
+        runs.append(current)
+    tokens = []
+    for run in runs:
+        if cjk.match(run) and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def test_tokenize_matches_shared_cases():
+    cases = _load_cases()
+    for case in cases["cases"] + cases["known_differences"]:
+        assert tokenize(case["text"]) == case["tokens"], case["text"]
+
+
+def test_sql_regex_emulation_agrees_on_shared_cases():
+    # 校验的是迁移正则的 Python 模拟 + 迁移文件中的 CJK 范围，不是数据库里的 cjk_bigram_text()
+    cases = _load_cases()
+    for case in cases["cases"]:
+        assert _sql_tokens(case["text"]) == case["tokens"], case["text"]
+    # 已知差异确实不同（否则应移入 cases）
+    for case in cases["known_differences"]:
+        assert _sql_tokens(case["text"]) != case["tokens"], case["text"]
+    assert _migration_cjk_ranges() == text_search.CJK_CHARS
@@ -0,0 +1,70 @@
+import sys
+import os
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import thumbnails
+
+
+def _fake_ffmpeg(calls, fail=()):
+    def run(cmd, **kwargs):
+        calls.append(cmd)
+        width = cmd[cmd.index("-vf") + 1]
+        ok = not any(f"min({w}," in width for w in fail)
+        with open(cmd[-1], "wb") as f:
+            f.write(b"webp" if ok else b"")
+        return type("Result", (), {"returncode": 0 if ok else 1, "stderr": ""})()
+    return run
+
+
+def _setup(tmp_path, monkeypatch, calls, fail=()):
+    monkeypatch.setattr(thumbnails, "DOWNLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr(thumbnails, "_digests", {})
+    monkeypatch.setattr(thumbnails.subprocess, "run", _fake_ffmpeg(calls, fail))
+
+
+def test_variants_are_content_addressed_and_generated_once(tmp_path, monkeypatch):
+    calls = []
+    _setup(tmp_path, monkeypatch, calls)
+    (tmp_path / "a.jpg").write_bytes(b"same image")
+    (tmp_path / "b.jpg").write_bytes(b"same image")
+
+    assert thumbnails.variants("a.jpg") == {}
+    created = thumbnails.generate("a.jpg")
+    digest = thumbnails.content_digest(str(tmp_path / "a.jpg"))
+    assert created == {"card": f"thumbs/{digest}_card.webp", "full": f"thumbs/{digest}_full.webp"}
+    assert len(calls) == 2
+    assert any("min(480,iw)" in arg for arg in calls[0])
+
+    # 内容相同的缩略图共用同一份版本，不再转换
+    assert thumbnails.generate("b.jpg") == created
+    assert thumbnails.variants("b.jpg") == created
+    assert len(calls) == 2
+
+    # 内容变化后换名，旧版本不会被误用
+    (tmp_path / "a.jpg").write_bytes(b"a different image")
+    assert thumbnails.variants("a.jpg") == {}
+
+
+def test_failed_variant_is_skipped(tmp_path, monkeypatch):
+    calls = []
+    _setup(tmp_path, monkeypatch, calls, fail=(1280,))
+    (tmp_path / "c.jpg").write_bytes(b"image")
+
+    assert list(thumbnails.generate("c.jpg")) == ["card"]
+    assert sorted(os.listdir(tmp_path / "thumbs")) == [thumbnails.variant_name(
+        thumbnails.content_digest(str(tmp_path / "c.jpg")), "card")]
+
+
+def test_remote_and_placeholder_thumbnails(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch, [])
+    assert thumbnails.variants("https://i.ytimg.com/vi/abcdefghijk/maxresdefault.jpg") == {
+        "card": "https://i.ytimg.com/vi/abcdefghijk/mqdefault.jpg",
+        "full": "https://i.ytimg.com/vi/abcdefghijk/maxresdefault.jpg",
+    }
+    assert thumbnails.variants("https://example.com/x.jpg") == {}
+    assert thumbnails.variants("#336699") == {}
+    assert thumbnails.variants("missing.jpg") == {}
+    assert thumbnails.generate("https://i.ytimg.com/vi/abcdefghijk/hqdefault.jpg") == {}
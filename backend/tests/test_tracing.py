@@ -0,0 +1,86 @@
+import sys
+import os
+import subprocess
+import threading
+import pytest
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import tracing
+
+
+@pytest.fixture(autouse=True)
+def _isolated_traces(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path))
+    for name in (tracing.ENV_TRACE_ID, tracing.ENV_TASK_ID, tracing.ENV_PARENT_SPAN_ID):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_span_without_trace_writes_nothing(tmp_path):
+    with tracing.span("download") as s:
+        s.set(bytes=1)
+    assert os.listdir(tmp_path) == []
+    assert tracing.current() is None
+
+
+def test_nested_spans_and_threads_share_trace():
+    with tracing.span("scheduler.run_task", task_id="task-1"):
+        with tracing.span("download", attempt=1):
+            pass
+        # 线程池里拿不到 contextvar，挂在本进程最外层 span 下
+        t = threading.Thread(target=lambda: tracing.span("llm_chunk").__enter__().__exit__(None, None, None))
+        t.start()
+        t.join()
+
+    traces = tracing.read_trace("task-1")
+    assert len(traces) == 1
+    spans = {s["name"]: s for s in traces[0]["spans"]}
+    root = spans["scheduler.run_task"]
+    assert root["depth"] == 0 and root["parent_id"] is None
+    assert spans["download"]["parent_id"] == root["span_id"]
+    assert spans["download"]["attributes"] == {"attempt": 1}
+    assert spans["llm_chunk"]["parent_id"] == root["span_id"]
+    assert tracing.current() is None
+
+
+def test_error_span_and_clean_sys_exit():
+    with tracing.span("scheduler.run_task", task_id="task-2"):
+        with pytest.raises(SystemExit):
+            with tracing.span("worker"):
+                sys.exit(0)
+        with pytest.raises(ValueError):
+            with tracing.span("asr"):
+                raise ValueError("boom")
+
+    spans = {s["name"]: s for s in tracing.read_trace("task-2")[0]["spans"]}
+    assert spans["worker"]["status"] == "ok"
+    assert spans["asr"]["status"] == "error"
+    assert spans["asr"]["error"] == "ValueError: boom"
+
+
+def test_trace_propagates_to_child_process(tmp_path):
+    code = (
+        "import sys, tracing\n"
+        f"tracing.TRACE_DIR = {str(tmp_path)!r}\n"
+        "with tracing.span('process_task'):\n"
+        "    pass\n"
+    )
+    with tracing.span("scheduler.run_task", task_id="task-3") as root:
+        subprocess.run([sys.executable, "-c", code], check=True, cwd=backend_dir, env=tracing.child_env())
+
+    traces = tracing.read_trace("task-3")
+    assert len(traces) == 1
+    spans = {s["name"]: s for s in traces[0]["spans"]}
+    assert spans["process_task"]["parent_id"] == root.ctx["span_id"]
+    assert spans["process_task"]["pid"] != os.getpid()
+    assert spans["process_task"]["depth"] == 1
+
+
+def test_each_run_is_a_separate_trace():
+    for _ in range(2):
+        with tracing.span("scheduler.run_task", task_id="task-4"):
+            pass
+    assert len(tracing.read_trace("task-4")) == 2
+    assert tracing.read_trace("missing") == []
@@ -0,0 +1,227 @@
+import sys
+import os
+import time
+import asyncio
+import pytest
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import tracker
+import channel_schedule
+import status_store
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.payload = None
+        self.filters = []
+
+    def select(self, columns):
+        self.op = "select"
+        return self
+
+    def eq(self, col, value):
+        self.filters.append(lambda r: r.get(col) == value)
+        return self
+
+    def in_(self, col, values):
+        self.db.in_calls += 1
+        self.filters.append(lambda r: r.get(col) in values)
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, data):
+        self.op, self.payload = "update", data
+        return self
+
+    def upsert(self, rows):
+        self.op, self.payload = "upsert", rows
+        return self
+
+    def execute(self):
+        rows = self.db.tables.setdefault(self.table, [])
+        if self.op == "insert":
+            self.db.insert_calls += 1
+            rows.extend(self.payload)
+            return self
+        if self.op == "upsert":
+            self.db.upserts.append(self.payload)
+            return self
+        matched = [r for r in rows if all(f(r) for f in self.filters)]
+        if self.op == "update":
+            for r in matched:
+                r.update(self.payload)
+        self.data = matched
+        return self
+
+
+class FakeClient:
+    def __init__(self, tables):
+        self.tables = tables
+        self.in_calls = 0
+        self.insert_calls = 0
+        self.upserts = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+def _setup(monkeypatch, tmp_path, listings):
+    monkeypatch.setattr(status_store, "STATUS_DB_PATH", str(tmp_path / "status.db"))
+
+    async def fake_list(channel_id):
+        return listings[channel_id]
+
+    async def fake_meta(video_id):
+        return {"title": f"title {video_id}", "channel_id": "x", "channel_name": "x"}
+
+    monkeypatch.setattr(tracker, "get_latest_video_ids", fake_list)
+    monkeypatch.setattr(tracker, "get_video_metadata", fake_meta)
+
+
+def test_run_tracker_batches_and_reports(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path, {"@a": ["a1", "a2"], "@b": ["b1"]})
+    client = FakeClient({
+        "channel_settings": [
+            {"channel_id": "@a", "track_new_videos": True},
+            {"channel_id": "@b", "track_new_videos": True},
+        ],
+        "videos": [{"id": "a2", "status": "completed"}],
+    })
+
+    result = asyncio.run(tracker.run_tracker(client))
+
+    assert result["status"] == "success"
+    assert result["new"] == 2
+    assert sorted(result["queued_ids"]) == ["a1", "b1"]
+    assert result["channels_checked"] == 2
+    assert client.in_calls == 1
+    assert client.insert_calls == 1
+    assert status_store.get_status("a1")["status"] == "queued"
+    # 两个频道的状态一次写回，且都推进了指纹
+    assert len(client.upserts) == 1
+    fps = {u["channel_id"]: u["last_fingerprint"] for u in client.upserts[0]}
+    assert fps["@a"] == channel_schedule.fingerprint(["a1", "a2"])
+
+
+def test_quota_defers_and_keeps_channel_unsettled(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path, {"@a": ["a1", "a2", "a3"]})
+    client = FakeClient({
+        "channel_settings": [{"channel_id": "@a", "track_new_videos": True}],
+        "videos": [{"id": "f1", "status": "failed", "report_data": {}}],
+    })
+
+    result = asyncio.run(tracker.run_tracker(client, max_new=2))
+
+    assert result["retried"] == 1
+    assert result["new"] == 1
+    assert result["deferred"] == 2
+    # 有视频顺延，频道指纹不推进，下一轮会重新发现
+    assert client.upserts[0][0]["last_fingerprint"] is None
+
+
+def test_timeout_mid_run_still_reports_queued(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path, {"@a": ["a1"]})
+    client = FakeClient({
+        "channel_settings": [{"channel_id": "@a", "track_new_videos": True}],
+        "videos": [{"id": "f1", "status": "failed", "report_data": {}}],
+    })
+    # 入队之后的写回频道状态卡住，外层超时在插入完成后触发
+    monkeypatch.setattr(tracker, "save_channel_states", lambda client, updates: time.sleep(0.5))
+    charged = []
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(tracker.run_tracker(client, max_new=5, on_queued=charged.append), timeout=0.2)
+
+    asyncio.run(run())
+
+    assert client.insert_calls == 1
+    # 重试 1 个 + 新视频 1 个，超时也都回报给调用方记配额
+    assert charged == [1, 1]
+
+
+def test_unchanged_channel_skips_db_checks(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path, {"@a": ["a1"]})
+    client = FakeClient({
+        "channel_settings": [{
+            "channel_id": "@a", "track_new_videos": True,
+            "last_fingerprint": channel_schedule.fingerprint(["a1"]),
+        }],
+        "videos": [],
+    })
+
+    result = asyncio.run(tracker.run_tracker(client))
+
+    assert result["new"] == 0
+    assert client.insert_calls == 0
+
+
+def test_failed_listing_does_not_back_off(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path, {"@a": [], "@b": ["b1"]})
+    fp = channel_schedule.fingerprint(["b1"])
+    client = FakeClient({
+        "channel_settings": [
+            {"channel_id": "@a", "track_new_videos": True, "last_fingerprint": "old",
+             "check_interval_minutes": 120},
+            {"channel_id": "@b", "track_new_videos": True, "last_fingerprint": fp,
+             "check_interval_minutes": 120},
+        ],
+        "videos": [],
+    })
+
+    asyncio.run(tracker.run_tracker(client))
+
+    states = {u["channel_id"]: u for u in client.upserts[0]}
+    # 列表获取失败（空）保持间隔；列表未变化才退避
+    assert states["@a"]["check_interval_minutes"] == 120
+    assert states["@a"]["last_fingerprint"] == "old"
+    assert states["@b"]["check_interval_minutes"] == 240
+
+
+def test_run_cmd_reaps_process_on_timeout(monkeypatch):
+    monkeypatch.setattr(tracker, "YTDLP_TIMEOUT_SECONDS", 0.2)
+    procs = []
+    real_exec = asyncio.create_subprocess_exec
+
+    async def capture_exec(*args, **kwargs):
+        procs.append(await real_exec(*args, **kwargs))
+        return procs[-1]
+
+    monkeypatch.setattr(tracker.asyncio, "create_subprocess_exec", capture_exec)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(tracker._run_cmd([sys.executable, "-c", "import time; time.sleep(10)"]))
+    # 已被 kill 并回收，不残留僵尸进程
+    assert procs[0].returncode is not None
+
+
+def test_metadata_retry_timeout_does_not_abort_batch(monkeypatch):
+    monkeypatch.setattr(tracker, "_resolve_cookies_path", lambda: "/tmp/cookies.txt")
+    monkeypatch.setattr(tracker.metadata_cache, "get_video_info", lambda video_id: None)
+    monkeypatch.setattr(tracker.metadata_cache, "put_video_info", lambda video_id, data: None)
+    calls = []
+
+    async def fake_run(cmd):
+        url = next(c for c in cmd if c.startswith("https://"))
+        calls.append(("--cookies" in cmd, url))
+        if url.endswith("slow"):
+            # 带 cookies 失败，去掉 cookies 重试时超时
+            if "--cookies" in cmd:
+                return 1, "", "cookie error"
+            raise asyncio.TimeoutError()
+        return 0, '{"title": "ok", "channel_id": "c"}', ""
+
+    monkeypatch.setattr(tracker, "_run_cmd", fake_run)
+    results = asyncio.run(tracker._gather_limited(tracker.get_video_metadata, ["slow", "fine"], 2))
+
+    assert results[0] is None
+    assert results[1]["title"] == "ok"
+    assert (False, "https://www.youtube.com/watch?v=slow") in calls
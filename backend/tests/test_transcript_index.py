@@ -0,0 +1,104 @@
+import sys
+import os
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import transcript_index
+
+RESULT = {
+    "title": "机器学习入门",
+    "summary": "[00:10] 讲解 Python 基础\n[01:00] 小猫",
+    "paragraphs": [{"sentences": [
+        {"start": 1.0, "end": 2.0, "text": "今天我们讲机器学习"},
+        {"start": 3.0, "end": 4.5, "text": "Python is great"},
+    ]}],
+}
+
+
+def test_search_returns_sentence_hits_with_highlight(tmp_path):
+    db = str(tmp_path / "idx.db")
+    transcript_index.index_result("vid_a", RESULT, path=db)
+
+    items = transcript_index.search("机器学习", path=db)
+    assert [i["video_id"] for i in items] == ["vid_a"]
+    sentence = [h for h in items[0]["hits"] if h["kind"] == "sentence"][0]
+    assert sentence["start"] == 1.0
+    assert sentence["snippet"] == "今天我们讲<mark>机器学习</mark>"
+
+    assert transcript_index.search("学习机器", path=db) == []
+    assert transcript_index.search("猫", path=db)[0]["hits"][0]["kind"] == "summary"
+
+
+def test_private_videos_only_visible_to_owner(tmp_path):
+    db = str(tmp_path / "idx.db")
+    transcript_index.index_result("vid_p", dict(RESULT, user_id="u1"), is_public=False, path=db)
+
+    assert transcript_index.search("python", path=db) == []
+    assert transcript_index.search("python", user_id="u1", path=db)[0]["video_id"] == "vid_p"
+
+
+def test_reindex_replaces_segments(tmp_path):
+    db = str(tmp_path / "idx.db")
+    transcript_index.index_result("vid_a", RESULT, path=db)
+    transcript_index.index_result("vid_a", {"title": "新标题", "paragraphs": []}, path=db)
+    assert transcript_index.search("机器", path=db) == []
+
+
+def _write_results(directory, **results):
+    import json
+    directory.mkdir()
+    for task_id, result in results.items():
+        (directory / f"{task_id}.json").write_text(json.dumps(result, ensure_ascii=False), encoding="utf-8")
+    return str(directory)
+
+
+def test_backfill_uses_database_visibility(tmp_path):
+    db = str(tmp_path / "idx.db")
+    results = _write_results(
+        tmp_path / "results",
+        vid_pub=dict(RESULT, user_id="u1"),
+        vid_priv=dict(RESULT, user_id="u2"),
+    )
+    lookup = lambda ids: {"vid_pub": {"is_public": True, "user_id": "u1"},
+                          "vid_priv": {"is_public": False, "user_id": "u2"}}
+    assert transcript_index.backfill_from_results(results, path=db, lookup=lookup)[0] == 2
+
+    assert [i["video_id"] for i in transcript_index.search("python", path=db)] == ["vid_pub"]
+    assert {i["video_id"] for i in transcript_index.search("python", user_id="u2", path=db)} == {"vid_pub", "vid_priv"}
+
+
+def test_backfill_without_lookup_keeps_owned_videos_private(tmp_path):
+    db = str(tmp_path / "idx.db")
+    results = _write_results(
+        tmp_path / "results",
+        vid_owned=dict(RESULT, user_id="u1"),
+        vid_tracker=dict(RESULT),
+    )
+
+    def failing_lookup(ids):
+        raise RuntimeError("db down")
+
+    transcript_index.backfill_from_results(results, path=db, lookup=failing_lookup)
+    assert [i["video_id"] for i in transcript_index.search("python", path=db)] == ["vid_tracker"]
+    assert {i["video_id"] for i in transcript_index.search("python", user_id="u1", path=db)} == {"vid_owned", "vid_tracker"}
+
+
+def test_hidden_videos_and_channels_excluded(tmp_path):
+    db = str(tmp_path / "idx.db")
+    transcript_index.index_result("vid_a", dict(RESULT, channel_id="c1"), path=db)
+    transcript_index.index_result("vid_b", dict(RESULT, channel_id="c2"), path=db)
+    assert len(transcript_index.search("python", path=db)) == 2
+
+    assert transcript_index.set_visibility("vid_a", hidden=True, path=db)
+    transcript_index.set_channel_hidden("c2", True, path=db)
+    assert transcript_index.search("python", path=db) == []
+
+    transcript_index.set_visibility("vid_a", hidden=False, path=db)
+    transcript_index.set_channel_hidden("c2", False, path=db)
+    assert len(transcript_index.search("python", path=db)) == 2
+    # 转为私有后他人检索不到
+    transcript_index.set_visibility("vid_b", is_public=False, path=db)
+    assert [i["video_id"] for i in transcript_index.search("python", path=db)] == ["vid_a"]
+    assert not transcript_index.set_visibility("missing", hidden=True, path=db)
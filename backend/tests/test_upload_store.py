@@ -0,0 +1,184 @@
+import sys
+import os
+import asyncio
+import hashlib
+import pytest
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+import upload_store
+
+
+class FakeUpload:
+    """按块返回数据的 UploadFile 替身，记录每次 read 的大小"""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.reads = []
+
+    async def read(self, n=-1):
+        self.reads.append(n)
+        chunk = self.data[self.pos:self.pos + n]
+        self.pos += len(chunk)
+        return chunk
+
+
+def _store(data, directory, max_bytes=None, ext=".mp3"):
+    tmp, hasher = asyncio.run(upload_store.stream_to_temp(FakeUpload(data).read, str(directory), max_bytes))
+    return upload_store.commit(tmp, hasher, ext, str(directory)), hasher
+
+
+def test_streams_in_chunks_and_names_by_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_store, "CHUNK_BYTES", 4)
+    data = b"0123456789abcdef!"
+    fake = FakeUpload(data)
+    tmp, hasher = asyncio.run(upload_store.stream_to_temp(fake.read, str(tmp_path)))
+    assert all(n == 4 for n in fake.reads)
+    assert hasher.size == len(data)
+
+    task_id, path, reused = upload_store.commit(tmp, hasher, ".m4a", str(tmp_path))
+    assert task_id == "up_" + hashlib.sha256(data).hexdigest()[:16]
+    assert path == os.path.join(str(tmp_path), f"{task_id}.m4a")
+    assert not reused
+    with open(path, "rb") as f:
+        assert f.read() == data
+    # 临时文件已原子替换掉
+    assert [n for n in os.listdir(tmp_path) if n.startswith(".upload-")] == []
+
+
+def test_duplicate_content_reuses_existing_file(tmp_path):
+    (first_id, first_path, _), _ = _store(b"same audio", tmp_path)
+    (second_id, second_path, reused), _ = _store(b"same audio", tmp_path, ext=".mp4")
+    assert (second_id, second_path, reused) == (first_id, first_path, True)
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_legacy_md5_id_is_recognised(tmp_path):
+    data = b"uploaded before the sha256 ids"
+    legacy_id = "up_" + hashlib.md5(data).hexdigest()[:8]
+    (tmp_path / f"{legacy_id}.mp3").write_bytes(data)
+    (task_id, _, reused), _ = _store(data, tmp_path)
+    assert task_id == legacy_id and reused
+
+
+def test_size_cap_removes_partial_file(tmp_path):
+    with pytest.raises(upload_store.UploadTooLarge):
+        _store(b"x" * 100, tmp_path, max_bytes=10)
+    assert os.listdir(tmp_path) == []
+
+
+def _multipart_body(boundary, file_data, **fields):
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"talk.m4a\"\r\n"
+            f"Content-Type: audio/mp4\r\n\r\n").encode() + file_data + b"\r\n"
+    for name, value in fields.items():
+        body += f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode()
+    return body + f"--{boundary}--\r\n".encode()
+
+
+async def _chunks(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def _parse(body, directory, max_bytes=None, boundary="xyz"):
+    return asyncio.run(upload_store.stream_multipart(
+        f"multipart/form-data; boundary={boundary}", _chunks(body, 7), str(directory), max_bytes=max_bytes))
+
+
+def test_stream_multipart_writes_file_once_and_collects_fields(tmp_path):
+    pytest.importorskip("python_multipart")
+    data = b"\x00\r\n--xy audio bytes " * 20
+    body = _multipart_body("xyz", data, mode="cloud", user_id="u1", is_public="false")
+    fields, filename, tmp, hasher = _parse(body, tmp_path)
+    assert fields == {"mode": "cloud", "user_id": "u1", "is_public": "false"}
+    assert filename == "talk.m4a"
+    assert hasher.size == len(data) and hasher.task_id == "up_" + hashlib.sha256(data).hexdigest()[:16]
+    with open(tmp, "rb") as f:
+        assert f.read() == data
+
+
+def test_stream_multipart_enforces_cap_without_content_length(tmp_path):
+    pytest.importorskip("python_multipart")
+    with pytest.raises(upload_store.UploadTooLarge):
+        _parse(_multipart_body("xyz", b"x" * 100), tmp_path, max_bytes=10)
+    with pytest.raises(upload_store.UploadFormError):
+        asyncio.run(upload_store.stream_multipart("application/json", _chunks(b"{}", 7), str(tmp_path)))
+    assert os.listdir(tmp_path) == []
+
+
+def test_safe_extension():
+    assert upload_store.safe_extension("talk.MP4") == ".mp4"
+    assert upload_store.safe_extension("noext") == ".mp3"
+    assert upload_store.safe_extension("evil.m4a/../../x") == ".mp3"
+
+
+async def _chunks(data, size=3):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def _put(meta, index, data, directory, digest=None):
+    digest = digest or hashlib.sha256(data).hexdigest()
+    return asyncio.run(upload_store.write_part(meta, index, _chunks(data), digest, str(directory)))
+
+
+def test_resumable_session_assembles_and_dedups(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_store, "MIN_PART_BYTES", 1)
+    data = b"sermon recording bytes " * 3
+    meta = upload_store.create_session(str(tmp_path), "talk.m4a", len(data), part_size=10, user_id="u1")
+    assert meta["total_parts"] == 7
+    parts = [data[i:i + 10] for i in range(0, len(data), 10)]
+
+    # 乱序上传并重复其中一片；中途查询续传状态
+    for i in (3, 0, 6, 3):
+        _put(meta, i, parts[i], tmp_path)
+    status = upload_store.session_status(upload_store.load_session(meta["upload_id"], str(tmp_path)), str(tmp_path))
+    assert status["received_parts"] == [0, 3, 6]
+    assert status["missing_parts"] == [1, 2, 4, 5]
+    with pytest.raises(upload_store.UploadSessionError) as e:
+        upload_store.assemble(meta, str(tmp_path))
+    assert e.value.status_code == 409
+
+    for i in (1, 2, 4, 5):
+        _put(meta, i, parts[i], tmp_path)
+    task_id, path, reused = upload_store.assemble(meta, str(tmp_path))
+    assert task_id == "up_" + hashlib.sha256(data).hexdigest()[:16]
+    assert path.endswith(".m4a") and not reused
+    with open(path, "rb") as f:
+        assert f.read() == data
+    # 会话目录已删除
+    assert os.listdir(tmp_path / upload_store.SESSIONS_DIR_NAME) == []
+
+    # 同内容经普通 /upload 落盘时复用同一文件
+    (same_id, same_path, reused), _ = _store(data, tmp_path, ext=".m4a")
+    assert (same_id, same_path, reused) == (task_id, path, True)
+
+
+def test_part_validation(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_store, "MIN_PART_BYTES", 1)
+    meta = upload_store.create_session(str(tmp_path), "a.mp3", 15, part_size=10)
+    with pytest.raises(upload_store.UploadSessionError) as e:
+        _put(meta, 0, b"x" * 10, tmp_path, digest="0" * 64)
+    assert e.value.status_code == 422
+    with pytest.raises(upload_store.UploadSessionError):
+        _put(meta, 1, b"x" * 10, tmp_path)  # 最后一片应为 5 字节
+    with pytest.raises(upload_store.UploadSessionError):
+        _put(meta, 2, b"x", tmp_path)
+    assert upload_store.received_parts(meta, str(tmp_path)) == []
+    with pytest.raises(upload_store.UploadSessionError) as e:
+        upload_store.load_session("../../etc", str(tmp_path))
+    assert e.value.status_code == 404
+
+
+def test_session_limits_and_sweep(tmp_path):
+    with pytest.raises(upload_store.UploadSessionError) as e:
+        upload_store.create_session(str(tmp_path), "big.mp4", upload_store.MAX_UPLOAD_BYTES + 1)
+    assert e.value.status_code == 413
+    meta = upload_store.create_session(str(tmp_path), "a.mp3", 100)
+    assert meta["part_size"] == upload_store.DEFAULT_PART_BYTES
+    assert upload_store.sweep_sessions(str(tmp_path), ttl=-1) == 1
+    with pytest.raises(upload_store.UploadSessionError):
+        upload_store.load_session(meta["upload_id"], str(tmp_path))
@@ -0,0 +1,55 @@
+import sys
+import os
+
+# Add backend to path
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(backend_dir)
+
+from view_counter import ViewCountBuffer
+
+
+class FakeRPC:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        return self
+
+    def execute(self):
+        if self.fail:
+            raise Exception("rpc down")
+        return self
+
+
+def test_flush_aggregates_per_video():
+    buf = ViewCountBuffer()
+    for _ in range(3):
+        buf.add("vid_a")
+    buf.add("vid_b")
+
+    client = FakeRPC()
+    assert buf.flush(client) == 2
+    name, params = client.calls[0]
+    assert name == "increment_view_counts"
+    assert dict(zip(params["p_ids"], params["p_counts"])) == {"vid_a": 3, "vid_b": 1}
+    assert buf.pending("vid_a") == 0
+
+
+def test_failed_flush_keeps_increments():
+    buf = ViewCountBuffer()
+    buf.add("vid_a", 2)
+    assert buf.flush(FakeRPC(fail=True)) == 0
+    buf.add("vid_a")
+    assert buf.pending("vid_a") == 3
+
+
+def test_flush_without_client_keeps_increments():
+    buf = ViewCountBuffer()
+    buf.add("vid_a", 2)
+    assert buf.flush(None) == 0
+    assert buf.pending("vid_a") == 2
+    client = FakeRPC()
+    assert buf.flush(client) == 1
+    assert client.calls[0][1]["p_counts"] == [2]
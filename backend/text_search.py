@@ -0,0 +1,90 @@
+"""
+全文检索的切分工具
+中日韩连续字符切成重叠二元组（单字保留），其余按词切分并小写。
+CJK 范围与 migrations/009_explore_search.sql 中的 cjk_bigram_text() 相同，字母、数字、空白与标点的切分按相同规则
+（共用用例见 tests/data/tokenize_cases.json；测试对照的是迁移正则的 Python 模拟，未在 Postgres 上执行）。并不完全等价：SQL 用 [:space:][:punct:] 判断分隔符，
+Unicode 符号（×、emoji 等）是否算作 [:punct:] 随数据库 locale 而定，组合附加符号也不算；
+这里只保留字母与数字，其余一律作为分隔符。
+"""
+import re
+
+CJK_CHARS = "\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af"
+_CJK_RUN_RE = re.compile(f"^[{CJK_CHARS}]")
+_TOKEN_RE = re.compile(f"[{CJK_CHARS}]+|(?:(?![{CJK_CHARS}])[^\\W_])+")
+
+
+def tokenize(text):
+    """将文本切分为检索词元列表（保留重复，顺序与原文一致）"""
+    tokens = []
+    for run in _TOKEN_RE.findall((text or "").lower()):
+        if _CJK_RUN_RE.match(run) and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def is_cjk(run):
+    return bool(_CJK_RUN_RE.match(run or ""))
+
+
+def matches(query, text):
+    """text 是否包含 query 的全部词元（单字查询退回子串匹配）"""
+    query = (query or "").strip().lower()
+    if not query:
+        return True
+    if len(query) == 1:
+        return query in (text or "").lower()
+    doc_tokens = set(tokenize(text))
+    return all(t in doc_tokens for t in tokenize(query))
+
+
+def query_runs(query):
+    """将查询切分为连续片段：CJK 连续字符为一段，其余按词一段（均已小写）"""
+    return _TOKEN_RE.findall((query or "").lower())
+
+
+def highlight_spans(text, query):
+    """返回 text 中命中 query 各片段的 [start, end) 区间（已合并重叠）"""
+    text = text or ""
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        lowered = text
+    spans = []
+    for run in query_runs(query):
+        pos = lowered.find(run)
+        while pos != -1:
+            spans.append((pos, pos + len(run)))
+            pos = lowered.find(run, pos + len(run))
+    spans.sort()
+    merged = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def snippet(text, query, width=120, mark=("<mark>", "</mark>")):
+    """截取首个命中附近 width 字符并用 mark 包裹命中片段（其余内容做 HTML 转义）"""
+    import html
+    text = text or ""
+    spans = highlight_spans(text, query)
+    lo = 0
+    if spans and len(text) > width:
+        lo = max(0, min(spans[0][0] - width // 4, len(text) - width))
+    hi = min(len(text), lo + width)
+
+    out = ["…" if lo > 0 else ""]
+    cursor = lo
+    for start, end in spans:
+        if end <= lo or start >= hi:
+            continue
+        start, end = max(start, lo), min(end, hi)
+        out.append(html.escape(text[cursor:start]))
+        out.append(mark[0] + html.escape(text[start:end]) + mark[1])
+        cursor = end
+    out.append(html.escape(text[cursor:hi]))
+    out.append("…" if hi < len(text) else "")
+    return "".join(out)
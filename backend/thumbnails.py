@@ -0,0 +1,127 @@
+"""
+缩略图尺寸版本（卡片 / 大图 WebP）
+原始缩略图是 yt-dlp 写入的全尺寸 JPG（或远程 YouTube 地址），首页一页 24 张全尺寸图。
+每张本地缩略图按内容哈希生成一次 WebP 版本，存于 downloads/thumbs/{hash}_{variant}.webp：
+内容不变则文件名不变，可长期 immutable 缓存；同一图片被多个视频引用时只存一份。
+"""
+import os
+import re
+import hashlib
+import subprocess
+from downloader import _ffmpeg_binary
+from media_cache import DOWNLOADS_DIR
+from app_logger import get_logger
+logger = get_logger(__name__)
+
+THUMBS_SUBDIR = "thumbs"
+# 版本名 -> 最大宽度（不放大，高度按比例）
+VARIANTS = {"card": 480, "full": 1280}
+WEBP_QUALITY = 80
+# /media/thumbs/ 下的文件名含内容哈希，可永久缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DIGEST_LENGTH = 16
+_DIGEST_MEMO_LIMIT = 4096
+
+_YOUTUBE_THUMB = re.compile(r"^(https?://(?:i\d?\.ytimg\.com|img\.youtube\.com)/vi(?:_webp)?/[\w-]+/)(\w+)(\.\w+)$")
+
+# (路径, mtime_ns, 大小) -> 内容哈希；列表接口每次请求都要查，避免重复读文件
+_digests = {}
+
+
+def thumbs_dir():
+    return os.path.join(DOWNLOADS_DIR, THUMBS_SUBDIR)
+
+
+def local_source(thumbnail):
+    """本地缩略图文件名 -> 文件路径；远程地址、颜色占位符或文件不存在时返回 None"""
+    if not thumbnail or thumbnail.startswith(("http://", "https://", "#")):
+        return None
+    path = os.path.join(DOWNLOADS_DIR, os.path.basename(thumbnail))
+    return path if os.path.isfile(path) else None
+
+
+def content_digest(path):
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    digest = _digests.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        digest = h.hexdigest()[:DIGEST_LENGTH]
+        if len(_digests) >= _DIGEST_MEMO_LIMIT:
+            _digests.clear()
+        _digests[key] = digest
+    return digest
+
+
+def variant_name(digest, variant):
+    return f"{digest}_{variant}.webp"
+
+
+def resize_command(source_path, output_path, width):
+    return [
+        _ffmpeg_binary("ffmpeg"), "-y", "-v", "error", "-i", source_path,
+        "-vf", f"scale='min({width},iw)':-2", "-frames:v", "1",
+        "-c:v", "libwebp", "-quality", str(WEBP_QUALITY), output_path,
+    ]
+
+
+def generate(thumbnail):
+    """
+    为本地缩略图生成缺失的 WebP 版本（已存在的直接复用），
+    返回 {版本名: /media 下的相对路径}；无本地源文件或转换失败的版本不在结果中。
+    """
+    source = local_source(thumbnail)
+    if not source:
+        return {}
+    digest = content_digest(source)
+    os.makedirs(thumbs_dir(), exist_ok=True)
+    result = {}
+    for variant, width in VARIANTS.items():
+        name = variant_name(digest, variant)
+        output = os.path.join(thumbs_dir(), name)
+        if not os.path.exists(output):
+            tmp = os.path.join(thumbs_dir(), f"{digest}_{variant}.tmp.webp")
+            try:
+                proc = subprocess.run(resize_command(source, tmp, width), stdout=subprocess.DEVNULL,
+                                      stderr=subprocess.PIPE, text=True, timeout=60)
+                ok = proc.returncode == 0 and os.path.exists(tmp) and os.path.getsize(tmp) > 0
+                if not ok:
+                    logger.info(f"[Thumbnails] 生成 {variant} 失败 {source}: {(proc.stderr or '').strip()[-300:]}")
+            except (OSError, subprocess.TimeoutExpired) as e:
+                ok = False
+                logger.info(f"[Thumbnails] 生成 {variant} 失败 {source}: {e}")
+            if not ok:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                continue
+            os.replace(tmp, output)
+        result[variant] = f"{THUMBS_SUBDIR}/{name}"
+    return result
+
+
+def variants(thumbnail):
+    """
+    接口返回用的版本地址（不生成文件）：本地缩略图返回已生成的 WebP 相对路径，
+    YouTube 远程缩略图映射到官方的对应尺寸；都没有时返回 {}。
+    """
+    if not thumbnail or thumbnail.startswith("#"):
+        return {}
+    if thumbnail.startswith(("http://", "https://")):
+        match = _YOUTUBE_THUMB.match(thumbnail)
+        if not match:
+            return {}
+        prefix, _, ext = match.groups()
+        return {"card": f"{prefix}mqdefault{ext}", "full": thumbnail}
+    source = local_source(thumbnail)
+    if not source:
+        return {}
+    digest = content_digest(source)
+    result = {}
+    for variant in VARIANTS:
+        name = variant_name(digest, variant)
+        if os.path.exists(os.path.join(thumbs_dir(), name)):
+            result[variant] = f"{THUMBS_SUBDIR}/{name}"
+    return result
@@ -0,0 +1,195 @@
+"""
+任务级链路追踪
+一个任务依次经过 scheduler → process_task → worker 三个进程。scheduler 为每次执行生成 trace_id，
+通过环境变量（TLDW_TRACE_ID / TLDW_TASK_ID / TLDW_PARENT_SPAN_ID）传给子进程；
+各进程的 span（开始 / 结束 / 属性）以 JSON Lines 追加到 logs/traces/{task_id}.jsonl，
+管理端 /admin/traces/{task_id} 按 trace 汇总查看。没有活动 trace 时 span 不写任何内容。
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import hashlib
+import contextvars
+import app_logger
+from app_logger import get_logger
+logger = get_logger(__name__)
+
+TRACE_DIR = os.environ.get("TRACE_DIR", os.path.join(app_logger.LOG_DIR, "traces"))
+
+ENV_TRACE_ID = "TLDW_TRACE_ID"
+ENV_TASK_ID = "TLDW_TASK_ID"
+ENV_PARENT_SPAN_ID = "TLDW_PARENT_SPAN_ID"
+
+# 当前 span 上下文 {"trace_id", "task_id", "span_id"}
+_context = contextvars.ContextVar("trace_context", default=None)
+# 本进程最外层 span 的上下文：线程池里的 span（如并行 LLM chunk）拿不到 contextvar 时挂在它下面
+_process_context = None
+
+
+def _new_id():
+    return uuid.uuid4().hex[:16]
+
+
+def _env_context():
+    trace_id = os.environ.get(ENV_TRACE_ID)
+    if not trace_id:
+        return None
+    return {
+        "trace_id": trace_id,
+        "task_id": os.environ.get(ENV_TASK_ID),
+        "span_id": os.environ.get(ENV_PARENT_SPAN_ID),
+    }
+
+
+def current():
+    """当前生效的 trace 上下文；没有活动 trace 时返回 None"""
+    return _context.get() or _process_context or _env_context()
+
+
+def trace_path(task_id, trace_dir=None):
+    # task_id 可能来自外部输入，非常规字符时哈希后作文件名
+    name = task_id if re.fullmatch(r"[\w-]{1,128}", task_id or "") else hashlib.sha1(str(task_id).encode("utf-8")).hexdigest()
+    return os.path.join(trace_dir or TRACE_DIR, f"{name}.jsonl")
+
+
+def _write(record):
+    try:
+        path = trace_path(record["task_id"])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 单行追加（O_APPEND），多进程并发写不会交错
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    except Exception as e:
+        logger.info(f"[Tracing] 写入 span 失败 {record.get('name')}: {e}")
+
+
+class span:
+    """
+    记录一个 span：
+        with tracing.span("process_task") as s:
+            s.set(video_id=...)
+    传入 task_id 且与当前 trace 的任务不同（或尚无 trace）时开启新 trace（scheduler 取到任务时）。
+    """
+
+    def __init__(self, name, task_id=None, **attributes):
+        self.name = name
+        self.task_id = task_id
+        self.attributes = attributes
+        self.ctx = None
+        self.parent_id = None
+        self._token = None
+        self._is_process_root = False
+        self._started = None
+        self._perf = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def __enter__(self):
+        global _process_context
+        parent = current()
+        if self.task_id is not None and (parent is None or parent.get("task_id") != self.task_id):
+            parent = {"trace_id": uuid.uuid4().hex, "task_id": self.task_id, "span_id": None}
+        if parent is None:
+            return self
+
+        self.ctx = {"trace_id": parent["trace_id"], "task_id": parent["task_id"], "span_id": _new_id()}
+        self.parent_id = parent.get("span_id")
+        self._token = _context.set(self.ctx)
+        if _process_context is None:
+            _process_context = self.ctx
+            self._is_process_root = True
+        self._started = time.time()
+        self._perf = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _process_context
+        if self.ctx is None:
+            return False
+        duration = time.perf_counter() - self._perf
+        # worker / process_task 以 sys.exit(0) 正常结束
+        ok = exc_type is None or (issubclass(exc_type, SystemExit) and exc.code in (0, None))
+        record = {
+            "trace_id": self.ctx["trace_id"],
+            "task_id": self.ctx["task_id"],
+            "span_id": self.ctx["span_id"],
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "process": os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "python",
+            "pid": os.getpid(),
+            "start": round(self._started, 3),
+            "end": round(self._started + duration, 3),
+            "duration_seconds": round(duration, 3),
+            "status": "ok" if ok else "error",
+            "attributes": self.attributes,
+        }
+        if not ok:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        _write(record)
+
+        try:
+            _context.reset(self._token)
+        except ValueError:
+            # 在其他 context 中退出（极少见），直接清空
+            _context.set(None)
+        if self._is_process_root:
+            _process_context = None
+        return False
+
+
+def child_env(env=None):
+    """启动子进程用的环境变量：在当前环境上附加 trace 上下文，子进程的 span 挂在当前 span 下"""
+    env = dict(os.environ if env is None else env)
+    ctx = current()
+    if ctx:
+        env[ENV_TRACE_ID] = ctx["trace_id"]
+        env[ENV_TASK_ID] = ctx["task_id"] or ""
+        if ctx.get("span_id"):
+            env[ENV_PARENT_SPAN_ID] = ctx["span_id"]
+    return env
+
+
+def read_trace(task_id, trace_dir=None):
+    """
+    读取任务的全部 span，按 trace（每次执行一个）分组，组内按开始时间排序并标注层级 depth。
+    返回 [{"trace_id", "start", "end", "duration_seconds", "status", "spans": [...]}]，最近一次执行在前。
+    """
+    path = trace_path(task_id, trace_dir)
+    if not os.path.exists(path):
+        return []
+    traces = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 进程被杀时可能留下半行
+            traces.setdefault(record["trace_id"], []).append(record)
+
+    result = []
+    for trace_id, spans in traces.items():
+        spans.sort(key=lambda s: s["start"])
+        by_id = {s["span_id"]: s for s in spans}
+        for s in spans:
+            depth, parent = 0, by_id.get(s.get("parent_id"))
+            while parent is not None and depth < 32:
+                depth += 1
+                parent = by_id.get(parent.get("parent_id"))
+            s["depth"] = depth
+        start = min(s["start"] for s in spans)
+        end = max(s["end"] for s in spans)
+        result.append({
+            "trace_id": trace_id,
+            "start": start,
+            "end": end,
+            "duration_seconds": round(end - start, 3),
+            "status": "error" if any(s["status"] == "error" and s["depth"] == 0 for s in spans) else "ok",
+            "spans": spans,
+        })
+    result.sort(key=lambda t: t["start"], reverse=True)
+    return result
@@ -0,0 +1,444 @@
+"""
+频道追踪任务
+API 进程内由 main.run_channel_tracker 直接 await（共用 Supabase 客户端与事件循环），
+scripts/channel_tracker.py 为手动触发的命令行入口。yt-dlp 以异步子进程运行，并发受信号量限制；
+配额由调用方通过 max_new 传入，结果以字典返回。
+"""
+import os
+import sys
+import json
+import shutil
+import asyncio
+import metadata_cache
+import channel_schedule
+import status_store
+from app_logger import get_logger
+logger = get_logger(__name__)
+
+# 频道列表与元数据抓取的并发上限（均为 yt-dlp 子进程，受网络而非 CPU 限制）
+MAX_WORKERS = int(os.environ.get("TRACKER_MAX_WORKERS", 8))
+# 单次 yt-dlp 调用超时，避免个别频道卡住拖垮整轮
+YTDLP_TIMEOUT_SECONDS = int(os.environ.get("TRACKER_YTDLP_TIMEOUT", 60))
+# in_ 查询每批 ID 数，控制 PostgREST URL 长度
+ID_QUERY_BATCH = 200
+# 失败视频的最大自动重试次数
+MAX_RETRY_COUNT = 3
+
+
+def _resolve_ytdlp_cmd():
+    """解析 yt-dlp 调用命令，避免 systemd 环境 PATH 缺失导致找不到可执行文件。"""
+    venv_ytdlp = os.path.join(os.path.dirname(sys.executable), "yt-dlp")
+    if os.path.isfile(venv_ytdlp) and os.access(venv_ytdlp, os.X_OK):
+        return [venv_ytdlp]
+
+    ytdlp_in_path = shutil.which("yt-dlp")
+    if ytdlp_in_path:
+        return [ytdlp_in_path]
+
+    # 最后回退到 python -m yt_dlp，尽量不依赖 PATH。
+    return [sys.executable, "-m", "yt_dlp"]
+
+
+def _resolve_cookies_path():
+    """查找可用的 cookies 文件路径，不存在则返回 None。"""
+    cookies_path = os.environ.get("YOUTUBE_COOKIES_PATH")
+    if cookies_path and os.path.exists(cookies_path):
+        return cookies_path
+    if os.path.exists("youtube_cookies.txt"):
+        return "youtube_cookies.txt"
+    return None
+
+
+def _build_channel_videos_url(channel_handle):
+    """根据 @handle 或 UC... 频道 ID 构造正确的 videos 页 URL。"""
+    if channel_handle.startswith("UC"):
+        return f"https://www.youtube.com/channel/{channel_handle}/videos"
+    if not channel_handle.startswith("@"):
+        channel_handle = "@" + channel_handle
+    return f"https://www.youtube.com/{channel_handle}/videos"
+
+
+async def _run_cmd(cmd):
+    """异步运行子进程，返回 (returncode, stdout, stderr)；超时则杀掉进程并抛出 asyncio.TimeoutError"""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=YTDLP_TIMEOUT_SECONDS)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        # 超时或整轮被取消时不留下孤儿 / 僵尸进程：kill 后等待回收
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+        await proc.wait()
+        raise
+    return proc.returncode, stdout.decode("utf-8", "replace"), stderr.decode("utf-8", "replace")
+
+
+async def _run_ytdlp_get_ids(cmd, channel_handle, cookies_path):
+    """执行 yt-dlp 获取视频 ID 列表，带 cookies 失败时自动降级重试。"""
+    # 第一次尝试：带 cookies（如果有）
+    run_cmd = cmd[:]
+    if cookies_path:
+        run_cmd.extend(["--cookies", cookies_path])
+
+    returncode, stdout, stderr = await _run_cmd(run_cmd)
+    ids = [l.strip() for l in stdout.strip().split('\n') if l.strip()]
+    if ids:
+        return ids
+
+    # 带 cookies 失败且 cookies 存在时，去掉 cookies 重试
+    if cookies_path and returncode != 0:
+        logger.info(f"Cookies 请求失败 (rc={returncode})，去掉 cookies 重试 {channel_handle}...")
+        returncode, stdout, stderr = await _run_cmd(cmd)
+        ids = [l.strip() for l in stdout.strip().split('\n') if l.strip()]
+        if ids:
+            return ids
+
+    # 仍然没有结果
+    if returncode != 0 and not stdout.strip():
+        logger.info(f"No matching public videos found for {channel_handle} in top 5 items.")
+    elif returncode != 0:
+        logger.error(f"Error fetching latest video for {channel_handle}: {stderr or stdout}")
+
+    return []
+
+
+async def get_latest_video_ids(channel_handle):
+    """Use yt-dlp to get the latest 5 public, non-live video IDs from a channel handle."""
+    if not channel_handle:
+        return []
+
+    url = _build_channel_videos_url(channel_handle)
+
+    cmd = _resolve_ytdlp_cmd() + [
+        "--get-id",
+        "--playlist-items", "1:5",
+        "--match-filter", "!is_live & availability=public",
+        "--quiet",
+        url
+    ]
+
+    cookies_path = _resolve_cookies_path()
+
+    try:
+        return await _run_ytdlp_get_ids(cmd, channel_handle, cookies_path)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out listing {channel_handle} (>{YTDLP_TIMEOUT_SECONDS}s)")
+    except Exception as e:
+        logger.error(f"Unexpected error for {channel_handle}: {e}")
+
+    return []
+
+
+async def get_video_metadata(video_id):
+    """Fetch video metadata (title, thumbnail, channel info) using yt-dlp."""
+    if not video_id:
+        return None
+
+    # 与 process_task 共享元数据缓存：这里解析过的完整信息，处理任务时直接复用
+    data = metadata_cache.get_video_info(video_id)
+    if data:
+        return _summarize_metadata(data)
+
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    cmd = _resolve_ytdlp_cmd() + [
+        "--dump-json",
+        "--no-download",
+        "--no-playlist",
+        url
+    ]
+
+    cookies_path = _resolve_cookies_path()
+    attempts = [True, False] if cookies_path else [False]
+
+    data = None
+    for use_cookies in attempts:
+        run_cmd = cmd + (["--cookies", cookies_path] if use_cookies else [])
+        try:
+            returncode, stdout, stderr = await _run_cmd(run_cmd)
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out fetching metadata for {video_id} (>{YTDLP_TIMEOUT_SECONDS}s)")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error fetching metadata for {video_id}: {e}")
+            return None
+
+        if returncode == 0:
+            try:
+                data = json.loads(stdout)
+                break
+            except json.JSONDecodeError as e:
+                logger.error(f"Error parsing metadata JSON for {video_id}: {e}")
+        else:
+            logger.error(f"Error fetching metadata for {video_id}: {stderr}")
+        if use_cookies:
+            logger.info(f"Cookies 元数据请求失败，去掉 cookies 重试 {video_id}...")
+
+    if not data:
+        return None
+
+    metadata_cache.put_video_info(video_id, data)
+    return _summarize_metadata(data)
+
+
+def _summarize_metadata(data):
+    return {
+        "title": data.get("title", "Unknown Title"),
+        "thumbnail": data.get("thumbnail"),
+        "channel_name": data.get("channel") or data.get("uploader"),
+        "channel_id": data.get("channel_id") or data.get("uploader_id"),
+        "duration": data.get("duration"),
+        "view_count": data.get("view_count", 0),
+    }
+
+
+async def _gather_limited(func, items, concurrency):
+    """按 concurrency 限制并发执行 func(item)，结果与 items 顺序一致"""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(item):
+        async with sem:
+            return await func(item)
+
+    return await asyncio.gather(*(_one(item) for item in items))
+
+
+def retry_failed_videos(client, limit=None):
+    """Find failed videos and re-queue them if they haven't reached the retry limit."""
+    logger.info("Checking for failed videos to retry...")
+    retried_count = 0
+
+    try:
+        # Fetch failed videos. We'll check retry_count in Python as JSONB filtering can be tricky
+        response = client.table("videos") \
+            .select("id, title, report_data") \
+            .eq("status", "failed") \
+            .execute()
+
+        for video in response.data:
+            if limit is not None and retried_count >= limit:
+                logger.info(f"Retry quota reached ({limit}), remaining failed videos wait for the next run.")
+                break
+
+            vid_id = video["id"]
+            report_data = video.get("report_data") or {}
+            retry_count = report_data.get("retry_count", 0)
+
+            if retry_count < MAX_RETRY_COUNT:
+                logger.info(f"Retrying video {vid_id} (Attempt {retry_count + 1}/{MAX_RETRY_COUNT})...")
+
+                # Update status to queued and increment retry_count
+                report_data["retry_count"] = retry_count + 1
+
+                client.table("videos").update({
+                    "status": "queued",
+                    "report_data": report_data
+                }).eq("id", vid_id).execute()
+
+                # Update local status if the task has one
+                if status_store.get_status(vid_id):
+                    status_store.save_status(vid_id, "queued", 0, retry_count=retry_count + 1)
+
+                retried_count += 1
+
+        if retried_count > 0:
+            logger.info(f"Re-queued {retried_count} failed videos.")
+
+    except Exception as e:
+        logger.error(f"Error during failed videos retry: {e}")
+
+    return retried_count
+
+
+def fetch_tracked_channels(client):
+    """
+    读取开启追踪的频道及其增量状态，返回 (状态列表, 是否支持状态列)。
+    010 迁移未执行时退回只取 channel_id，每轮全部检查。
+    """
+    try:
+        res = client.table("channel_settings") \
+            .select(channel_schedule.STATE_COLUMNS) \
+            .eq("track_new_videos", True) \
+            .execute()
+        return res.data or [], True
+    except Exception as e:
+        logger.warning(f"Channel tracking state unavailable, checking all channels: {e}")
+    res = client.table("channel_settings").select("channel_id").eq("track_new_videos", True).execute()
+    return res.data or [], False
+
+
+def find_existing_video_ids(client, video_ids):
+    """分批 in_ 查询，返回数据库中已存在的视频 ID 集合"""
+    existing = set()
+    for i in range(0, len(video_ids), ID_QUERY_BATCH):
+        batch = video_ids[i:i + ID_QUERY_BATCH]
+        res = client.table("videos").select("id").in_("id", batch).execute()
+        existing.update(r["id"] for r in res.data or [])
+    return existing
+
+
+def _build_video_row(video_id, metadata):
+    return {
+        "id": video_id,
+        "title": metadata["title"],
+        "thumbnail": metadata.get("thumbnail"),
+        "status": "queued",
+        "report_data": {
+            "channel_id": metadata.get("channel_id"),
+            "channel": metadata.get("channel_name"),
+            "channel_name": metadata.get("channel_name"),
+            "duration": metadata.get("duration"),
+            "view_count": metadata.get("view_count"),
+            "source": "tracker"
+        }
+    }
+
+
+def insert_video_rows(client, rows):
+    """批量插入；整批失败（如与手动提交并发产生主键冲突）时逐条插入，返回成功插入的 ID"""
+    if not rows:
+        return []
+    try:
+        client.table("videos").insert(rows).execute()
+        return [r["id"] for r in rows]
+    except Exception as e:
+        logger.warning(f"Bulk insert of {len(rows)} videos failed, falling back to row-by-row: {e}")
+
+    inserted = []
+    for row in rows:
+        try:
+            client.table("videos").insert(row).execute()
+            inserted.append(row["id"])
+        except Exception as e:
+            logger.error(f"Error inserting video {row['id']}: {e}")
+    return inserted
+
+
+def _report_queued(on_queued, n):
+    """入队落库后立即回报数量（在工作线程内调用：外层 wait_for 超时取消时线程仍会跑完并记账）"""
+    if on_queued and n:
+        on_queued(n)
+    return n
+
+
+def _queue_new_videos(client, rows, on_queued=None):
+    """批量插入新视频、回报入队数并写本地状态，返回成功插入的 ID"""
+    inserted = insert_video_rows(client, rows)
+    _report_queued(on_queued, len(inserted))
+    # Also create a local status for immediate visibility in UI
+    for vid in inserted:
+        status_store.save_status(vid, "queued", 0)
+    return inserted
+
+
+def save_channel_states(client, updates):
+    """批量写回频道检查状态（单次 upsert）"""
+    if not updates:
+        return
+    try:
+        client.table("channel_settings").upsert(updates).execute()
+    except Exception as e:
+        logger.error(f"Failed to save channel tracking state: {e}")
+
+
+async def run_tracker(client, max_new=None, concurrency=MAX_WORKERS, on_queued=None):
+    """
+    执行一轮频道追踪。max_new 为本轮可入队的视频总数（失败重试 + 新视频），None 表示不限。
+    on_queued(n) 在每批重试 / 插入落库后立即调用，调用方据此记配额，本轮中途超时也不漏记。
+    返回 {"status", "retried", "new", "queued_ids", "deferred", "channels_total", "channels_checked", "message"}；
+    因配额未入队的新视频计入 deferred，其频道不推进指纹，下一轮会重新发现。
+    """
+    result = {
+        "status": "success",
+        "retried": 0,
+        "new": 0,
+        "queued_ids": [],
+        "deferred": 0,
+        "channels_total": 0,
+        "channels_checked": 0,
+        "message": None,
+    }
+    if not client:
+        result.update(status="error", message="Supabase client not initialized")
+        return result
+
+    logger.info("Starting channel tracking...")
+
+    # 0. Retry previously failed videos
+    result["retried"] = await asyncio.to_thread(
+        lambda: _report_queued(on_queued, retry_failed_videos(client, max_new)))
+    remaining = None if max_new is None else max(0, max_new - result["retried"])
+
+    # 1. Fetch channels with tracking enabled (track_new_videos=TRUE)
+    try:
+        states, has_state = await asyncio.to_thread(fetch_tracked_channels, client)
+    except Exception as e:
+        logger.error(f"Failed to fetch tracked channel IDs: {e}")
+        result.update(status="error", message=f"Failed to fetch tracked channels: {e}")
+        return result
+    result["channels_total"] = len(states)
+
+    # 只检查到期的频道（不活跃频道的检查间隔会逐步退避）
+    due = [st for st in states if channel_schedule.is_due(st)] if has_state else states
+    result["channels_checked"] = len(due)
+    logger.info(f"Found {len(states)} channels with tracking enabled, {len(due)} due for checking.")
+
+    # 2. 并发列出各频道最新视频（每个频道最多 5 个）
+    channel_ids = [st["channel_id"] for st in due]
+    listings = dict(zip(channel_ids, await _gather_limited(get_latest_video_ids, channel_ids, concurrency)))
+
+    # 最新列表指纹未变化的频道没有新视频，直接跳过
+    candidates = {}
+    for st in due:
+        vids = listings.get(st["channel_id"]) or []
+        if has_state and not channel_schedule.is_changed(st, vids):
+            continue
+        for vid in vids:
+            candidates.setdefault(vid, st["channel_id"])
+
+    # 3. 一次 in_ 查询过滤已存在的视频
+    try:
+        existing = await asyncio.to_thread(find_existing_video_ids, client, list(candidates))
+    except Exception as e:
+        logger.error(f"Failed to check existing videos: {e}")
+        result.update(status="error", message=f"Failed to check existing videos: {e}")
+        return result
+    new_ids = [vid for vid in candidates if vid not in existing]
+
+    # 配额之外的新视频留待下一轮（先截断再抓元数据，不浪费请求）
+    to_queue = new_ids if remaining is None else new_ids[:remaining]
+    result["deferred"] = len(new_ids) - len(to_queue)
+    logger.info(f"{len(candidates)} candidates, {len(existing)} already exist, "
+                f"{len(new_ids)} new, {result['deferred']} deferred by quota.")
+
+    # 4. 并发抓取新视频元数据，批量插入
+    metadata_list = await _gather_limited(get_video_metadata, to_queue, concurrency)
+    rows = []
+    for vid, metadata in zip(to_queue, metadata_list):
+        if not metadata:
+            logger.error(f"Failed to fetch metadata for {vid} (channel {candidates.get(vid)}). Skipping.")
+            continue
+        logger.info(f"New video found: {vid} for channel {candidates.get(vid)}: {metadata.get('title')}")
+        rows.append(_build_video_row(vid, metadata))
+
+    inserted = await asyncio.to_thread(_queue_new_videos, client, rows, on_queued)
+    result["queued_ids"] = inserted
+    result["new"] = len(inserted)
+
+    # 5. 写回各频道检查状态；有新视频未能入队（元数据失败或超出配额）的频道指纹置空，下一轮必定重新检查
+    if has_state:
+        inserted_set = set(inserted)
+        unsettled = {candidates[vid] for vid in new_ids if vid not in inserted_set}
+        # 列表为空（yt-dlp 失败 / 超时时同样返回空）不视为无变化，保持原间隔
+        await asyncio.to_thread(save_channel_states, client, [
+            channel_schedule.next_state(st, listings.get(st["channel_id"]) or [],
+                                        settled=st["channel_id"] not in unsettled,
+                                        failed=not listings.get(st["channel_id"]))
+            for st in due
+        ])
+
+    logger.info(f"Channel tracking finished. Added {result['retried'] + result['new']} tasks to the queue "
+                f"({result['retried']} retries, {result['new']} new).")
+    return result
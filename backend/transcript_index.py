@@ -0,0 +1,286 @@
+"""
+转录全文检索（本地 SQLite FTS5）
+任务完成时按句写入索引，可从 results/ 回填；检索词元由 text_search.tokenize 预切分
+（CJK 二元组 + 词），FTS5 只负责倒排与短语匹配，原文单独存储用于摘要高亮。
+"""
+import os
+import json
+import sqlite3
+import text_search
+from app_logger import get_logger
+logger = get_logger(__name__)
+
+INDEX_PATH = os.environ.get(
+    "TRANSCRIPT_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "transcript_search.db"),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed_videos (
+    video_id TEXT PRIMARY KEY,
+    title TEXT,
+    thumbnail TEXT,
+    user_id TEXT,
+    is_public INTEGER DEFAULT 1,
+    indexed_at REAL,
+    hidden INTEGER DEFAULT 0,
+    channel_id TEXT
+);
+CREATE TABLE IF NOT EXISTS hidden_channels (
+    channel_id TEXT PRIMARY KEY
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+    tokens,
+    video_id UNINDEXED,
+    kind UNINDEXED,
+    start UNINDEXED,
+    end UNINDEXED,
+    text UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 0'
+);
+"""
+
+
+def _connect(path=None):
+    path = path or INDEX_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    # WAL：API 进程读、scheduler 进程写互不阻塞
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    # 旧版索引缺少可见性列时补齐
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(indexed_videos)")}
+    for column, ddl in (("hidden", "INTEGER DEFAULT 0"), ("channel_id", "TEXT")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE indexed_videos ADD COLUMN {column} {ddl}")
+    return conn
+
+
+def _index_tokens(text):
+    """
+    索引词元：在 tokenize 基础上为每段 CJK 连续字符补一个末字单字，
+    使单字查询（前缀匹配）也能命中位于片段末尾的字。
+    """
+    tokens = []
+    for run in text_search.query_runs(text):
+        tokens.extend(text_search.tokenize(run))
+        if len(run) > 1 and text_search.is_cjk(run):
+            tokens.append(run[-1])
+    return " ".join(tokens)
+
+
+def _segment_rows(video_id, result):
+    """由结果 JSON 生成 (tokens, video_id, kind, start, end, text) 行"""
+    title = result.get("title") or ""
+    if title:
+        yield _index_tokens(title), video_id, "title", None, None, title
+
+    summary = result.get("summary") or ""
+    for line in summary.split("\n"):
+        line = line.strip()
+        if line:
+            yield _index_tokens(line), video_id, "summary", None, None, line
+
+    for p in result.get("paragraphs") or []:
+        for s in (p or {}).get("sentences") or []:
+            text = s.get("text") or ""
+            if text:
+                yield _index_tokens(text), video_id, "sentence", s.get("start"), s.get("end"), text
+
+
+def index_result(video_id, result, is_public=True, path=None, hidden=False):
+    """写入（或覆盖）单个视频的索引，返回写入的片段数"""
+    import time
+    rows = list(_segment_rows(video_id, result))
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM segments WHERE video_id = ?", (video_id,))
+            conn.executemany(
+                "INSERT INTO segments (tokens, video_id, kind, start, end, text) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO indexed_videos "
+                "(video_id, title, thumbnail, user_id, is_public, indexed_at, hidden, channel_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (video_id, result.get("title"), result.get("thumbnail"), result.get("user_id"),
+                 1 if is_public else 0, time.time(), 1 if hidden else 0, result.get("channel_id")),
+            )
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def set_visibility(video_id, is_public=None, hidden=None, path=None):
+    """视频公开 / 首页隐藏状态变化时同步索引（未索引的视频忽略），返回是否更新"""
+    updates, params = [], []
+    if is_public is not None:
+        updates.append("is_public = ?")
+        params.append(1 if is_public else 0)
+    if hidden is not None:
+        updates.append("hidden = ?")
+        params.append(1 if hidden else 0)
+    if not updates:
+        return False
+    conn = _connect(path)
+    try:
+        with conn:
+            cur = conn.execute(f"UPDATE indexed_videos SET {', '.join(updates)} WHERE video_id = ?",
+                               (*params, video_id))
+    finally:
+        conn.close()
+    return cur.rowcount > 0
+
+
+def set_channel_hidden(channel_id, hidden, path=None):
+    """频道在首页隐藏 / 恢复时同步索引；隐藏频道的视频不出现在他人的检索结果中"""
+    conn = _connect(path)
+    try:
+        with conn:
+            if hidden:
+                conn.execute("INSERT OR IGNORE INTO hidden_channels (channel_id) VALUES (?)", (channel_id,))
+            else:
+                conn.execute("DELETE FROM hidden_channels WHERE channel_id = ?", (channel_id,))
+    finally:
+        conn.close()
+
+
+def replace_hidden_channels(channel_ids, path=None):
+    """用数据库中的隐藏频道列表整体替换索引中的记录（回填时同步）"""
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM hidden_channels")
+            conn.executemany("INSERT OR IGNORE INTO hidden_channels (channel_id) VALUES (?)",
+                             [(c,) for c in channel_ids if c])
+    finally:
+        conn.close()
+
+
+def remove_video(video_id, path=None):
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM segments WHERE video_id = ?", (video_id,))
+            conn.execute("DELETE FROM indexed_videos WHERE video_id = ?", (video_id,))
+    finally:
+        conn.close()
+
+
+def backfill_from_results(results_dir="results", path=None, skip_existing=True, lookup=None):
+    """
+    从 results/ 下的结果 JSON 回填索引，返回 (视频数, 片段数)。
+    旧版结果 JSON 没有可见性字段：lookup(video_ids) -> {video_id: {"is_public", "user_id", "hidden_from_home"}}
+    从数据库补齐；查不到时有 user_id（用户提交 / 上传）的按私有处理，只有无归属的视频按公开处理。
+    """
+    conn = _connect(path)
+    try:
+        existing = {r[0] for r in conn.execute("SELECT video_id FROM indexed_videos")} if skip_existing else set()
+    finally:
+        conn.close()
+
+    pending = []
+    for f_name in sorted(os.listdir(results_dir)):
+        if not f_name.endswith(".json") or f_name.endswith(("_status.json", "_error.json")):
+            continue
+        task_id = f_name[:-len(".json")]
+        try:
+            with open(os.path.join(results_dir, f_name), "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except Exception as e:
+            logger.info(f"[TranscriptIndex] 跳过无法解析的结果文件 {f_name}: {e}")
+            continue
+        if not isinstance(result, dict) or not result.get("paragraphs"):
+            continue
+        video_id = result.get("youtube_id") or task_id
+        if video_id in existing:
+            continue
+        pending.append((video_id, result))
+
+    known = {}
+    if lookup and pending:
+        try:
+            known = lookup([video_id for video_id, _ in pending]) or {}
+        except Exception as e:
+            logger.info(f"[TranscriptIndex] 查询视频可见性失败，有归属用户的视频按私有回填: {e}")
+
+    videos, segments = 0, 0
+    for video_id, result in pending:
+        row = known.get(video_id)
+        if row:
+            result = {**result, "user_id": row.get("user_id") or result.get("user_id")}
+            is_public = row.get("is_public") is not False
+            hidden = bool(row.get("hidden_from_home"))
+        else:
+            is_public = result.get("is_public", not result.get("user_id"))
+            hidden = False
+        segments += index_result(video_id, result, is_public=is_public, path=path, hidden=hidden)
+        videos += 1
+    return videos, segments
+
+
+def _match_expression(query):
+    """
+    构造 FTS5 查询：每个连续片段作为一个短语（CJK 片段的二元组须相邻，即原文子串匹配），
+    片段之间 AND。单个字用前缀匹配（命中以该字开头的二元组及末字单字）。
+    """
+    parts = []
+    for run in text_search.query_runs(query):
+        tokens = text_search.tokenize(run)
+        if len(tokens) == 1 and len(run) == 1:
+            parts.append(f'"{tokens[0]}"*')
+        else:
+            parts.append('"' + " ".join(tokens) + '"')
+    return " AND ".join(parts)
+
+
+def search(query, limit=20, user_id=None, path=None):
+    """
+    检索公开视频（及 user_id 本人的视频），与 /explore 一样排除首页隐藏的视频和隐藏频道，返回按视频聚合的命中：
+    [{"video_id", "title", "thumbnail", "hits": [{"kind", "start", "end", "text", "snippet"}]}]
+    """
+    expr = _match_expression(query)
+    if not expr:
+        return []
+
+    conn = _connect(path)
+    try:
+        # rowid 倒序（新索引的在前）可直接按倒排顺序截断，不需要对全部命中打分排序
+        rows = conn.execute(
+            """
+            SELECT s.video_id, s.kind, s.start, s.end, s.text, v.title, v.thumbnail
+            FROM segments s
+            JOIN indexed_videos v ON v.video_id = s.video_id
+            WHERE segments MATCH ?
+              AND ((v.is_public = 1 AND COALESCE(v.hidden, 0) = 0
+                    AND (v.channel_id IS NULL
+                         OR v.channel_id NOT IN (SELECT channel_id FROM hidden_channels)))
+                   OR v.user_id = ?)
+            ORDER BY s.rowid DESC
+            LIMIT ?
+            """,
+            (expr, user_id, limit * 5),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    grouped = {}
+    for video_id, kind, start, end, text, title, thumbnail in rows:
+        entry = grouped.get(video_id)
+        if entry is None:
+            if len(grouped) >= limit:
+                continue
+            entry = grouped[video_id] = {"video_id": video_id, "title": title, "thumbnail": thumbnail, "hits": []}
+        entry["hits"].append({
+            "kind": kind,
+            "start": start,
+            "end": end,
+            "text": text,
+            "snippet": text_search.snippet(text, query),
+        })
+
+    for entry in grouped.values():
+        entry["hits"].sort(key=lambda h: (h["kind"] != "title", h["kind"] != "summary", h["start"] or 0))
+    return list(grouped.values())
@@ -0,0 +1,448 @@
+"""
+上传文件的落盘与内容寻址
+/upload 直接解析 multipart 请求流（不经 Starlette 的 UploadFile 预先缓存），边写临时文件边计算哈希，
+文件只落盘一次，超过上限的那一块即中止；写完后以内容哈希命名（downloads/up_{hash}{ext}）原子替换到位，相同内容只保留一份。
+
+大文件另有可续传协议（/upload/sessions）：init 建会话 → 按序号 PUT 分片（校验 sha256）→ complete 拼接。
+分片存于 downloads/.sessions/{upload_id}/，拼接时用 copy_file_range / sendfile 在内核内完成。
+"""
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import hashlib
+from app_logger import get_logger
+logger = get_logger(__name__)
+
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", 2048)) * 1024 * 1024
+CHUNK_BYTES = 1024 * 1024
+# 上传任务 ID（同时是 downloads/ 中的文件名）前缀，区分上传文件与 YouTube 视频
+UPLOAD_ID_PREFIX = "up_"
+# 任务 ID 使用的哈希位数（sha256 前 16 位）；旧版为 md5 前 8 位，去重时一并检查
+TASK_HASH_CHARS = 16
+LEGACY_HASH_CHARS = 8
+# 非文件表单字段（mode / user_id / is_public）的长度上限
+MAX_FIELD_BYTES = 64 * 1024
+MEDIA_EXTENSIONS = (".mp3", ".m4a", ".wav", ".aac", ".flac", ".ogg", ".opus",
+                    ".mp4", ".mov", ".avi", ".webm", ".mkv")
+
+
+class UploadTooLarge(Exception):
+    """上传超过 MAX_UPLOAD_BYTES"""
+
+
+class UploadFormError(Exception):
+    """multipart 请求体格式错误"""
+
+
+class Hasher:
+    """同时计算 sha256（任务 ID）与 md5（兼容旧 ID）"""
+
+    def __init__(self):
+        self.sha256 = hashlib.sha256()
+        self.md5 = hashlib.md5()
+        self.size = 0
+
+    def update(self, chunk):
+        self.sha256.update(chunk)
+        self.md5.update(chunk)
+        self.size += len(chunk)
+
+    @property
+    def task_id(self):
+        return f"{UPLOAD_ID_PREFIX}{self.sha256.hexdigest()[:TASK_HASH_CHARS]}"
+
+    @property
+    def legacy_task_id(self):
+        return f"{UPLOAD_ID_PREFIX}{self.md5.hexdigest()[:LEGACY_HASH_CHARS]}"
+
+
+def safe_extension(filename, default=".mp3"):
+    """只保留常规扩展名，避免用户文件名里的路径或怪字符进入存储路径"""
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if re.fullmatch(r"\.[a-z0-9]{1,8}", ext) else default
+
+
+def find_media(task_id, directory):
+    """查找任务已有的媒体文件（任意扩展名，含抽取出的音频）"""
+    for ext in MEDIA_EXTENSIONS:
+        path = os.path.join(directory, f"{task_id}{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def temp_path(directory, suffix=".part"):
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f".upload-{uuid.uuid4().hex}{suffix}")
+
+
+def _write_chunk(f, hasher, chunk):
+    f.write(chunk)
+    hasher.update(chunk)
+
+
+async def stream_to_temp(read, directory, max_bytes=None):
+    """
+    用 read(n) 协程按块读取上传流，写入 directory 下的临时文件并增量计算哈希。
+    返回 (临时文件路径, Hasher)；超过上限时删除临时文件并抛出 UploadTooLarge。
+    """
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    path = temp_path(directory)
+    hasher = Hasher()
+    try:
+        with open(path, "wb") as f:
+            while True:
+                chunk = await read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                if hasher.size + len(chunk) > max_bytes:
+                    raise UploadTooLarge(f"文件超过上传上限 {max_bytes // (1024 * 1024)} MB")
+                # 磁盘写入与哈希放到线程里，不阻塞事件循环
+                await asyncio.to_thread(_write_chunk, f, hasher, chunk)
+    except BaseException:
+        discard(path)
+        raise
+    return path, hasher
+
+
+def _multipart_module():
+    try:
+        import python_multipart as multipart
+    except ImportError:
+        # 旧版 python-multipart 的包名
+        import multipart
+    return multipart
+
+
+async def stream_multipart(content_type, stream, directory, file_field="file", max_bytes=None):
+    """
+    解析 multipart/form-data 请求流（request.stream() 的异步迭代器）：file_field 字段按块写入
+    directory 下的临时文件并增量计算哈希，其余字段收集为字符串。
+    返回 (fields, filename, 临时文件路径, Hasher)；没有文件字段时 filename 为 None、文件为空。
+    超过上限抛 UploadTooLarge，格式错误抛 UploadFormError，两者都会删除临时文件。
+    """
+    multipart = _multipart_module()
+    parse_options_header = multipart.multipart.parse_options_header
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    _, params = parse_options_header(content_type or "")
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise UploadFormError("请求不是 multipart/form-data 或缺少 boundary")
+
+    fields, pending = {}, []
+    part = {"headers": {}, "name": None, "is_file": False, "buffer": bytearray()}
+    header = [b"", b""]
+    state = {"filename": None}
+
+    def on_part_begin():
+        part.update(headers={}, name=None, is_file=False, buffer=bytearray())
+
+    def on_header_field(data, start, end):
+        header[0] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header[1] += data[start:end]
+
+    def on_header_end():
+        part["headers"][header[0].strip().lower()] = header[1].strip()
+        header[:] = [b"", b""]
+
+    def on_headers_finished():
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        part["name"] = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if part["name"] == file_field and filename is not None:
+            if state["filename"] is not None:
+                raise UploadFormError("只支持上传一个文件")
+            part["is_file"] = True
+            state["filename"] = filename.decode("utf-8", "replace")
+
+    def on_part_data(data, start, end):
+        if part["is_file"]:
+            pending.append(data[start:end])
+            return
+        part["buffer"] += data[start:end]
+        if len(part["buffer"]) > MAX_FIELD_BYTES:
+            raise UploadFormError(f"表单字段 {part['name']} 过长")
+
+    def on_part_end():
+        if not part["is_file"] and part["name"]:
+            fields[part["name"]] = part["buffer"].decode("utf-8", "replace")
+
+    parser = multipart.MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+
+    path = temp_path(directory)
+    hasher = Hasher()
+    try:
+        with open(path, "wb") as f:
+            async for chunk in stream:
+                try:
+                    parser.write(chunk)
+                except multipart.exceptions.FormParserError as e:
+                    raise UploadFormError(f"multipart 请求体格式错误: {e}")
+                if not pending:
+                    continue
+                data = b"".join(pending)
+                pending.clear()
+                if hasher.size + len(data) > max_bytes:
+                    raise UploadTooLarge(f"文件超过上传上限 {max_bytes // (1024 * 1024)} MB")
+                # 磁盘写入与哈希放到线程里，不阻塞事件循环
+                await asyncio.to_thread(_write_chunk, f, hasher, data)
+            parser.finalize()
+    except BaseException:
+        discard(path)
+        raise
+    return fields, state["filename"], path, hasher
+
+
+def commit(tmp_path, hasher, ext, directory):
+    """
+    把临时文件放到内容寻址路径 directory/up_{hash}{ext}。
+    相同内容已存在（含旧版 ID 的文件）时丢弃临时文件，返回 (task_id, 文件路径, 是否复用已有文件)。
+    """
+    for task_id in (hasher.task_id, hasher.legacy_task_id):
+        existing = find_media(task_id, directory)
+        if existing:
+            discard(tmp_path)
+            logger.info(f"[Upload] 内容已存在，复用 {existing}")
+            return task_id, existing, True
+
+    final_path = os.path.join(directory, f"{hasher.task_id}{ext}")
+    os.replace(tmp_path, final_path)
+    return hasher.task_id, final_path, False
+
+
+def discard(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# ========== 可续传分片上传 ==========
+
+SESSIONS_DIR_NAME = ".sessions"
+DEFAULT_PART_BYTES = 8 * 1024 * 1024
+MIN_PART_BYTES = 256 * 1024
+MAX_PART_BYTES = 64 * 1024 * 1024
+SESSION_TTL_SECONDS = 24 * 3600
+
+
+class UploadSessionError(Exception):
+    """分片上传请求不合法（会话不存在、分片序号 / 大小 / 校验和不符等），status_code 供 API 层映射"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _sessions_root(directory):
+    return os.path.join(directory, SESSIONS_DIR_NAME)
+
+
+def _session_dir(upload_id, directory):
+    # upload_id 由服务端生成（uuid hex），其他形式一律视为不存在，防止路径穿越
+    if not re.fullmatch(r"[0-9a-f]{32}", upload_id or ""):
+        raise UploadSessionError("上传会话不存在", 404)
+    return os.path.join(_sessions_root(directory), upload_id)
+
+
+def _part_path(session_dir, index):
+    return os.path.join(session_dir, f"{index:06d}.part")
+
+
+def create_session(directory, filename, size, part_size=None, **fields):
+    """新建上传会话，返回会话元数据（含 upload_id / part_size / total_parts）"""
+    if not isinstance(size, int) or size <= 0:
+        raise UploadSessionError("文件大小无效")
+    if size > MAX_UPLOAD_BYTES:
+        raise UploadSessionError(f"文件超过上传上限 {MAX_UPLOAD_BYTES // (1024 * 1024)} MB", 413)
+    part_size = min(max(int(part_size or DEFAULT_PART_BYTES), MIN_PART_BYTES), MAX_PART_BYTES)
+
+    sweep_sessions(directory)
+    meta = {
+        "upload_id": uuid.uuid4().hex,
+        "filename": filename,
+        "ext": safe_extension(filename),
+        "size": size,
+        "part_size": part_size,
+        "total_parts": (size + part_size - 1) // part_size,
+        "created_at": time.time(),
+        **fields,
+    }
+    session_dir = _session_dir(meta["upload_id"], directory)
+    os.makedirs(session_dir)
+    with open(os.path.join(session_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return meta
+
+
+def load_session(upload_id, directory):
+    session_dir = _session_dir(upload_id, directory)
+    try:
+        with open(os.path.join(session_dir, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise UploadSessionError("上传会话不存在或已过期", 404)
+
+
+def expected_part_size(meta, index):
+    if not 0 <= index < meta["total_parts"]:
+        raise UploadSessionError(f"分片序号超出范围 0-{meta['total_parts'] - 1}")
+    if index == meta["total_parts"] - 1:
+        return meta["size"] - meta["part_size"] * index
+    return meta["part_size"]
+
+
+def received_parts(meta, directory):
+    session_dir = _session_dir(meta["upload_id"], directory)
+    return [i for i in range(meta["total_parts"]) if os.path.exists(_part_path(session_dir, i))]
+
+
+def session_status(meta, directory):
+    """续传用：已收到 / 仍缺少的分片序号"""
+    received = received_parts(meta, directory)
+    missing = sorted(set(range(meta["total_parts"])) - set(received))
+    return {
+        "upload_id": meta["upload_id"],
+        "size": meta["size"],
+        "part_size": meta["part_size"],
+        "total_parts": meta["total_parts"],
+        "received_parts": received,
+        "missing_parts": missing,
+    }
+
+
+def _write_part_chunk(f, digest, chunk):
+    f.write(chunk)
+    digest.update(chunk)
+
+
+async def write_part(meta, index, chunks, sha256_hex, directory):
+    """
+    把一个分片的字节流（异步迭代器）写入会话目录。大小必须与序号对应的字节范围一致，
+    sha256 必须与客户端声明的一致，否则丢弃并报错；同一分片重复上传会覆盖（幂等）。
+    """
+    expected = expected_part_size(meta, index)
+    session_dir = _session_dir(meta["upload_id"], directory)
+    tmp = temp_path(session_dir)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp, "wb") as f:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > expected:
+                    raise UploadSessionError(f"分片 {index} 超出应有大小 {expected} 字节")
+                await asyncio.to_thread(_write_part_chunk, f, digest, chunk)
+        if size != expected:
+            raise UploadSessionError(f"分片 {index} 大小不符：收到 {size}，应为 {expected} 字节")
+        if digest.hexdigest() != (sha256_hex or "").lower():
+            raise UploadSessionError(f"分片 {index} 校验和不符", 422)
+        os.replace(tmp, _part_path(session_dir, index))
+    except BaseException:
+        discard(tmp)
+        raise
+    return {"index": index, "size": size}
+
+
+def _append_file(dst_fd, src_path):
+    """把 src 整个追加到 dst_fd 当前位置：优先内核内拷贝（零拷贝），不支持时回退普通拷贝"""
+    with open(src_path, "rb") as src:
+        remaining = os.fstat(src.fileno()).st_size
+        offset = 0
+        copy_range = getattr(os, "copy_file_range", None)
+        try:
+            while remaining > 0:
+                if copy_range:
+                    n = copy_range(src.fileno(), dst_fd, remaining, offset)
+                else:
+                    n = os.sendfile(dst_fd, src.fileno(), offset, remaining)
+                if n == 0:
+                    break
+                offset += n
+                remaining -= n
+        except OSError:
+            # 跨文件系统 / 平台不支持（如 macOS 的 sendfile 只能发往 socket）
+            pass
+        if remaining > 0:
+            src.seek(offset)
+            with os.fdopen(os.dup(dst_fd), "wb", closefd=True) as dst:
+                dst.seek(0, os.SEEK_END)
+                shutil.copyfileobj(src, dst, CHUNK_BYTES)
+
+
+def assemble(meta, directory):
+    """
+    所有分片齐全后拼接为完整文件并计算整体哈希，再走与 /upload 相同的内容寻址落盘。
+    返回 commit() 的 (task_id, 文件路径, 是否复用已有文件)，成功后删除会话目录。
+    """
+    missing = session_status(meta, directory)["missing_parts"]
+    if missing:
+        raise UploadSessionError(f"缺少分片: {missing[:20]}", 409)
+
+    session_dir = _session_dir(meta["upload_id"], directory)
+    parts = [_part_path(session_dir, i) for i in range(meta["total_parts"])]
+
+    # 整体哈希需读一遍分片（分片刚写入，通常仍在页缓存中）
+    hasher = Hasher()
+    for path in parts:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+                hasher.update(chunk)
+    if hasher.size != meta["size"]:
+        raise UploadSessionError("分片总大小与声明不符", 409)
+
+    tmp = temp_path(directory)
+    try:
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            for path in parts:
+                _append_file(fd, path)
+        finally:
+            os.close(fd)
+        result = commit(tmp, hasher, meta["ext"], directory)
+    except BaseException:
+        discard(tmp)
+        raise
+    remove_session(meta["upload_id"], directory)
+    return result
+
+
+def remove_session(upload_id, directory):
+    shutil.rmtree(_session_dir(upload_id, directory), ignore_errors=True)
+
+
+def sweep_sessions(directory, ttl=None):
+    """清理超过 TTL 未完成的会话，返回清理数量"""
+    ttl = SESSION_TTL_SECONDS if ttl is None else ttl
+    root = _sessions_root(directory)
+    if not os.path.isdir(root):
+        return 0
+    removed = 0
+    now = time.time()
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            if now - os.path.getmtime(path) > ttl:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    if removed:
+        logger.info(f"[Upload] 清理过期上传会话 {removed} 个")
+    return removed
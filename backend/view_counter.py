@@ -0,0 +1,52 @@
+"""
+浏览量写缓冲（write-behind）
+在进程内按视频聚合浏览增量，定期通过 increment_view_counts RPC 一次性原子写入，
+把数据库写操作移出 POST /result/{task_id}/view 热路径。
+"""
+import threading
+from collections import Counter
+from app_logger import get_logger
+logger = get_logger(__name__)
+
+
+class ViewCountBuffer:
+    """按 video_id 聚合的浏览量增量缓冲区（线程安全）"""
+
+    def __init__(self):
+        self._pending = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, video_id: str, n: int = 1):
+        with self._lock:
+            self._pending[video_id] += n
+
+    def pending(self, video_id: str) -> int:
+        """尚未落库的增量，供读取接口叠加到 view_count 上"""
+        with self._lock:
+            return self._pending.get(video_id, 0)
+
+    def flush(self, client) -> int:
+        """
+        将缓冲区一次性写入数据库，返回写入的视频数。
+        没有数据库连接时保留缓冲区不动；写入失败时把增量合并回缓冲区，下次刷新重试，不丢计数。
+        """
+        if not client:
+            return 0
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch = self._pending
+            self._pending = Counter()
+
+        ids = list(batch.keys())
+        try:
+            client.rpc("increment_view_counts", {
+                "p_ids": ids,
+                "p_counts": [batch[i] for i in ids],
+            }).execute()
+            return len(ids)
+        except Exception as e:
+            logger.info(f"[ViewCounter] 刷新失败，{len(ids)} 个视频的增量保留到下次: {e}")
+            with self._lock:
+                self._pending.update(batch)
+            return 0
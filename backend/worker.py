@@ -18,20 +18,16 @@ os.environ['KMP_BLOCKTIME'] = '0'
 from transcriber import transcribe_audio
 from processor import split_into_paragraphs
 from sub_utils import find_downloaded_subtitles, parse_vtt_srt
+from admin_stats import build_usage_estimate
+import eta_model
+import metrics
+import tracing
+import media_cache
+from status_store import save_status
 
 RESULTS_DIR = "results"
 CACHE_DIR = "cache"
 
-def save_status(task_id, status, progress, eta=None):
-    """保存任务状态"""
-    status_file = f"{RESULTS_DIR}/{task_id}_status.json"
-    with open(status_file, "w") as f:
-        json.dump({
-            "status": status, 
-            "progress": progress, 
-            "eta": eta
-        }, f)
-
 def main():
     parser = argparse.ArgumentParser(description='转录任务 Worker')
     parser.add_argument('task_id', help='任务ID')
@@ -41,8 +37,10 @@ def main():
     parser.add_argument('--description', default='', help='视频描述')
     parser.add_argument('--video-id', help='YouTube 视频ID')
     parser.add_argument('--model', default='large-v3-turbo', help='模型名称')
+    parser.add_argument('--audio-seconds', type=float, default=None, help='音频时长（秒），用于 ETA 预测')
     
     args = parser.parse_args()
+    clock = eta_model.StageClock(args.task_id, args.mode, audio_seconds=args.audio_seconds)
     
     try:
         # 检查缓存
@@ -50,18 +48,21 @@ def main():
         cache_sub_path = f"{CACHE_DIR}/{cache_key}_raw.json"
         
         whisper_lang = None  # Whisper 检测到的语言码（辅助信号）
+        asr_seconds = None
 
+        metrics.cache_lookup("transcript", os.path.exists(cache_sub_path))
         if os.path.exists(cache_sub_path):
-            save_status(args.task_id, "loading_cache", 50, eta=5)
+            save_status(args.task_id, "loading_cache", 50, eta=clock.start("import_subtitles"))
             print(f"[Worker] 使用缓存: {cache_sub_path}")
             with open(cache_sub_path, "r", encoding="utf-8") as rf:
                 raw_subtitles = json.load(rf)
+            media_cache.touch(cache_sub_path, flush=True)
         else:
             # 尝试拦截现有字幕
             hijacked_sub_path = find_downloaded_subtitles(args.video_id) if args.video_id else None
 
             if hijacked_sub_path:
-                save_status(args.task_id, "importing_subtitles", 55, eta=5)
+                save_status(args.task_id, "importing_subtitles", 55, eta=clock.start("import_subtitles"))
                 print(f"[Worker] 拦截到字幕文件: {hijacked_sub_path}")
                 raw_subtitles = parse_vtt_srt(hijacked_sub_path)
 
@@ -75,17 +76,19 @@ def main():
                     args.task_id,
                     "transcribing_cloud" if args.mode == 'cloud' else "transcribing_local",
                     60,
-                    eta=25 if args.mode == 'cloud' else 120
+                    eta=clock.start("transcribe")
                 )
                 print(f"[Worker] 开始转录: {args.file} (模式: {args.mode}, 模型: {args.model})")
                 print(f"[Worker] 提示词: {args.title}")
 
-                raw_subtitles, whisper_lang = transcribe_audio(
-                    args.file,
-                    mode=args.mode,
-                    initial_prompt=args.title,
-                    model_size=args.model
-                )
+                with metrics.timed("asr", mode=args.mode) as asr_timer:
+                    raw_subtitles, whisper_lang = transcribe_audio(
+                        args.file,
+                        mode=args.mode,
+                        initial_prompt=args.title,
+                        model_size=args.model
+                    )
+                asr_seconds = asr_timer.elapsed
 
             # 保存缓存（仅保存字幕列表）
             with open(cache_sub_path, "w", encoding="utf-8") as wf:
@@ -94,7 +97,11 @@ def main():
         
         # LLM 处理
         duration = raw_subtitles[-1]["end"] if raw_subtitles else 0
-        save_status(args.task_id, "llm_processing", 80, eta=10)
+        clock.audio_seconds = clock.audio_seconds or duration
+        asr_rtf = round(asr_seconds / duration, 4) if asr_seconds and duration else None
+        if asr_rtf is not None:
+            metrics.observe("asr_rtf", asr_rtf, mode=args.mode)
+        save_status(args.task_id, "llm_processing", 80, eta=clock.start("llm"))
         print(f"[Worker] 开始 LLM 处理...")
         
         paragraphs, llm_usage = split_into_paragraphs(
@@ -165,7 +172,14 @@ def main():
                 "llm_cost": round(llm_cost, 6),
                 "total_cost": round(whisper_cost + llm_cost, 6),
                 "currency": "USD",
-                "model": os.getenv("OLLAMA_MODEL", "qwen:8b") if os.getenv("LLM_PROVIDER") == "ollama" else "gpt-4o-mini"
+                "model": os.getenv("OLLAMA_MODEL", "qwen:8b") if os.getenv("LLM_PROVIDER") == "ollama" else "gpt-4o-mini",
+                # 写入时估算一次，管理驾驶舱无需再读取全文
+                "estimated_llm": build_usage_estimate(paragraphs, raw_subtitles),
+                # 本次处理的阶段耗时汇总；下载 / 抽音频阶段由 process_task 并入
+                "metrics": {
+                    "stages": metrics.timings_summary(),
+                    "asr_rtf": asr_rtf,
+                }
             },
             "raw_subtitles": raw_subtitles,
             "user_id": None  # 由主进程填充
@@ -175,6 +189,7 @@ def main():
         with open(result_file, "w", encoding="utf-8") as f:
             json.dump(result, f, ensure_ascii=False, indent=2)
         
+        clock.stop()
         save_status(args.task_id, "completed", 100)
         print(f"[Worker] 任务完成: {result_file}")
         sys.exit(0)
@@ -196,4 +211,6 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    # trace 上下文由 process_task 经环境变量传入
+    with tracing.span("worker"):
+        main()
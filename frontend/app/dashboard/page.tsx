@@ -111,7 +111,7 @@ export default function DashboardPage() {
                     const formattedVideos = data.history.map((item: any) => ({
                         id: item.id,
                         title: item.title,
-                        thumbnail: item.thumbnail,
+                        thumbnail: item.thumbnail_variants?.card || item.thumbnail,
                         source: item.id.length === 11 ? "youtube" : "upload",
                         isPublic: item.is_public,
                         is_liked: item.is_liked || item.source === "like",
@@ -166,7 +166,7 @@ export default function DashboardPage() {
                 const formattedVideos = data.history.map((item: any) => ({
                     id: item.id,
                     title: item.title,
-                    thumbnail: item.thumbnail,
+                    thumbnail: item.thumbnail_variants?.card || item.thumbnail,
                     source: item.id.length === 11 ? "youtube" : "upload",
                     isPublic: item.is_public,
                     is_liked: item.is_liked || item.source === "like",
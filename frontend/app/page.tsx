@@ -37,6 +37,7 @@ interface ExploreItem {
   id: string;
   title: string;
   thumbnail: string;
+  thumbnail_variants?: { card?: string; full?: string } | null;
   channel?: string;
   channel_id?: string;
   channel_avatar?: string;
@@ -548,7 +549,7 @@ export default function MarketingPage() {
               {items.map((item) => (
                 <div key={item.id} className="group relative bg-card-bg border border-card-border rounded-2xl overflow-hidden hover:border-indigo-500/50 transition-all duration-500 hover:shadow-2xl hover:shadow-indigo-500/10">
                   <div className="aspect-video relative overflow-hidden bg-slate-900 border-b border-card-border/10">
-                    <img src={getYoutubeThumbnail(item.id) || item.channel_avatar || getAvatarUrl(item.channel || 'YT') || ''} alt={item.title} className="object-cover w-full h-full group-hover:scale-110 transition-transform duration-700" />
+                    <img src={item.thumbnail_variants?.card || getYoutubeThumbnail(item.id) || item.channel_avatar || getAvatarUrl(item.channel || 'YT') || ''} alt={item.title} className="object-cover w-full h-full group-hover:scale-110 transition-transform duration-700" />
                     <div className="absolute inset-0 bg-gradient-to-t from-slate-950/80 to-transparent dark:block hidden" />
 
                     <div className="absolute top-4 left-4 p-2 bg-black/40 backdrop-blur-md rounded-xl border border-white/10">
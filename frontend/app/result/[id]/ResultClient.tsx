@@ -529,12 +529,17 @@ export default function ResultClient({ id }: { id: string }) {
                                 <div className="absolute bottom-10 left-1/2 -translate-x-1/2 w-full max-w-md px-10">
                                     <audio
                                         ref={audioRef}
-                                        src={`${getApiBase()}/media/${result.media_path?.replace(/\.(mp4|mov|avi|webm|mkv)$/i, '.mp3') ?? ''}`}
                                         controls
+                                        preload="metadata"
                                         onTimeUpdate={handleLocalTimeUpdate}
                                         onLoadedMetadata={handleAudioLoadedMetadata}
                                         className="w-full h-10 accent-indigo-500"
-                                    />
+                                    >
+                                        {/* 低码率 Opus 播放版本（未生成时服务端返回原始音频，类型不固定，故不写 type）；
+                                            解码失败（如不支持 Ogg Opus 的 Safari）时回退到原始 / 已提取的音频 */}
+                                        <source src={`${getApiBase()}/playback/${result.media_path ?? ''}`} />
+                                        <source src={`${getApiBase()}/playback/${result.media_path ?? ''}?original=true`} />
+                                    </audio>
                                 </div>
                             </div>
                         ) : (
@@ -115,7 +115,7 @@ export default function TasksPage() {
             }
 
             const data = await resp.json();
-            pollStatus(data.task_id);
+            watchStatus(data.task_id);
         } catch (e: unknown) {
             console.error("Start process failed:", e);
             const message = e instanceof Error ? e.message : t("tasks.statusNetworkError");
@@ -173,52 +173,81 @@ export default function TasksPage() {
                 return;
             }
             const data = await resp.json();
-            pollStatus(data.task_id);
+            watchStatus(data.task_id);
         } catch (err) {
             setStatus(t("tasks.statusUploadFailed"));
         }
     };
 
+    // 返回 true 表示任务已结束（completed / failed）
+    const applyStatus = (taskId: string, data: any) => {
+        setProgress(data.progress || 0);
+        if (data.eta !== undefined) setEta(data.eta);
+
+        if (data.status === "completed") {
+            setProgress(100);
+            setStatus(t("tasks.statusCompleted"));
+            setIsFinished(true);
+            setFinishedTaskId(taskId);
+            fetchHistory();
+            return true;
+        } else if (data.status === "failed") {
+            setProgress(0);
+            setStatus("Failed: " + (data.detail || "Unknown error"));
+            return true;
+        }
+        const statusMap: Record<string, string> = {
+            scheduling_download: t("tasks.statusSchedulingDownload"),
+            downloading: t("tasks.statusDownloading"),
+            extracting_audio: t("tasks.statusExtractingAudio"),
+            loading_cache: t("tasks.statusLoadingCache"),
+            importing_subtitles: t("tasks.statusImportingSubtitles"),
+            transcribing_cloud: t("tasks.statusTranscribingCloud"),
+            transcribing_local: t("tasks.statusTranscribingLocal"),
+            llm_processing: t("tasks.statusLlmProcessing"),
+        };
+        const raw = data.status || "";
+        setStatus(statusMap[raw] || raw || t("tasks.statusProcessing"));
+        return false;
+    };
+
     const pollStatus = (taskId: string) => {
         const interval = setInterval(async () => {
             try {
                 const apiBase = getApiBase();
                 const resp = await fetch(`${apiBase}/result/${taskId}`);
                 const data = await resp.json();
-                setProgress(data.progress || 0);
-                if (data.eta !== undefined) setEta(data.eta);
-
-                if (data.status === "completed") {
-                    clearInterval(interval);
-                    setProgress(100);
-                    setStatus(t("tasks.statusCompleted"));
-                    setIsFinished(true);
-                    setFinishedTaskId(taskId);
-                    fetchHistory();
-                } else if (data.status === "failed") {
-                    setProgress(0);
-                    setStatus("Failed: " + (data.detail || "Unknown error"));
-                    clearInterval(interval);
-                } else {
-                    const statusMap: Record<string, string> = {
-                        scheduling_download: t("tasks.statusSchedulingDownload"),
-                        downloading: t("tasks.statusDownloading"),
-                        extracting_audio: t("tasks.statusExtractingAudio"),
-                        loading_cache: t("tasks.statusLoadingCache"),
-                        importing_subtitles: t("tasks.statusImportingSubtitles"),
-                        transcribing_cloud: t("tasks.statusTranscribingCloud"),
-                        transcribing_local: t("tasks.statusTranscribingLocal"),
-                        llm_processing: t("tasks.statusLlmProcessing"),
-                    };
-                    const raw = data.status || "";
-                    setStatus(statusMap[raw] || raw || t("tasks.statusProcessing"));
-                }
+                if (applyStatus(taskId, data)) clearInterval(interval);
             } catch (e) {
                 setStatus(t("tasks.statusConnectionLost"));
             }
         }, 30000);
     };
 
+    // 优先使用 SSE 推送进度；浏览器不支持或连接失败时回退到轮询
+    const watchStatus = (taskId: string) => {
+        if (typeof EventSource === "undefined") {
+            pollStatus(taskId);
+            return;
+        }
+        const source = new EventSource(`${getApiBase()}/result/${taskId}/events`);
+        let finished = false;
+        source.addEventListener("status", (event) => {
+            try {
+                if (applyStatus(taskId, JSON.parse((event as MessageEvent).data))) {
+                    finished = true;
+                    source.close();
+                }
+            } catch (e) {
+                // 忽略无法解析的事件
+            }
+        });
+        source.onerror = () => {
+            source.close();
+            if (!finished) pollStatus(taskId);
+        };
+    };
+
     const handleSignOut = async () => {
         await supabase.auth.signOut();
         router.push("/");